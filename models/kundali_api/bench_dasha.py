@@ -0,0 +1,48 @@
+"""
+bench_dasha.py
+
+Times Vimshottari dasha window queries at increasing distances from birth.
+Because the generator jumps straight to the containing mahadasha, the
+per-query cost should stay flat across the whole 120-year span.
+
+Usage:
+  python bench_dasha.py [--repeat 2000]
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from starfinal import KundaliGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000, help="Queries per offset")
+    parser.add_argument("--window-years", type=float, default=2.0, help="Window length in years")
+    args = parser.parse_args()
+
+    generator = KundaliGenerator()
+    birth_utc, moon = generator.get_dasha_anchor("2005-03-14", "10:30", "Asia/Kolkata")
+
+    print(f"{'offset (y)':>10s} {'periods':>8s} {'us/query':>10s}")
+    for offset_years in (0, 10, 30, 60, 90, 115):
+        start = birth_utc + timedelta(days=offset_years * generator.days_per_year)
+        end = start + timedelta(days=args.window_years * generator.days_per_year)
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            periods = list(generator.iter_dasha_periods(birth_utc, moon, start, end))
+        elapsed = (time.perf_counter() - t0) / args.repeat
+
+        print(f"{offset_years:>10d} {len(periods):>8d} {elapsed * 1e6:>10.1f}")
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        list(generator.iter_dasha_periods(birth_utc, moon))
+    full = (time.perf_counter() - t0) / args.repeat
+    print(f"{'full tree':>10s} {'':>8s} {full * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+bench_ephemeris.py
+
+Compares the built-in Moshier ephemeris with the file-backed Swiss
+Ephemeris over a random sample of moments between 1900 and 2100:
+  - planet-position throughput for each mode
+  - how often the nakshatra / pada assignment differs
+  - the largest sidereal longitude difference (arc-seconds)
+
+Usage:
+  python bench_ephemeris.py [--samples 20000] [--seed 7] [--ephe-path ephe]
+"""
+
+import argparse
+import random
+import time
+
+import swisseph as swe
+
+from starfinal import KundaliGenerator, EPHE_PATH
+
+JD_1900 = swe.julday(1900, 1, 1, 0.0)
+JD_2100 = swe.julday(2100, 1, 1, 0.0)
+
+
+def sidereal_positions(generator, jds):
+    """Sidereal longitudes for every sampled moment and planet"""
+    positions = []
+    for jd in jds:
+        ayanamsa = generator.get_ayanamsa(jd)
+        positions.append([
+            (generator.calculate_planet_position(planet_id, jd) - ayanamsa) % 360
+            for planet_id, name in generator.planets.items()
+            if name != "Ketu"
+        ])
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=20000, help="Random moments to compare")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--ephe-path", type=str, default=str(EPHE_PATH), help="Folder with .se1 files")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    jds = [rng.uniform(JD_1900, JD_2100) for _ in range(args.samples)]
+
+    results = {}
+    for mode in ("moshier", "swiss"):
+        try:
+            generator = KundaliGenerator(ephemeris=mode, ephe_path=args.ephe_path)
+        except RuntimeError as e:
+            print(f"{mode:8s} skipped: {e}")
+            continue
+
+        t0 = time.perf_counter()
+        results[mode] = sidereal_positions(generator, jds)
+        elapsed = time.perf_counter() - t0
+        n_calcs = args.samples * len(results[mode][0])
+        print(f"{mode:8s} {elapsed:8.2f}s  {n_calcs / elapsed:12,.0f} positions/s")
+
+    if len(results) < 2:
+        print("Accuracy comparison needs both modes.")
+        return
+
+    generator = KundaliGenerator(ephemeris="moshier")
+    names = [n for n in generator.planets.values() if n != "Ketu"]
+    nakshatra_diff = {n: 0 for n in names}
+    pada_diff = {n: 0 for n in names}
+    max_arcsec = {n: 0.0 for n in names}
+
+    for fast_row, precise_row in zip(results["moshier"], results["swiss"]):
+        for name, fast, precise in zip(names, fast_row, precise_row):
+            fast_nak, fast_pada = generator.get_nakshatra(fast)
+            precise_nak, precise_pada = generator.get_nakshatra(precise)
+            if fast_nak != precise_nak:
+                nakshatra_diff[name] += 1
+            if (fast_nak, fast_pada) != (precise_nak, precise_pada):
+                pada_diff[name] += 1
+            delta = abs((fast - precise + 180) % 360 - 180) * 3600
+            max_arcsec[name] = max(max_arcsec[name], delta)
+
+    print(f"\n{'planet':10s} {'nakshatra diff':>15s} {'pada diff':>10s} {'max diff (arcsec)':>18s}")
+    for name in names:
+        print(f"{name:10s} {nakshatra_diff[name]:>15d} {pada_diff[name]:>10d} {max_arcsec[name]:>18.2f}")
+    print(f"\nSamples: {args.samples}")
+
+
+if __name__ == "__main__":
+    main()
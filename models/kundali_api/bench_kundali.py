@@ -0,0 +1,280 @@
+"""
+bench_kundali.py
+
+Reproducible kundali benchmark over the fixed corpus in data/bench_corpus.csv.
+Geocoding is stubbed with the offline city list, so it runs without network.
+
+Reports:
+  - per-stage latency (geocode, tz, ephemeris, houses, analysis, serialization)
+  - charts/sec in single mode (one chart at a time) and batch mode (process pool)
+  - peak RSS
+
+Usage:
+  python bench_kundali.py --out bench_results.json
+  python bench_kundali.py --baseline data/bench_baseline.json --threshold 0.15
+
+With --baseline the script exits with status 1 when the p50 of the whole
+chart or of a stage is worse than the baseline by more than --threshold,
+or throughput by more than --throughput-threshold. Latencies must also
+grow by at least --min-delta-ms, so stages that take microseconds (geocode
+stub, houses) do not fail on noise. Throughput is the median over the
+--repeat passes, and its default threshold sits above the run-to-run
+spread seen on a shared runner (up to about 30%).
+
+CI runs against the committed baseline, recorded with --repeat 3 --workers 1:
+  python bench_kundali.py --repeat 3 --workers 1 --baseline data/bench_baseline.json
+Re-record it (same flags, --out data/bench_baseline.json) when a change is
+meant to move the numbers or the CI machine changes.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+from pathlib import Path
+
+import places
+from starfinal import KundaliGenerator
+
+BASE_DIR = Path(__file__).parent
+CORPUS_PATH = BASE_DIR / "data" / "bench_corpus.csv"
+# Smallest p50 increase that counts as a regression, whatever the percentage
+MIN_DELTA_MS = 0.5
+# Allowed throughput drop; whole-run charts/s varies more than per-chart p50
+THROUGHPUT_THRESHOLD = 0.35
+
+PERSONALITY_TRAITS = {
+    "creative": 6, "analytical": 8, "technical": 7, "leadership": 5,
+    "communication": 6, "healing": 4, "business": 5
+}
+
+# Generator methods timed for each stage
+STAGE_METHODS = {
+    "geocode": ["get_coordinates"],
+    "tz": ["get_timezone"],
+    "ephemeris": ["get_ayanamsa", "calculate_planet_position"],
+    "houses": ["calculate_ascendant", "calculate_houses"],
+    "analysis": ["analyze_career_potential"],
+}
+STAGES = list(STAGE_METHODS) + ["serialization"]
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def make_generator():
+    """KundaliGenerator with geocoding served from the offline city list"""
+    generator = KundaliGenerator()
+    index = places.load_place_index(places.DEFAULT_PLACES_PATH)
+    by_name = {places.normalize_place_name(p["name"]): p for p in index.places.values()}
+
+    def get_coordinates(place_name):
+        place = by_name.get(places.normalize_place_name(place_name))
+        if place is None:
+            return None, None
+        return place["latitude"], place["longitude"]
+
+    generator.get_coordinates = get_coordinates
+    return generator
+
+
+def instrument(generator, timings):
+    """Wrap the stage methods so each call adds its duration to `timings`"""
+    for stage, methods in STAGE_METHODS.items():
+        for name in methods:
+            original = getattr(generator, name)
+
+            def timed(*args, _original=original, _stage=stage, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return _original(*args, **kwargs)
+                finally:
+                    timings[_stage] += time.perf_counter() - t0
+
+            setattr(generator, name, timed)
+
+
+def run_chart(generator, row):
+    result = generator.generate_kundali(
+        birth_date=row["birth_date"],
+        birth_time=row["birth_time"],
+        birth_place=row["birth_place"],
+        personality_traits=PERSONALITY_TRAITS
+    )
+    if "error" in result:
+        raise RuntimeError(f"{row}: {result['error']}")
+    return result
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 4),
+    }
+
+
+def bench_single(corpus, repeat):
+    generator = make_generator()
+    stage_samples = defaultdict(list)
+    total_samples = []
+
+    # Warm-up: first TimezoneFinder / swisseph calls load data files
+    run_chart(generator, corpus[0])
+
+    timings = defaultdict(float)
+    instrument(generator, timings)
+
+    pass_rates = []
+    for _ in range(repeat):
+        pass_samples = []
+        for row in corpus:
+            timings.clear()
+            t0 = time.perf_counter()
+            result = run_chart(generator, row)
+            t1 = time.perf_counter()
+            json.dumps(result, ensure_ascii=False)
+            timings["serialization"] = time.perf_counter() - t1
+            pass_samples.append(time.perf_counter() - t0)
+            for stage in STAGES:
+                stage_samples[stage].append(timings[stage])
+        total_samples.extend(pass_samples)
+        pass_rates.append(len(pass_samples) / sum(pass_samples))
+
+    return {
+        "charts": len(total_samples),
+        "charts_per_sec": round(statistics.median(pass_rates), 2),
+        "total": summarize(total_samples),
+        "stages": {stage: summarize(stage_samples[stage]) for stage in STAGES},
+    }
+
+
+_worker_generator = None
+
+
+def _init_worker():
+    global _worker_generator
+    _worker_generator = make_generator()
+
+
+def _worker_chart(row):
+    return len(json.dumps(run_chart(_worker_generator, row), ensure_ascii=False))
+
+
+def bench_batch(corpus, repeat, workers):
+    pass_rates = []
+    with Pool(workers, initializer=_init_worker) as pool:
+        pool.map(_worker_chart, corpus[:workers])  # warm-up
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            pool.map(_worker_chart, corpus, chunksize=max(1, len(corpus) // (workers * 4)))
+            pass_rates.append(len(corpus) / (time.perf_counter() - t0))
+    return {
+        "charts": len(corpus) * repeat,
+        "workers": workers,
+        "charts_per_sec": round(statistics.median(pass_rates), 2),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return {"main_mb": round(own, 1), "worker_max_mb": round(children, 1)}
+
+
+def compare(results, baseline, threshold, min_delta_ms=MIN_DELTA_MS, throughput_threshold=THROUGHPUT_THRESHOLD):
+    """Return human-readable regressions: p50 beyond `threshold` (fraction) and `min_delta_ms`,
+    throughput beyond `throughput_threshold`"""
+    regressions = []
+
+    for stage in ["total"] + STAGES:
+        base = (baseline["single"]["stages"].get(stage) if stage != "total"
+                else baseline["single"]["total"])
+        new = results["single"]["stages"][stage] if stage != "total" else results["single"]["total"]
+        if not base or base["p50_ms"] <= 0:
+            continue
+        change = new["p50_ms"] / base["p50_ms"] - 1
+        if new["p50_ms"] - base["p50_ms"] > max(threshold * base["p50_ms"], min_delta_ms):
+            regressions.append(f"{stage} p50 {base['p50_ms']:.3f} -> {new['p50_ms']:.3f} ms (+{change:.0%})")
+
+    for mode in ("single", "batch"):
+        base = baseline.get(mode, {}).get("charts_per_sec")
+        new = results.get(mode, {}).get("charts_per_sec")
+        if base and new:
+            change = 1 - new / base
+            if change > throughput_threshold:
+                regressions.append(f"{mode} throughput {base:.1f} -> {new:.1f} charts/s (-{change:.0%})")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=str(CORPUS_PATH))
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for batch mode")
+    parser.add_argument("--no-batch", action="store_true", help="Skip the batch (process pool) run")
+    parser.add_argument("--out", type=str, default="bench_results.json", help="Where to write JSON results")
+    parser.add_argument("--baseline", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed regression as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="Latency increases below this are never regressions")
+    parser.add_argument("--throughput-threshold", type=float, default=THROUGHPUT_THRESHOLD,
+                        help="Allowed throughput drop as a fraction")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    results = {
+        "meta": {
+            "corpus": Path(args.corpus).name,
+            "corpus_size": len(corpus),
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "single": bench_single(corpus, args.repeat),
+    }
+    if not args.no_batch:
+        results["batch"] = bench_batch(corpus, args.repeat, args.workers)
+    results["peak_rss"] = peak_rss_mb()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    single = results["single"]
+    print(f"single: {single['charts_per_sec']} charts/s  (p50 {single['total']['p50_ms']} ms)")
+    for stage in STAGES:
+        s = single["stages"][stage]
+        print(f"  {stage:14s} p50 {s['p50_ms']:9.4f} ms  p95 {s['p95_ms']:9.4f} ms")
+    if "batch" in results:
+        print(f"batch:  {results['batch']['charts_per_sec']} charts/s with {results['batch']['workers']} workers")
+    print(f"peak RSS: {results['peak_rss']}")
+    print("Results written to", args.out)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms,
+                              args.throughput_threshold)
+        if regressions:
+            print(f"\nRegressions against {args.baseline}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
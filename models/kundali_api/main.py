@@ -1,40 +1,196 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
-from starlette.responses import JSONResponse
+from datetime import date, datetime, time, timedelta
+import os
+import pytz
+from starlette.responses import JSONResponse, StreamingResponse
+import json
 
 app = FastAPI(title="NavRiti Kundali API (standalone)")
 
 # Lazy-initialized generator to avoid importing heavy deps at module import time
 kundali_generator: Optional[Any] = None
+# Lazy-initialized offline place index (built on first use)
+place_index: Optional[Any] = None
 
 class KundaliInput(BaseModel):
     birth_date: str = Field(..., description="YYYY-MM-DD")
     birth_time: str = Field(..., description="HH:MM (24h)")
-    birth_place: str = Field(...)
+    birth_place: Optional[str] = Field(None, description="Free-text place name (geocoded)")
+    place_id: Optional[str] = Field(None, description="Id from /places/suggest; skips geocoding")
     personality_traits: Optional[Dict[str, int]] = None
 
-@app.get("/health")
-def health():
-    return {"status": "ok", "kundali_ready": kundali_generator is not None}
+def get_place_index():
+    global place_index
+    if place_index is None:
+        try:
+            import places
+            place_index = places.load_place_index()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to load place index: {e}")
+    return place_index
 
-@app.post("/kundali")
-def kundali(payload: KundaliInput):
+def get_generator():
     global kundali_generator
     if kundali_generator is None:
         try:
             import starfinal
             kundali_generator = starfinal.KundaliGenerator()
+        except RuntimeError as e:
+            # KUNDALI_EPHEMERIS=swiss without the ephemeris files
+            raise HTTPException(status_code=503, detail=f"Ephemeris unavailable: {e}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to initialize KundaliGenerator: {e}")
+    return kundali_generator
+
+def resolve_location(place_id, birth_place):
+    """(lat, lon, tz_name) from a place id, or by geocoding a place name"""
+    if place_id is not None:
+        place = get_place_index().get(place_id)
+        if place is None:
+            raise HTTPException(status_code=404, detail=f"Unknown place_id: {place_id}")
+        return place["latitude"], place["longitude"], place["timezone"]
+
+    if birth_place:
+        generator = get_generator()
+        lat, lon = generator.get_coordinates(birth_place)
+        if lat is None or lon is None:
+            raise HTTPException(status_code=404, detail="Could not find location")
+        return lat, lon, generator.get_timezone(lat, lon)
+
+    raise HTTPException(status_code=422, detail="Either birth_place or place_id is required")
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "kundali_ready": kundali_generator is not None,
+        "ephemeris": (
+            kundali_generator.ephemeris_mode if kundali_generator is not None
+            else os.getenv("KUNDALI_EPHEMERIS", "moshier").lower()
+        ),
+        "places_loaded": len(place_index) if place_index is not None else 0
+    }
+
+@app.get("/places/suggest")
+def suggest_places(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=25)):
+    import places
+    index = get_place_index()
+    return {
+        "query": q,
+        "results": [places.place_to_dict(p) for p in index.suggest(q, limit=limit)]
+    }
+
+@app.post("/kundali")
+def kundali(payload: KundaliInput):
+    generator = get_generator()
+    lat, lon, tz_name = resolve_location(payload.place_id, payload.birth_place)
+    birth_place = payload.birth_place
+    if payload.place_id is not None and not birth_place:
+        place = get_place_index().get(payload.place_id)
+        birth_place = f"{place['name']}, {place['country']}"
 
     try:
-        result = kundali_generator.generate_kundali(
+        result = generator.generate_kundali(
             birth_date=payload.birth_date,
             birth_time=payload.birth_time,
-            birth_place=payload.birth_place,
-            personality_traits=payload.personality_traits
+            birth_place=birth_place,
+            personality_traits=payload.personality_traits,
+            lat=lat,
+            lon=lon,
+            tz_name=tz_name
         )
         return JSONResponse(content=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/kundali/dasha")
+def kundali_dasha(
+    birth_date: str = Query(..., description="YYYY-MM-DD"),
+    birth_time: str = Query(..., description="HH:MM (24h)"),
+    place_id: Optional[str] = Query(None),
+    birth_place: Optional[str] = Query(None),
+    from_date: Optional[date] = Query(None, alias="from", description="Window start, defaults to birth"),
+    to_date: Optional[date] = Query(None, alias="to", description="Window end, defaults to birth + 120 years")
+):
+    generator = get_generator()
+    _, _, tz_name = resolve_location(place_id, birth_place)
+
+    start = datetime.combine(from_date, time.min, tzinfo=pytz.UTC) if from_date else None
+    end = datetime.combine(to_date, time.min, tzinfo=pytz.UTC) if to_date else None
+
+    try:
+        periods = generator.get_dasha_timeline(birth_date, birth_time, tz_name, start, end)
+    except (ValueError, RuntimeError) as e:
+        # RuntimeError: date outside the installed Swiss Ephemeris files
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {
+        "system": "vimshottari",
+        "ephemeris": generator.ephemeris_mode,
+        "timezone": tz_name,
+        "periods": periods
+    }
+
+@app.get("/kundali/transits")
+def kundali_transits(
+    birth_date: str = Query(..., description="YYYY-MM-DD"),
+    birth_time: str = Query(..., description="HH:MM (24h)"),
+    place_id: Optional[str] = Query(None),
+    birth_place: Optional[str] = Query(None),
+    from_date: Optional[date] = Query(None, alias="from", description="Range start, defaults to today"),
+    to_date: Optional[date] = Query(None, alias="to", description="Range end, defaults to five years after start"),
+    step_days: float = Query(1.0, alias="step", ge=0.25, le=30, description="Sampling step in days"),
+    planets: str = Query("Saturn,Jupiter", description="Comma-separated planet names")
+):
+    """Stream transit events over natal houses as NDJSON, one event per line"""
+    import swisseph as swe
+
+    generator = get_generator()
+    lat, lon, tz_name = resolve_location(place_id, birth_place)
+
+    start = from_date or date.today()
+    end = to_date or start + timedelta(days=round(5 * 365.25))
+    if end <= start:
+        raise HTTPException(status_code=422, detail="'to' must be after 'from'")
+    if (end - start).days > 100 * 366:
+        raise HTTPException(status_code=422, detail="Range is limited to 100 years")
+
+    planet_names = tuple(p.strip().capitalize() for p in planets.split(",") if p.strip())
+    try:
+        natal_houses = generator.get_natal_houses(birth_date, birth_time, lat, lon, tz_name)
+        events = generator.iter_transit_events(
+            natal_houses,
+            swe.julday(start.year, start.month, start.day, 0.0),
+            swe.julday(end.year, end.month, end.day, 0.0),
+            step_days=step_days,
+            planets=planet_names
+        )
+        # Pull the first event eagerly so bad planet names fail as 422, not mid-stream
+        first = next(events, None)
+    except (ValueError, RuntimeError) as e:
+        # RuntimeError: date outside the installed Swiss Ephemeris files
+        raise HTTPException(status_code=422, detail=str(e))
+
+    def stream():
+        yield json.dumps({
+            "event": "start",
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "step_days": step_days,
+            "planets": list(planet_names),
+            "ephemeris": generator.ephemeris_mode
+        }) + "\n"
+        if first is not None:
+            yield json.dumps(first) + "\n"
+            try:
+                for event in events:
+                    yield json.dumps(event) + "\n"
+            except RuntimeError as e:
+                # Headers are already sent; report ephemeris gaps in the stream
+                yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+                return
+        yield json.dumps({"event": "end"}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
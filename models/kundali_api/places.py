@@ -0,0 +1,155 @@
+import csv
+import os
+import unicodedata
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_PLACES_PATH = BASE_DIR / "data" / "cities.csv"
+
+# Override with a GeoNames dump (e.g. cities15000.txt) for full coverage
+PLACES_PATH = Path(os.getenv("KUNDALI_PLACES_FILE", DEFAULT_PLACES_PATH))
+
+# Prefix buckets only keep the best-ranked matches, so a lookup is a
+# single dict access no matter how many cities share the prefix.
+MAX_SUGGESTIONS = 25
+MAX_PREFIX_LENGTH = 24
+
+
+def normalize_place_name(text):
+    """Lowercase, strip accents and collapse punctuation/whitespace"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    cleaned = []
+    for ch in text.lower():
+        cleaned.append(ch if ch.isalnum() else " ")
+    return " ".join("".join(cleaned).split())
+
+
+class PlaceIndex:
+    def __init__(self, places):
+        """
+        places: iterable of dicts with id, name, country, latitude,
+        longitude, timezone, population and an optional alt_names list
+        """
+        self.places = {}
+        buckets = {}
+
+        for place in places:
+            place_id = place["id"]
+            self.places[place_id] = place
+
+            keys = set()
+            for name in [place["name"], *place.get("alt_names", [])]:
+                key = normalize_place_name(name)
+                if not key:
+                    continue
+                keys.add(key)
+                # Allow "new york" to be found from "york" as well
+                words = key.split(" ")
+                for i in range(1, len(words)):
+                    keys.add(" ".join(words[i:]))
+
+            prefixes = set()
+            for key in keys:
+                for end in range(1, min(len(key), MAX_PREFIX_LENGTH) + 1):
+                    prefixes.add(key[:end])
+            for prefix in prefixes:
+                buckets.setdefault(prefix, []).append(place_id)
+
+        # Rank every bucket once, by population, and keep only the head
+        self.prefix_index = {
+            prefix: tuple(sorted(
+                ids,
+                key=lambda pid: (-self.places[pid]["population"], self.places[pid]["name"])
+            )[:MAX_SUGGESTIONS])
+            for prefix, ids in buckets.items()
+        }
+
+    def __len__(self):
+        return len(self.places)
+
+    def get(self, place_id):
+        """Return the place for an id, or None"""
+        return self.places.get(place_id)
+
+    def suggest(self, query, limit=10):
+        """Return up to `limit` places whose name starts with `query`"""
+        key = normalize_place_name(query)
+        if not key:
+            return []
+
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        ids = self.prefix_index.get(key[:MAX_PREFIX_LENGTH], ())
+
+        if len(key) > MAX_PREFIX_LENGTH:
+            # Very long queries: narrow the capped bucket by the full key
+            ids = [
+                pid for pid in ids
+                if any(
+                    normalize_place_name(n).startswith(key)
+                    for n in [self.places[pid]["name"], *self.places[pid].get("alt_names", [])]
+                )
+            ]
+
+        return [self.places[pid] for pid in ids[:limit]]
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load the bundled city list (see data/cities.csv)"""
+        places = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                places.append({
+                    "id": row["id"],
+                    "name": row["name"],
+                    "alt_names": [n for n in row.get("alt_names", "").split("|") if n],
+                    "country": row["country"],
+                    "latitude": float(row["latitude"]),
+                    "longitude": float(row["longitude"]),
+                    "timezone": row["timezone"],
+                    "population": int(row["population"] or 0),
+                })
+        return cls(places)
+
+    @classmethod
+    def from_geonames(cls, path):
+        """Load a GeoNames tab-separated dump such as cities15000.txt"""
+        places = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 18:
+                    continue
+                places.append({
+                    "id": cols[0],
+                    "name": cols[1],
+                    # asciiname only; the full alternatenames column is huge
+                    "alt_names": [cols[2]] if cols[2] != cols[1] else [],
+                    "country": cols[8],
+                    "latitude": float(cols[4]),
+                    "longitude": float(cols[5]),
+                    "timezone": cols[17],
+                    "population": int(cols[14] or 0),
+                })
+        return cls(places)
+
+
+def load_place_index(path=PLACES_PATH):
+    """Build the index from a .csv city list or a GeoNames .txt dump"""
+    path = Path(path)
+    if path.suffix == ".txt":
+        return PlaceIndex.from_geonames(path)
+    return PlaceIndex.from_csv(path)
+
+
+def place_to_dict(place):
+    """Public representation of a place (drops the alternate names)"""
+    return {
+        "id": place["id"],
+        "name": place["name"],
+        "country": place["country"],
+        "latitude": place["latitude"],
+        "longitude": place["longitude"],
+        "timezone": place["timezone"],
+        "population": place["population"],
+    }
@@ -1,14 +1,41 @@
+import os
+from pathlib import Path
 import swisseph as swe
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
 from geopy.geocoders import Nominatim
 from timezonefinder import TimezoneFinder
 import pytz
 
-# Initialize Swiss Ephemeris
-swe.set_ephe_path('/usr/share/ephe')  # Set path for ephemeris files
+# ---------- Ephemeris backend ----------
+# "moshier": built-in analytic model, no files, fast (bulk / low precision)
+# "swiss":   Swiss Ephemeris .se1 files from EPHE_PATH (precision mode)
+EPHEMERIS_FLAGS = {
+    "moshier": swe.FLG_MOSEPH,
+    "swiss": swe.FLG_SWIEPH
+}
+# Planets + Moon for 1800-2399, which covers the supported 1900-2100 range
+EPHEMERIS_FILES = ["sepl_18.se1", "semo_18.se1"]
+
+EPHEMERIS_MODE = os.getenv("KUNDALI_EPHEMERIS", "moshier").lower()
+EPHE_PATH = Path(os.getenv("KUNDALI_EPHE_PATH", Path(__file__).parent / "ephe"))
 
 class KundaliGenerator:
-    def __init__(self):
+    def __init__(self, ephemeris=None, ephe_path=None):
+        self.ephemeris_mode = (ephemeris or EPHEMERIS_MODE).lower()
+        if self.ephemeris_mode not in EPHEMERIS_FLAGS:
+            raise ValueError(
+                f"Unknown ephemeris mode '{self.ephemeris_mode}', expected one of {sorted(EPHEMERIS_FLAGS)}"
+            )
+        self.ephemeris_flag = EPHEMERIS_FLAGS[self.ephemeris_mode]
+
+        if self.ephemeris_mode == "swiss":
+            ephe_path = Path(ephe_path or EPHE_PATH)
+            missing = [f for f in EPHEMERIS_FILES if not (ephe_path / f).exists()]
+            if missing:
+                raise RuntimeError(f"Ephemeris files missing from {ephe_path}: {missing}")
+            swe.set_ephe_path(str(ephe_path))
+
         self.nakshatras = [
             "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashira", "Ardra",
             "Punarvasu", "Pushya", "Ashlesha", "Magha", "Purva Phalguni", "Uttara Phalguni",
@@ -111,6 +138,16 @@ class KundaliGenerator:
             "healing": ["Medicine", "Psychology", "Social Work"],
             "business": ["Business", "Entrepreneurship", "Sales", "Finance"]
         }
+        # Vimshottari mahadasha lords and their lengths in years (total 120).
+        # Nakshatra lords repeat in this order starting from Ashwini.
+        self.dasha_sequence = [
+            ("Ketu", 7), ("Venus", 20), ("Sun", 6), ("Moon", 10), ("Mars", 7),
+            ("Rahu", 18), ("Jupiter", 16), ("Saturn", 19), ("Mercury", 17)
+        ]
+        self.days_per_year = 365.25
+
+        # Per-chart dasha anchors, keyed on (birth_date, birth_time, tz_name)
+        self.get_dasha_anchor = lru_cache(maxsize=4096)(self._dasha_anchor)
 
     
     def get_coordinates(self, place_name):
@@ -139,10 +176,17 @@ class KundaliGenerator:
         swe.set_sid_mode(swe.SIDM_LAHIRI)  # Lahiri ayanamsa
         return swe.get_ayanamsa(jd)
     
+    def calc_position(self, jd, planet_id, extra_flags=0):
+        """swe.calc_ut in the configured ephemeris mode (full result tuple)"""
+        result, ret_flag = swe.calc_ut(jd, planet_id, self.ephemeris_flag | extra_flags)
+        if self.ephemeris_flag == swe.FLG_SWIEPH and not ret_flag & swe.FLG_SWIEPH:
+            # swisseph quietly drops to Moshier when a file is missing or out of range
+            raise RuntimeError(f"Swiss Ephemeris files do not cover JD {jd:.1f}")
+        return result
+
     def calculate_planet_position(self, planet_id, jd):
         """Calculate planet position"""
-        result = swe.calc_ut(jd, planet_id)
-        longitude = result[0][0]
+        longitude = self.calc_position(jd, planet_id)[0]
         return longitude
     
     def get_nakshatra(self, longitude):
@@ -220,6 +264,162 @@ class KundaliGenerator:
                     return i + 1
         return 1
     
+    def birth_to_utc(self, birth_date, birth_time, tz_name):
+        """Local birth date/time strings to an aware UTC datetime"""
+        tz = pytz.timezone(tz_name)
+        dt_naive = datetime.strptime(f"{birth_date} {birth_time}", "%Y-%m-%d %H:%M")
+        return tz.localize(dt_naive).astimezone(pytz.UTC)
+
+    def _dasha_anchor(self, birth_date, birth_time, tz_name):
+        """Birth moment in UTC and the Moon's sidereal longitude"""
+        dt_utc = self.birth_to_utc(birth_date, birth_time, tz_name)
+
+        jd = self.calculate_julian_day(dt_utc, None, None)
+        ayanamsa = self.get_ayanamsa(jd)
+        moon_sidereal = (self.calculate_planet_position(swe.MOON, jd) - ayanamsa) % 360
+        return dt_utc, moon_sidereal
+
+    def iter_dasha_periods(self, birth_utc, moon_longitude, start=None, end=None):
+        """
+        Lazily yield Vimshottari antardasha periods overlapping [start, end).
+
+        The first mahadasha is the lord of the Moon's nakshatra, already
+        partly elapsed at birth. The generator jumps straight to the
+        mahadasha containing `start`, so a window costs the same whether it
+        is one year or eighty years after birth.
+        """
+        total_years = sum(years for _, years in self.dasha_sequence)
+        cycle_days = total_years * self.days_per_year
+        nakshatra_span = 360 / 27
+
+        nakshatra_num = min(int(moon_longitude / nakshatra_span), 26)
+        first_lord = nakshatra_num % len(self.dasha_sequence)
+        elapsed = (moon_longitude - nakshatra_num * nakshatra_span) / nakshatra_span
+
+        first_years = self.dasha_sequence[first_lord][1]
+        cycle_start = birth_utc - timedelta(days=elapsed * first_years * self.days_per_year)
+
+        if start is None:
+            start = birth_utc
+        if end is None:
+            end = birth_utc + timedelta(days=cycle_days)
+        if start >= end:
+            return
+
+        # Skip whole 120-year cycles, then at most nine mahadashas
+        offset_days = max(0.0, (start - cycle_start).total_seconds() / 86400)
+        cycles = int(offset_days // cycle_days)
+        md_start = cycle_start + timedelta(days=cycles * cycle_days)
+        index = first_lord
+        while True:
+            md_days = self.dasha_sequence[index][1] * self.days_per_year
+            if md_start + timedelta(days=md_days) > start:
+                break
+            md_start += timedelta(days=md_days)
+            index = (index + 1) % len(self.dasha_sequence)
+
+        while md_start < end:
+            md_lord, md_years = self.dasha_sequence[index]
+            ad_start = md_start
+            for step in range(len(self.dasha_sequence)):
+                ad_lord, ad_years = self.dasha_sequence[(index + step) % len(self.dasha_sequence)]
+                ad_end = ad_start + timedelta(days=md_years * ad_years / total_years * self.days_per_year)
+                if ad_start >= end:
+                    return
+                if ad_end > start:
+                    yield {
+                        "mahadasha": md_lord,
+                        "antardasha": ad_lord,
+                        "start": ad_start,
+                        "end": ad_end
+                    }
+                ad_start = ad_end
+
+            md_start += timedelta(days=md_years * self.days_per_year)
+            index = (index + 1) % len(self.dasha_sequence)
+
+    def get_dasha_timeline(self, birth_date, birth_time, tz_name, start=None, end=None):
+        """Vimshottari antardashas for a date window, ready for JSON"""
+        birth_utc, moon_longitude = self.get_dasha_anchor(birth_date, birth_time, tz_name)
+        return [
+            {
+                **period,
+                "start": period["start"].date().isoformat(),
+                "end": period["end"].date().isoformat()
+            }
+            for period in self.iter_dasha_periods(birth_utc, moon_longitude, start, end)
+        ]
+
+    def get_natal_houses(self, birth_date, birth_time, lat, lon, tz_name):
+        """Sidereal house cusps of the birth chart"""
+        dt_utc = self.birth_to_utc(birth_date, birth_time, tz_name)
+        jd = self.calculate_julian_day(dt_utc, lat, lon)
+        ayanamsa = self.get_ayanamsa(jd)
+        return [(h - ayanamsa) % 360 for h in self.calculate_houses(jd, lat, lon)]
+
+    def iter_transit_events(self, natal_houses, start_jd, end_jd, step_days=1.0,
+                            planets=("Saturn", "Jupiter"), chunk_size=256):
+        """
+        Yield transit events for `planets` between two Julian days.
+
+        Positions are sampled every `step_days` in chunks of `chunk_size`
+        steps, and only the previous sample per planet is kept between
+        chunks, so memory does not grow with the length of the range.
+        Events are reported on the first sample where the change is seen:
+        enters_house (natal house), enters_sign, changes_nakshatra and
+        retrograde_station / direct_station (sign change of daily motion).
+        """
+        planet_ids = {name: pid for pid, name in self.planets.items() if name != "Ketu"}
+        unknown = [p for p in planets if p not in planet_ids]
+        if unknown:
+            raise ValueError(f"Unsupported transit planets: {unknown}")
+
+        swe.set_sid_mode(swe.SIDM_LAHIRI)
+        n_steps = int((end_jd - start_jd) / step_days) + 1
+        previous = {}
+
+        for chunk_start in range(0, n_steps, chunk_size):
+            chunk_jds = [start_jd + i * step_days for i in range(chunk_start, min(chunk_start + chunk_size, n_steps))]
+            ayanamsas = [swe.get_ayanamsa(jd) for jd in chunk_jds]
+
+            # Compute the whole chunk first, then scan it in time order
+            rows = [
+                [(jd, name, self.calc_position(jd, planet_ids[name], swe.FLG_SPEED), ayanamsa) for name in planets]
+                for jd, ayanamsa in zip(chunk_jds, ayanamsas)
+            ]
+
+            for row in rows:
+                for jd, name, result, ayanamsa in row:
+                    longitude = (result[0] - ayanamsa) % 360
+                    state = {
+                        "house": self.get_house_for_planet(longitude, natal_houses),
+                        "sign": int(longitude / 30),
+                        "nakshatra": int(longitude * 27 / 360),
+                        "retrograde": result[3] < 0
+                    }
+
+                    prev = previous.get(name)
+                    previous[name] = state
+                    if prev is None:
+                        continue
+
+                    year, month, day, _ = swe.revjul(jd)
+                    base = {
+                        "date": f"{year:04d}-{month:02d}-{day:02d}",
+                        "planet": name,
+                        "longitude": round(longitude, 4)
+                    }
+                    if state["house"] != prev["house"]:
+                        yield {**base, "event": "enters_house", "from": prev["house"], "to": state["house"]}
+                    if state["sign"] != prev["sign"]:
+                        yield {**base, "event": "enters_sign",
+                               "from": self.rashis[prev["sign"]], "to": self.rashis[state["sign"]]}
+                    if state["nakshatra"] != prev["nakshatra"]:
+                        yield {**base, "event": "changes_nakshatra",
+                               "from": self.nakshatras[prev["nakshatra"]], "to": self.nakshatras[state["nakshatra"]]}
+                    if state["retrograde"] != prev["retrograde"]:
+                        yield {**base, "event": "retrograde_station" if state["retrograde"] else "direct_station"}
+
     def analyze_career_potential(self, planets_data, houses_sidereal, asc_nakshatra, personality_traits):
         """Analyze career potential based on nakshatras and house placements"""
         career_analysis = {
@@ -322,21 +522,28 @@ class KundaliGenerator:
         
         return career_analysis
     
-    def generate_kundali(self, birth_date, birth_time, birth_place, personality_traits=None):
+    def generate_kundali(self, birth_date, birth_time, birth_place, personality_traits=None,
+                         lat=None, lon=None, tz_name=None):
         """Generate complete kundali.
 
         If `personality_traits` (dict) is provided, it will be used directly.
         Otherwise the method falls back to interactive `get_personality_traits()`.
+
+        If `lat`, `lon` and `tz_name` are all provided (e.g. from a resolved
+        place id), geocoding and timezone lookup are skipped.
         """
 
         try:
-            # Get coordinates
-            lat, lon = self.get_coordinates(birth_place)
-            if lat is None or lon is None:
-                return {"error": "Could not find location"}
-            
-            # Get timezone and create datetime
-            tz_name = self.get_timezone(lat, lon)
+            if lat is None or lon is None or tz_name is None:
+                # Get coordinates
+                lat, lon = self.get_coordinates(birth_place)
+                if lat is None or lon is None:
+                    return {"error": "Could not find location"}
+
+                # Get timezone
+                tz_name = self.get_timezone(lat, lon)
+
+            # Create datetime
             tz = pytz.timezone(tz_name)
             
             # Parse input
@@ -408,6 +615,7 @@ class KundaliGenerator:
                     "timezone": tz_name
                 },
                 "ayanamsa": f"{ayanamsa:.2f}°",
+                "ephemeris": self.ephemeris_mode,
                 "ascendant": {
                     "longitude": asc_sidereal,
                     "rashi": self.get_rashi(asc_sidereal)[0],
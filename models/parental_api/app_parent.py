@@ -1,46 +1,37 @@
+import hmac
+import math
 import os
-from pathlib import Path
-from typing import List, Dict, Any
-
-import pandas as pd
-import joblib
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-
-# ---------- NEW GOOGLE GENAI SDK ----------
-try:
-    # This is the correct import for the 'google-genai' package
-    from google import genai
-    from google.genai import types
-except ImportError:
-    print("Error: 'google-genai' not found. Run 'pip install google-genai'")
-
-# Initialize Client
-API_KEY = os.getenv("GOOGLE_API_KEY")
-client = genai.Client(api_key=API_KEY) if API_KEY else None
-
-# ---------- Paths ----------
-BASE_DIR = Path(__file__).parent
-DATA_PATH = BASE_DIR / "parent_only_synthetic_dataset.csv"
-MODEL_PATH = BASE_DIR / "models" / "parent_layer" / "parent_model_rf.joblib"
-PREPROCESSOR_PATH = BASE_DIR / "models" / "preprocessors" / "parent_preprocessor_coltransformer.joblib"
+import time
+from typing import List, Literal, Optional
+
+import numpy as np
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
+from pydantic import BaseModel, Field, ValidationError
+
+from model_registry import ModelBundle, ModelRegistry
+from parent_scoring import (
+    TOP_K,
+    attribute_careers,
+    rank_careers,
+    rank_careers_batch,
+    ranking_changes,
+)
+from parent_explanations import ExplanationJobs, gemini_prompt, local_explanation
+
+# Gemini explanations run in a bounded pool with a deadline (see parent_explanations.py)
+explanation_jobs = ExplanationJobs()
 
 # ---------- Load ML artifacts ----------
-try:
-    model = joblib.load(MODEL_PATH)
-    preprocessor = joblib.load(PREPROCESSOR_PATH)
-except Exception as e:
-    print(f"Warning: ML artifacts could not be loaded: {e}")
-
-# ---------- Load careers ----------
-careers_df = (
-    pd.read_csv(DATA_PATH)[
-        ["career_id", "c_avg_salary", "c_job_security", "c_prestige", "c_tuition", "c_location"]
-    ]
-    .drop_duplicates("career_id")
-)
+# Model, preprocessor, compiled forest and career catalog of one version,
+# replaced as a unit on reload (see model_registry.py)
+registry = ModelRegistry()
+registry.load()
+registry.watch()
 
-app = FastAPI(title="Parent Recommendation API", version="1.3")
+# Required in X-Admin-Token for /admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("PARENT_ADMIN_TOKEN")
+
+app = FastAPI(title="Parent Recommendation API", version="1.4")
 
 class ParentInput(BaseModel):
     budget_max_tuition: float = Field(..., ge=0)
@@ -53,120 +44,210 @@ class ParentInput(BaseModel):
     migration_allowed: bool
     unacceptable_careers: List[str] = []
 
-def normalize_likert(x: int) -> float:
-    return (x - 1) / 4.0
-
-def location_match(parent_pref: str, career_loc: str) -> int:
-    order = {"local": 0, "national": 1, "international": 2}
-    return int(order[career_loc] <= order[parent_pref])
-
-def to_percentage(score: int) -> str:
-    # Convert 1-5 scale to 0-100%
-    percentage = (score - 1) / 4 * 100
-    return f"{int(percentage)}%"
-
-def explain_with_gemini(career_id: str, score: float, context: Dict[str, Any],input: ParentInput) -> str:
-    if not client:
-        return "Recommended based on financial stability and prestige."
-
-    prompt = f"""
-    You are a professional career advisor for parents. 
-    Explain why the career '{career_id}' (Recommendation Score: {round(score, 2)}) is a great fit.
-    
-    Consider the following parent preferences in your explanation:
-    - Max Tuition Budget: {input.budget_max_tuition}
-    - Importance of Finances: {to_percentage(input.importance_finances)}
-    - Importance of Job Security: {to_percentage(input.importance_job_security)}
-    - Importance of Prestige: {to_percentage(input.importance_prestige)}
-    - Risk Tolerance: {to_percentage(input.parent_risk_tolerance)}
-    - Influence from others: {to_percentage(input.influence_from_people)}
-    - Location Preference: {input.location_preference}
-    - Migration Allowed: {"Yes" if input.migration_allowed else "No"}
-
-    Instructions:
-1. Provide the response in exactly 6 bullet points.
-2. Mention specific labels (High, Medium, or Low) based on the percentages provided.
-3. Strictly avoid using any bold text (no asterisks **).
-4. Use professional and encouraging language suitable for a customer-facing report.
-    """
-    
-    try:
-        # Correct syntax for the new google-genai SDK
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
-        return response.text.strip()
-    except Exception as e:
-        print(f"Gemini error: {e}")
-        return "This career aligns with your goals for long-term stability and professional prestige."
+class BatchParentInput(BaseModel):
+    parents: List[ParentInput] = Field(..., min_length=1)
+    top_k: int = Field(TOP_K, ge=1, le=50)
+    include_explanations: bool = False
+
+# Gemini is called once per parent when explanations are requested
+MAX_EXPLAINED_BATCH_PARENTS = 50
+
+LIKERT_FIELDS = [
+    "importance_finances", "importance_job_security", "importance_prestige",
+    "parent_risk_tolerance", "influence_from_people",
+]
+MAX_SWEEP_POINTS = 201
+
+class SweepInput(BaseModel):
+    base: ParentInput
+    parameter: Literal[
+        "budget_max_tuition", "importance_finances", "importance_job_security",
+        "importance_prestige", "parent_risk_tolerance", "influence_from_people",
+    ]
+    # Either explicit values, or start/stop/steps; Likert fields default to 1..5
+    values: Optional[List[float]] = Field(None, min_length=1, max_length=MAX_SWEEP_POINTS)
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    steps: int = Field(11, ge=2, le=MAX_SWEEP_POINTS)
 
-@app.post("/rescore-parent")
-async def rescore_parent(input: ParentInput):
-    # Process ML logic
-    parent_features = {
-        "p_financial_weight": normalize_likert(input.importance_finances),
-        "p_job_security_weight": normalize_likert(input.importance_job_security),
-        "p_prestige_weight": normalize_likert(input.importance_prestige),
-        "p_parent_risk_tolerance": normalize_likert(input.parent_risk_tolerance),
-        "p_weight_on_parent_layer": normalize_likert(input.influence_from_people),
-        "p_budget_max_tuition": input.budget_max_tuition,
-    }
+async def current_bundle(response: Response) -> ModelBundle:
+    """The bundle a request uses from start to finish, even if a reload swaps it meanwhile."""
+    bundle = registry.bundle
+    response.headers["X-Model-Version"] = bundle.model_version
+    return bundle
 
-    rows = []
-    career_ids = []
-    for _, c in careers_df.iterrows():
-        row = {
-            **parent_features,
-            "c_avg_salary": c.c_avg_salary,
-            "c_job_security": c.c_job_security,
-            "c_prestige": c.c_prestige,
-            "c_tuition": c.c_tuition,
-            "f_fin_ratio": c.c_avg_salary / max(1, input.budget_max_tuition * 3),
-            "f_tuition_affordable": int(c.c_tuition <= input.budget_max_tuition),
-            "f_location_match": location_match(input.location_preference, c.c_location),
-            "f_migration_ok": int(input.migration_allowed or c.c_location != "international"),
-            "f_is_unacceptable": int(c.career_id in input.unacceptable_careers),
-            "f_risk_penalty": 1.0
-        }
-        rows.append(row)
-        career_ids.append(c.career_id)
 
-    X = preprocessor.transform(pd.DataFrame(rows))
-    scores = model.predict(X)
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set PARENT_ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
-    all_results = sorted(
-        [{"career_id": career_ids[i], "parent_score": round(float(scores[i]), 3)} for i in range(len(scores))],
-        key=lambda x: x["parent_score"],
-        reverse=True
-    )
 
-    # 3. MANUALLY REMOVE unacceptable careers from the results
-    # We use a set for faster lookup and lower() for case-insensitivity
-    blocked = {str(c).lower().strip() for c in input.unacceptable_careers}
-    
-    filtered_results = [
-        res for res in all_results 
-        if str(res["career_id"]).lower() not in blocked
-    ]
+@app.get("/admin/model", dependencies=[Depends(require_admin)])
+def model_status():
+    return registry.status()
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+def reload_model(wait: bool = False, force: bool = False):
+    """Reload the registry's current version (force: even if it is already active).
+
+    Runs in the background unless `wait`; requests keep being served by the
+    active version until the new one has passed its smoke check.
+    """
+    if wait:
+        outcome = registry.reload(force=force)
+    else:
+        outcome = registry.reload_in_background(force=force)
+    return {**outcome, "active_version": registry.bundle.model_version}
+
+
+@app.get("/explanations/{explanation_id}")
+def get_explanation(explanation_id: str):
+    status = explanation_jobs.status(explanation_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation id")
+    return status
 
-    # 4. Handle edge case: what if everything was blocked?
+
+@app.post("/rescore-parent")
+async def rescore_parent(input: ParentInput, bundle: ModelBundle = Depends(current_bundle)):
+    # Process ML logic: vetoed careers are masked out before prediction
+    filtered_results = rank_careers(bundle.careers, input, bundle.model, bundle.preprocessor, compiled=bundle.compiled)
+
+    # Handle edge case: what if everything was blocked?
     if not filtered_results:
         raise HTTPException(status_code=400, detail="No acceptable careers found.")
 
+    # Grounded "why": per-feature contributions from the forest's decision paths
+    attributions = (
+        attribute_careers(bundle.careers, input, filtered_results, bundle.compiled)
+        if bundle.compiled is not None else None
+    )
+
     best = filtered_results[0]
-    explanation = explain_with_gemini(
-        best["career_id"], 
-        best["parent_score"], 
-        {"fin": input.importance_finances, "pre": input.importance_prestige},
-        input
+    # Waits for Gemini at most GEMINI_DEADLINE_SECONDS, then falls back to the
+    # local text; the Gemini version stays fetchable via /explanations/{id}
+    explanation = await explanation_jobs.explain(
+        gemini_prompt(best["career_id"], best["parent_score"], input),
+        local_explanation(bundle.careers.career(best["career_id"]), best["parent_score"], input)
     )
 
     return {
+        "model_version": bundle.model_version,
         "top_5_parent_scores": filtered_results[:5],
+        "attributions": attributions,
         "final_recommendation": {
             "career_id": best["career_id"],
             "parent_score": best["parent_score"],
-            "parent_explanation": explanation
+            **explanation
+        }
+    }
+
+@app.post("/rescore-parent/batch")
+def rescore_parent_batch(req: BatchParentInput, bundle: ModelBundle = Depends(current_bundle)):
+    if req.include_explanations and len(req.parents) > MAX_EXPLAINED_BATCH_PARENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Explanations are limited to {MAX_EXPLAINED_BATCH_PARENTS} parents per batch"
+        )
+
+    t0 = time.perf_counter()
+    ranked = rank_careers_batch(
+        bundle.careers, req.parents, bundle.model, bundle.preprocessor, k=req.top_k, compiled=bundle.compiled
+    )
+    elapsed = time.perf_counter() - t0
+
+    # A parent who vetoed every career gets no recommendation instead of failing the batch
+    results = [
+        {
+            "top_parent_scores": top,
+            "final_recommendation": {"career_id": top[0]["career_id"], "parent_score": top[0]["parent_score"]} if top else None
         }
-    }
\ No newline at end of file
+        for top in ranked
+    ]
+
+    if req.include_explanations:
+        explained = [(input, r["final_recommendation"]) for input, r in zip(req.parents, results) if r["final_recommendation"]]
+        explanations = explanation_jobs.explain_many(
+            [gemini_prompt(final["career_id"], final["parent_score"], input) for input, final in explained],
+            [local_explanation(bundle.careers.career(final["career_id"]), final["parent_score"], input) for input, final in explained]
+        )
+        for (_, final), explanation in zip(explained, explanations):
+            final.update(explanation)
+
+    return {
+        "model_version": bundle.model_version,
+        "count": len(results),
+        "results": results,
+        "scoring_ms": round(elapsed * 1000, 3),
+        "parents_per_sec": round(len(results) / elapsed, 1) if elapsed > 0 else None
+    }
+
+
+def sweep_values(req: SweepInput) -> list:
+    if req.values is not None:
+        values = req.values
+    elif req.start is not None and req.stop is not None:
+        values = np.linspace(req.start, req.stop, req.steps).tolist()
+    elif req.parameter in LIKERT_FIELDS:
+        values = [1, 2, 3, 4, 5]
+    else:
+        raise HTTPException(status_code=400, detail=f"Give values or start/stop for {req.parameter}")
+
+    if not all(math.isfinite(v) for v in values):
+        raise HTTPException(status_code=400, detail=f"{req.parameter} values must be finite numbers")
+    if req.parameter in LIKERT_FIELDS:
+        if any(v != int(v) for v in values):
+            raise HTTPException(status_code=400, detail=f"{req.parameter} takes whole Likert levels")
+        values = sorted({int(v) for v in values})
+    return values
+
+
+@app.post("/rescore-parent/sweep")
+def rescore_parent_sweep(req: SweepInput, bundle: ModelBundle = Depends(current_bundle)):
+    """Top careers across a range of one preference, for a what-if slider.
+
+    The whole grid is scored in one prediction pass; no Gemini explanations.
+    """
+    values = sweep_values(req)
+    try:
+        points = [
+            ParentInput(**{**req.base.model_dump(), req.parameter: v})
+            for v in values
+        ]
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {req.parameter} value: {e.errors()[0]['msg']}")
+
+    t0 = time.perf_counter()
+    ranked = rank_careers_batch(
+        bundle.careers, points, bundle.model, bundle.preprocessor, compiled=bundle.compiled,
+        chunk_rows=len(points) * len(bundle.careers)
+    )
+    elapsed = time.perf_counter() - t0
+
+    # Vetoes do not change across the grid, so either every point has results or none
+    if not ranked[0]:
+        raise HTTPException(status_code=400, detail="No acceptable careers found.")
+
+    changes = ranking_changes(ranked)
+    return {
+        "model_version": bundle.model_version,
+        "parameter": req.parameter,
+        "points": [
+            {"value": v, "top_career": top[0], "top_5_parent_scores": top}
+            for v, top in zip(values, ranked)
+        ],
+        "ranking_changes": [
+            {
+                "index": i,
+                "value": values[i],
+                "previous": [r["career_id"] for r in ranked[i - 1]],
+                "current": [r["career_id"] for r in ranked[i]],
+                "top_career_changed": ranked[i][0]["career_id"] != ranked[i - 1][0]["career_id"],
+            }
+            for i in changes
+        ],
+        "scoring_ms": round(elapsed * 1000, 3)
+    }
@@ -0,0 +1,392 @@
+"""
+bench_rescore.py
+
+Request-latency benchmark for /rescore-parent as the career catalog grows.
+
+Compares the original per-request `careers_df.iterrows()` feature build plus
+full sort ("legacy") with the vectorized path in parent_scoring.py, using
+sklearn predict ("vectorized") and the compiled forest ("compiled", see
+compiled_forest.py), and checks that all return the same top 5. With
+--batch, compares per-request ranking of many parents with
+rank_careers_batch and reports parents/sec. With --attributions, times the
+top-5 path attributions against a latency budget and checks them against
+sklearn's decision paths. Uses the
+trained artifacts when they exist, otherwise trains a small forest on
+synthetic data so the benchmark runs anywhere.
+
+Usage:
+  python bench_rescore.py
+  python bench_rescore.py --sizes 10,100,1000,10000,50000 --repeat 20
+  python bench_rescore.py --batch 2000 --sizes 300 --chunk-rows 25000,100000,400000
+  python bench_rescore.py --attributions --budget-ms 5
+  python bench_rescore.py --write-dataset parent_only_synthetic_dataset.csv --rows 200000
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from compiled_forest import CompiledForest
+from parent_scoring import (
+    BATCH_CHUNK_ROWS,
+    CATALOG_COLUMNS,
+    LOCATION_CODES,
+    CareerCatalog,
+    attribute_careers,
+    build_feature_matrix,
+    rank_careers,
+    rank_careers_batch,
+)
+from train_and_predict_rf import FEATURE_COLS, TARGET_COL, build_preprocessor
+
+BASE_DIR = Path(__file__).parent
+MODEL_PATH = BASE_DIR / "models" / "parent_layer" / "parent_model_rf.joblib"
+PREPROCESSOR_PATH = BASE_DIR / "models" / "preprocessors" / "parent_preprocessor_coltransformer.joblib"
+
+LEGACY_MAX_CAREERS = 5000   # above this the legacy path runs only a few times
+
+
+# ============================================================
+# SYNTHETIC DATA
+# ============================================================
+
+def synthetic_catalog(n_careers: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "career_id": [f"C{i:05d}" for i in range(n_careers)],
+        "c_avg_salary": rng.integers(25_000, 250_000, n_careers).astype(float),
+        "c_job_security": rng.uniform(0.2, 1.0, n_careers).round(2),
+        "c_prestige": rng.uniform(0.1, 1.0, n_careers).round(2),
+        "c_tuition": rng.integers(2_000, 120_000, n_careers).astype(float),
+        "c_location": rng.choice(list(LOCATION_CODES), n_careers),
+    })[CATALOG_COLUMNS]
+
+
+def random_parent(rng, career_ids=()) -> SimpleNamespace:
+    vetoed = list(rng.choice(career_ids, size=min(2, len(career_ids)), replace=False)) if len(career_ids) else []
+    return SimpleNamespace(
+        budget_max_tuition=float(rng.integers(5_000, 150_000)),
+        importance_finances=int(rng.integers(1, 6)),
+        importance_job_security=int(rng.integers(1, 6)),
+        importance_prestige=int(rng.integers(1, 6)),
+        parent_risk_tolerance=int(rng.integers(1, 6)),
+        influence_from_people=int(rng.integers(1, 6)),
+        location_preference=str(rng.choice(list(LOCATION_CODES))),
+        migration_allowed=bool(rng.integers(0, 2)),
+        unacceptable_careers=[str(c).lower() for c in vetoed],
+    )
+
+
+def synthetic_dataset(n_rows: int, catalog: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Training rows in the layout of parent_only_synthetic_dataset.csv."""
+    from parent_scoring import build_feature_matrix
+
+    rng = np.random.default_rng(seed)
+    table = CareerCatalog.from_frame(catalog)
+    per_parent = min(len(table), 20)
+    frames = []
+    for _ in range(max(1, n_rows // per_parent)):
+        parent = random_parent(rng)
+        rows = rng.choice(len(table), size=per_parent, replace=False)
+        X = build_feature_matrix(table, parent, rows)
+        X[:, FEATURE_COLS.index("f_is_unacceptable")] = rng.random(per_parent) < 0.05
+        frame = pd.DataFrame(X, columns=FEATURE_COLS)
+        frame.insert(0, "career_id", [table.career_ids[r] for r in rows])
+        frame["c_location"] = catalog["c_location"].to_numpy()[rows]
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True)
+
+    score = (
+        0.30 * df.p_financial_weight * np.minimum(df.f_fin_ratio, 2) / 2
+        + 0.25 * df.p_job_security_weight * df.c_job_security
+        + 0.20 * df.p_prestige_weight * df.c_prestige
+        + 0.15 * df.f_tuition_affordable
+        + 0.05 * df.f_location_match
+        + 0.05 * df.f_migration_ok
+        - 0.80 * df.f_is_unacceptable
+        + rng.normal(0, 0.03, len(df))
+    )
+    df[TARGET_COL] = np.clip(score, 0.0, 1.0).round(4)
+    return df
+
+
+def load_or_train(seed: int = 0, n_trees: int = 50):
+    if MODEL_PATH.exists() and PREPROCESSOR_PATH.exists():
+        return joblib.load(MODEL_PATH), joblib.load(PREPROCESSOR_PATH), "trained artifacts"
+
+    from sklearn.ensemble import RandomForestRegressor
+
+    df = synthetic_dataset(20_000, synthetic_catalog(300, seed), seed)
+    preprocessor = build_preprocessor(FEATURE_COLS)
+    X = preprocessor.fit_transform(df[FEATURE_COLS])
+    model = RandomForestRegressor(n_estimators=n_trees, random_state=seed, n_jobs=-1)
+    model.fit(X, df[TARGET_COL])
+    return model, preprocessor, f"synthetic {n_trees}-tree forest"
+
+
+# ============================================================
+# LEGACY PATH (original /rescore-parent body)
+# ============================================================
+
+def legacy_rank(careers_df, input, model, preprocessor):
+    def normalize_likert(x):
+        return (x - 1) / 4.0
+
+    def location_match(parent_pref, career_loc):
+        order = {"local": 0, "national": 1, "international": 2}
+        return int(order[career_loc] <= order[parent_pref])
+
+    parent_features = {
+        "p_financial_weight": normalize_likert(input.importance_finances),
+        "p_job_security_weight": normalize_likert(input.importance_job_security),
+        "p_prestige_weight": normalize_likert(input.importance_prestige),
+        "p_parent_risk_tolerance": normalize_likert(input.parent_risk_tolerance),
+        "p_weight_on_parent_layer": normalize_likert(input.influence_from_people),
+        "p_budget_max_tuition": input.budget_max_tuition,
+    }
+    rows, career_ids = [], []
+    for _, c in careers_df.iterrows():
+        rows.append({
+            **parent_features,
+            "c_avg_salary": c.c_avg_salary,
+            "c_job_security": c.c_job_security,
+            "c_prestige": c.c_prestige,
+            "c_tuition": c.c_tuition,
+            "f_fin_ratio": c.c_avg_salary / max(1, input.budget_max_tuition * 3),
+            "f_tuition_affordable": int(c.c_tuition <= input.budget_max_tuition),
+            "f_location_match": location_match(input.location_preference, c.c_location),
+            "f_migration_ok": int(input.migration_allowed or c.c_location != "international"),
+            "f_is_unacceptable": int(c.career_id in input.unacceptable_careers),
+            "f_risk_penalty": 1.0
+        })
+        career_ids.append(c.career_id)
+
+    scores = model.predict(preprocessor.transform(pd.DataFrame(rows)))
+    all_results = sorted(
+        [{"career_id": career_ids[i], "parent_score": round(float(scores[i]), 3)} for i in range(len(scores))],
+        key=lambda x: x["parent_score"],
+        reverse=True
+    )
+    blocked = {str(c).lower().strip() for c in input.unacceptable_careers}
+    return [r for r in all_results if str(r["career_id"]).lower() not in blocked][:5]
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def bench_size(n_careers, model, preprocessor, compiled, repeat, seed):
+    careers_df = synthetic_catalog(n_careers, seed)
+    t0 = time.perf_counter()
+    catalog = CareerCatalog.from_frame(careers_df)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    rng = np.random.default_rng(seed + 1)
+    parents = [random_parent(rng, catalog.career_ids) for _ in range(repeat)]
+    legacy_runs = repeat if n_careers <= LEGACY_MAX_CAREERS else min(repeat, 3)
+
+    rank_careers(catalog, parents[0], model, preprocessor)   # warm-up
+    rank_careers(catalog, parents[0], model, preprocessor, compiled=compiled)
+    vectorized, with_compiled, legacy, mismatches = [], [], [], 0
+    for i, parent in enumerate(parents):
+        result, elapsed = timed(rank_careers, catalog, parent, model, preprocessor)
+        vectorized.append(elapsed)
+        compiled_result, elapsed = timed(
+            lambda: rank_careers(catalog, parent, model, preprocessor, compiled=compiled)
+        )
+        with_compiled.append(elapsed)
+        mismatches += compiled_result != result
+        if i < legacy_runs:
+            expected, elapsed = timed(legacy_rank, careers_df, parent, model, preprocessor)
+            legacy.append(elapsed)
+            mismatches += result != expected
+
+    return {
+        "careers": n_careers,
+        "catalog_build_ms": round(build_ms, 3),
+        "legacy": summarize(legacy),
+        "vectorized": summarize(vectorized),
+        "compiled": summarize(with_compiled),
+        "speedup_p50": round(summarize(legacy)["p50_ms"] / summarize(vectorized)["p50_ms"], 1),
+        "top5_mismatches": mismatches,
+    }
+
+
+def bench_batch(n_careers, n_parents, model, preprocessor, compiled, chunk_sizes, seed):
+    """Parents/sec of one request per parent versus rank_careers_batch."""
+    catalog = CareerCatalog.from_frame(synthetic_catalog(n_careers, seed))
+    rng = np.random.default_rng(seed + 2)
+    parents = [random_parent(rng, catalog.career_ids) for _ in range(n_parents)]
+
+    expected, elapsed = timed(
+        lambda: [rank_careers(catalog, p, model, preprocessor, compiled=compiled) for p in parents]
+    )
+    result = {"careers": n_careers, "parents": n_parents, "per_request_parents_per_sec": round(n_parents / elapsed, 1)}
+    for chunk_rows in chunk_sizes:
+        ranked, elapsed = timed(
+            lambda: rank_careers_batch(catalog, parents, model, preprocessor, compiled=compiled, chunk_rows=chunk_rows)
+        )
+        result[f"batch_{chunk_rows}"] = {
+            "parents_per_sec": round(n_parents / elapsed, 1),
+            "mismatches": sum(a != b for a, b in zip(ranked, expected)),
+        }
+    return result
+
+
+def reference_contributions(model, preprocessor, X):
+    """Path attributions from sklearn's decision_path, one tree at a time."""
+    Xt = preprocessor.transform(pd.DataFrame(X, columns=FEATURE_COLS)).astype(np.float32)
+    contributions = np.zeros(X.shape)
+    baseline = 0.0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        values = tree.value[:, 0, 0]
+        baseline += values[0]
+        paths = estimator.decision_path(Xt)
+        for i in range(len(X)):
+            nodes = paths.indices[paths.indptr[i]:paths.indptr[i + 1]]
+            for parent, child in zip(nodes[:-1], nodes[1:]):
+                contributions[i, tree.feature[parent]] += values[child] - values[parent]
+    n = len(model.estimators_)
+    return baseline / n, contributions / n
+
+
+def bench_attributions(n_careers, model, preprocessor, compiled, repeat, seed):
+    """Latency of attributing the top 5, plus additivity and reference checks."""
+    catalog = CareerCatalog.from_frame(synthetic_catalog(n_careers, seed))
+    rng = np.random.default_rng(seed + 3)
+    parents = [random_parent(rng, catalog.career_ids) for _ in range(repeat)]
+    ranked = [rank_careers(catalog, p, model, preprocessor, compiled=compiled) for p in parents]
+
+    attribute_careers(catalog, parents[0], ranked[0], compiled)   # warm-up
+    samples, max_additivity, max_reference = [], 0.0, 0.0
+    for i, (parent, top) in enumerate(zip(parents, ranked)):
+        _, elapsed = timed(attribute_careers, catalog, parent, top, compiled)
+        samples.append(elapsed)
+
+        X = build_feature_matrix(catalog, parent, catalog.row_indices([r["career_id"] for r in top]))
+        baseline, contributions = compiled.contributions(X)
+        max_additivity = max(max_additivity, float(np.max(np.abs(baseline + contributions.sum(axis=1) - compiled.predict(X)))))
+        if i < 3:
+            ref_baseline, ref_contributions = reference_contributions(model, preprocessor, X)
+            max_reference = max(max_reference, abs(ref_baseline - baseline), float(np.max(np.abs(ref_contributions - contributions))))
+
+    return {
+        "careers": n_careers,
+        "top5_attributions": summarize(samples),
+        "max_additivity_error": max_additivity,
+        "max_reference_error": max_reference,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="10,100,1000,10000,50000", help="Catalog sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Requests per catalog size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, help="Where to write JSON results")
+    parser.add_argument("--batch", type=int, help="Benchmark batch ranking of this many parents")
+    parser.add_argument("--chunk-rows", type=str, default=str(BATCH_CHUNK_ROWS), help="Chunk sizes for --batch")
+    parser.add_argument("--attributions", action="store_true", help="Benchmark top-5 path attributions")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="p95 budget for --attributions")
+    parser.add_argument("--write-dataset", type=str, help="Write a synthetic training CSV and exit")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows for --write-dataset")
+    parser.add_argument("--careers", type=int, default=300, help="Careers for --write-dataset")
+    args = parser.parse_args()
+
+    if args.write_dataset:
+        df = synthetic_dataset(args.rows, synthetic_catalog(args.careers, args.seed), args.seed)
+        df.to_csv(args.write_dataset, index=False)
+        print(f"Wrote {len(df)} rows to {args.write_dataset}")
+        return
+
+    model, preprocessor, source = load_or_train(args.seed)
+    model.n_jobs = 1   # as served
+    compiled = CompiledForest.from_sklearn(model, preprocessor)
+    print("Model:", source)
+
+    if args.batch:
+        chunk_sizes = [int(c) for c in args.chunk_rows.split(",")]
+        results = [
+            bench_batch(int(n), args.batch, model, preprocessor, compiled, chunk_sizes, args.seed)
+            for n in args.sizes.split(",")
+        ]
+        for r in results:
+            line = f"{r['careers']:>7} careers  per-request {r['per_request_parents_per_sec']:9.1f} parents/s"
+            for chunk_rows in chunk_sizes:
+                b = r[f"batch_{chunk_rows}"]
+                line += f"  chunk {chunk_rows}: {b['parents_per_sec']:9.1f} parents/s ({b['mismatches']} mismatches)"
+            print(line)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"model": source, "batch": results}, f, indent=2)
+            print("Results written to", args.out)
+        if any(r[f"batch_{c}"]["mismatches"] for r in results for c in chunk_sizes):
+            raise SystemExit("Batch ranking differs from per-request ranking")
+        return
+
+    if args.attributions:
+        results = [
+            bench_attributions(int(n), model, preprocessor, compiled, args.repeat, args.seed)
+            for n in args.sizes.split(",")
+        ]
+        failed = False
+        for r in results:
+            t = r["top5_attributions"]
+            print(
+                f"{r['careers']:>7} careers  top-5 attributions p50 {t['p50_ms']:7.3f} ms  p95 {t['p95_ms']:7.3f} ms  "
+                f"additivity {r['max_additivity_error']:.2g}  vs sklearn paths {r['max_reference_error']:.2g}"
+            )
+            failed |= t["p95_ms"] > args.budget_ms or r["max_additivity_error"] > 1e-9 or r["max_reference_error"] > 1e-9
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"model": source, "attributions": results, "budget_ms": args.budget_ms}, f, indent=2)
+            print("Results written to", args.out)
+        if failed:
+            raise SystemExit(f"Attributions over the {args.budget_ms} ms budget or inconsistent with predictions")
+        return
+
+    results = []
+    for n in [int(s) for s in args.sizes.split(",")]:
+        r = bench_size(n, model, preprocessor, compiled, args.repeat, args.seed)
+        results.append(r)
+        print(
+            f"{n:>7} careers  legacy p50 {r['legacy']['p50_ms']:9.2f} ms  "
+            f"vectorized p50 {r['vectorized']['p50_ms']:8.2f} ms  "
+            f"compiled p50 {r['compiled']['p50_ms']:8.2f} ms  "
+            f"x{r['speedup_p50']:<6} mismatches {r['top5_mismatches']}"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"model": source, "results": results}, f, indent=2)
+        print("Results written to", args.out)
+
+    if any(r["top5_mismatches"] for r in results):
+        raise SystemExit("Top 5 differs between implementations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+bench_training.py
+
+Wall time and peak RSS of the parent model training modes as the dataset
+grows. Every run is a separate `train_and_predict_rf.py --train` process
+writing to a temp directory, so peak RSS is per run:
+
+  legacy      pd.read_csv of the whole file, float64 copies, train_test_split
+  chunked     first --chunked run: builds the float32 columnar cache, then trains
+  cached      --chunked again: maps the cache, no CSV parsing
+  subsample   --chunked --sample-frac (uniform fraction of the rows)
+  bootstrap   --chunked --max-samples N (trees fit on pools of 4N rows; memory
+              bounded by N, not the dataset)
+
+Synthetic datasets are written in pieces (bench_rescore.synthetic_dataset)
+and reused between runs.
+
+Usage:
+  python bench_training.py
+  python bench_training.py --sizes 1000000,10000000 --trees 20 --modes chunked,cached,bootstrap
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_rescore import synthetic_catalog, synthetic_dataset
+
+BASE_DIR = Path(__file__).parent
+MODES = ("legacy", "chunked", "cached", "subsample", "bootstrap")
+PIECE_ROWS = 200_000
+
+
+def write_dataset(path: Path, n_rows: int, seed: int = 0):
+    catalog = synthetic_catalog(300, seed)
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        while written < n_rows:
+            piece = synthetic_dataset(min(PIECE_ROWS, n_rows - written), catalog, seed + written)
+            piece.to_csv(f, index=False, header=written == 0)
+            written += len(piece)
+
+
+def run_mode(mode, data_path, work_dir, trees, sample_frac, max_samples):
+    cmd = [
+        sys.executable, str(BASE_DIR / "train_and_predict_rf.py"), "--train",
+        "--data", str(data_path), "--trees", str(trees),
+        "--out", str(work_dir / mode / "parent_layer"), "--preproc", str(work_dir / mode / "preprocessors"),
+    ]
+    if mode != "legacy":
+        cmd += ["--chunked", "--cache-dir", str(work_dir / "cache")]
+    if mode == "subsample":
+        cmd += ["--sample-frac", str(sample_frac)]
+    if mode == "bootstrap":
+        cmd += ["--max-samples", str(max_samples)]
+
+    out = subprocess.run(cmd, capture_output=True, text=True, cwd=BASE_DIR)
+    if out.returncode != 0:
+        return {"mode": mode, "error": out.stderr.strip().splitlines()[-1] if out.stderr else "failed"}
+    wall, rss = re.search(r"Wall time: ([\d.]+) s, peak RSS: (\d+) MB", out.stdout).groups()
+    r2 = re.search(r"'r2': ([-\d.e]+)", out.stdout)
+    return {"mode": mode, "wall_s": float(wall), "peak_rss_mb": int(rss), "r2": float(r2.group(1)) if r2 else None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="100000,1000000", help="Dataset rows")
+    parser.add_argument("--modes", type=str, default=",".join(MODES))
+    parser.add_argument("--trees", type=int, default=20)
+    parser.add_argument("--sample-frac", type=float, default=0.25)
+    parser.add_argument("--max-samples", type=float, default=20000, help="Bootstrap rows per tree for the bootstrap mode")
+    parser.add_argument("--data-dir", type=str, help="Keep generated datasets here (default: temp dir)")
+    parser.add_argument("--out", type=str, help="Where to write JSON results")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="parent_train_") as tmp:
+        data_dir = Path(args.data_dir or tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        for n in [int(s) for s in args.sizes.split(",")]:
+            data_path = data_dir / f"parents_{n}.csv"
+            if not data_path.exists():
+                t0 = time.perf_counter()
+                write_dataset(data_path, n)
+                print(f"Wrote {n} rows ({data_path.stat().st_size / 1e6:.0f} MB) in {time.perf_counter() - t0:.0f} s")
+
+            work_dir = Path(tmp) / f"run_{n}"
+            for mode in args.modes.split(","):
+                r = {"rows": n, **run_mode(mode, data_path, work_dir, args.trees, args.sample_frac, args.max_samples)}
+                results.append(r)
+                if "error" in r:
+                    print(f"{n:>10} rows  {mode:10s} ERROR {r['error']}")
+                else:
+                    print(f"{n:>10} rows  {mode:10s} wall {r['wall_s']:7.1f} s  peak RSS {r['peak_rss_mb']:6d} MB  r2 {r['r2']:.4f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"trees": args.trees, "results": results}, f, indent=2)
+        print("Results written to", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+bench_workers.py
+
+Per-worker memory and startup time of the parent model, as N API workers
+would see it:
+
+  joblib   every worker unpickles the full sklearn forest (private copy)
+  mmap     every worker maps the compiled forest read-only (shared pages)
+
+Each worker is a separate process that loads the artifacts, scores one
+catalog-sized matrix and then stays alive until all workers are measured.
+RSS counts shared pages in every process; PSS splits them between the
+processes that map them, and USS is memory private to the worker.
+
+Usage:
+  python bench_workers.py                       # 1, 4 and 8 workers, both modes
+  python bench_workers.py --workers 1,4 --modes mmap
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+MODEL_DIR = BASE_DIR / "models"
+
+
+def _artifact_paths(model_dir):
+    model_dir = Path(model_dir)
+    return {
+        "model": model_dir / "parent_layer" / "parent_model_rf.joblib",
+        "preprocessor": model_dir / "preprocessors" / "parent_preprocessor_coltransformer.joblib",
+        "compiled": model_dir / "parent_layer" / "parent_model_compiled",
+    }
+
+
+def run_worker(mode, model_dir):
+    """Worker process body: load, score once, report, wait for stdin to close."""
+    t0 = time.perf_counter()
+    import joblib
+    import numpy as np
+
+    from train_and_predict_rf import FEATURE_COLS
+
+    paths = _artifact_paths(model_dir)
+    preprocessor = joblib.load(paths["preprocessor"])
+    if mode == "joblib":
+        import pandas as pd
+
+        model = joblib.load(paths["model"])
+        model.n_jobs = 1
+        predict = lambda X: model.predict(preprocessor.transform(pd.DataFrame(X, columns=FEATURE_COLS)))
+    else:
+        from compiled_forest import load_compiled
+
+        compiled = load_compiled(paths["compiled"])
+        predict = compiled.predict
+    load_s = time.perf_counter() - t0
+
+    # Touch every tree the way a request does
+    predict(np.random.default_rng(0).random((300, len(FEATURE_COLS))))
+    ready_s = time.perf_counter() - t0
+
+    print(json.dumps({"load_s": load_s, "ready_s": ready_s}), flush=True)
+    sys.stdin.read()
+
+
+def memory_mb(pid):
+    """Rss / Pss / USS of a process in MB (Linux /proc)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "uss_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
+
+
+def measure(mode, n_workers, model_dir):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--worker", mode, "--model-dir", str(model_dir)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=BASE_DIR,
+        )
+        for _ in range(n_workers)
+    ]
+    try:
+        timings = [json.loads(p.stdout.readline()) for p in procs]
+        memory = [memory_mb(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+    def mean(key, rows):
+        return round(statistics.fmean(r[key] for r in rows), 3)
+
+    return {
+        "mode": mode,
+        "workers": n_workers,
+        "load_s": mean("load_s", timings),
+        "ready_s": mean("ready_s", timings),
+        "rss_mb": mean("rss_mb", memory),
+        "pss_mb": mean("pss_mb", memory),
+        "uss_mb": mean("uss_mb", memory),
+        "total_pss_mb": round(sum(m["pss_mb"] for m in memory), 1),
+    }
+
+
+def ensure_artifacts(model_dir, trees):
+    """Use trained artifacts, or train a synthetic forest into a temp dir."""
+    paths = _artifact_paths(model_dir)
+    if all(p.exists() for p in paths.values()):
+        return Path(model_dir), "trained artifacts"
+
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    from bench_rescore import synthetic_catalog, synthetic_dataset
+    from compiled_forest import CompiledForest
+    from train_and_predict_rf import FEATURE_COLS, TARGET_COL, build_preprocessor
+
+    tmp = Path(tempfile.mkdtemp(prefix="parent_models_"))
+    paths = _artifact_paths(tmp)
+    df = synthetic_dataset(50_000, synthetic_catalog(300))
+    preprocessor = build_preprocessor(FEATURE_COLS)
+    model = RandomForestRegressor(n_estimators=trees, random_state=42, n_jobs=-1)
+    model.fit(preprocessor.fit_transform(df[FEATURE_COLS]), df[TARGET_COL])
+    paths["model"].parent.mkdir(parents=True)
+    paths["preprocessor"].parent.mkdir(parents=True)
+    joblib.dump(model, paths["model"])
+    joblib.dump(preprocessor, paths["preprocessor"])
+    CompiledForest.from_sklearn(model, preprocessor).save(paths["compiled"])
+    return tmp, f"synthetic {trees}-tree forest in {tmp}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=str, default="1,4,8", help="Worker counts")
+    parser.add_argument("--modes", type=str, default="joblib,mmap", help="joblib and/or mmap")
+    parser.add_argument("--model-dir", type=str, default=str(MODEL_DIR))
+    parser.add_argument("--trees", type=int, default=200, help="Trees for the synthetic fallback model")
+    parser.add_argument("--out", type=str, help="Where to write JSON results")
+    parser.add_argument("--worker", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.model_dir)
+        return
+
+    model_dir, source = ensure_artifacts(args.model_dir, args.trees)
+    print("Model:", source)
+
+    results = []
+    for mode in args.modes.split(","):
+        for n in [int(w) for w in args.workers.split(",")]:
+            r = measure(mode, n, model_dir)
+            results.append(r)
+            print(
+                f"{mode:6s} x{n:<2}  load {r['load_s']:6.2f} s  ready {r['ready_s']:6.2f} s  "
+                f"RSS {r['rss_mb']:7.1f} MB  PSS {r['pss_mb']:7.1f} MB  USS {r['uss_mb']:7.1f} MB  "
+                f"total PSS {r['total_pss_mb']:8.1f} MB"
+            )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"model": source, "results": results}, f, indent=2)
+        print("Results written to", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+compiled_forest.py
+
+Flattens the trained RandomForestRegressor and its ColumnTransformer
+(median imputer + MinMaxScaler) into contiguous NumPy arrays, and scores
+feature matrices with a vectorized evaluator. This avoids sklearn's
+per-call validation overhead and the per-request thread pool of a forest
+trained with n_jobs=-1.
+
+Layout (all trees concatenated; node ids are global):
+  left, right   int32   child node ids; leaves point to themselves
+  feature       int32   split feature (0 for leaves)
+  threshold     float64 go left when x <= threshold
+  value         float64 node prediction (used at leaves)
+  is_leaf       bool
+  roots         int32   root node id of every tree
+
+On disk this is a directory with one .npy file per array plus meta.json.
+Workers map the files read-only (mmap_mode="r"), so N API workers share
+one copy of the trees through the OS page cache instead of holding N.
+
+Usage:
+  python compiled_forest.py --export     # from the joblib model + preprocessor
+  python compiled_forest.py --verify     # compare with sklearn on random rows
+"""
+
+import argparse
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from train_and_predict_rf import FEATURE_COLS, MODEL_META_NAME, read_model_version
+
+COMPILED_VERSION = 2
+
+BASE_DIR = Path(__file__).parent
+MODEL_PATH = BASE_DIR / "models" / "parent_layer" / "parent_model_rf.joblib"
+PREPROCESSOR_PATH = BASE_DIR / "models" / "preprocessors" / "parent_preprocessor_coltransformer.joblib"
+COMPILED_PATH = BASE_DIR / "models" / "parent_layer" / "parent_model_compiled"
+
+ARRAYS = ("medians", "scale", "offset", "left", "right", "feature", "threshold", "value", "is_leaf", "roots")
+
+
+def _numeric_steps(preprocessor):
+    """(imputer, scaler) of the single numeric pipeline built by build_preprocessor."""
+    name, pipeline, columns = preprocessor.transformers_[0]
+    if list(columns) != FEATURE_COLS:
+        raise ValueError("Preprocessor columns do not match FEATURE_COLS")
+    return pipeline.named_steps["imputer"], pipeline.named_steps["scaler"]
+
+
+class CompiledForest:
+    """Array form of preprocessor + forest. `predict` takes raw FEATURE_COLS rows."""
+
+    def __init__(self, medians, scale, offset, left, right, feature, threshold, value, roots, is_leaf=None):
+        self.medians = medians
+        self.scale = scale
+        self.offset = offset
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.is_leaf = left == np.arange(len(left), dtype=left.dtype) if is_leaf is None else is_leaf
+
+    @classmethod
+    def from_sklearn(cls, model, preprocessor) -> "CompiledForest":
+        imputer, scaler = _numeric_steps(preprocessor)
+        if scaler.clip:
+            raise ValueError("MinMaxScaler(clip=True) is not supported")
+
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        start = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            ids = np.arange(tree.node_count, dtype=np.int64) + start
+            leaf = tree.children_left == -1
+            left.append(np.where(leaf, ids, tree.children_left + start))
+            right.append(np.where(leaf, ids, tree.children_right + start))
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            value.append(tree.value[:, 0, 0])
+            roots.append(start)
+            start += tree.node_count
+
+        if start > np.iinfo(np.int32).max:
+            raise ValueError("Forest too large for int32 node ids")
+
+        return cls(
+            medians=np.asarray(imputer.statistics_, dtype=np.float64),
+            scale=np.asarray(scaler.scale_, dtype=np.float64),
+            offset=np.asarray(scaler.min_, dtype=np.float64),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            value=np.concatenate(value).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def transform(self, X) -> np.ndarray:
+        """Median imputation + MinMax scaling, as float32 like sklearn's tree input."""
+        X = np.array(X, dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.broadcast_to(self.medians, X.shape)[missing]
+        X *= self.scale
+        X += self.offset
+        return X.astype(np.float32)
+
+    def predict(self, X) -> np.ndarray:
+        """Mean leaf value over all trees for each row of raw features."""
+        Xt = self.transform(X)
+        n_rows, n_trees = len(Xt), self.n_trees
+
+        node = np.tile(self.roots, n_rows)                 # (row, tree) pairs, row-major
+        rows = np.repeat(np.arange(n_rows, dtype=np.int32), n_trees)
+        active = np.flatnonzero(~self.is_leaf[node])
+
+        # Descend one level per step, dropping pairs that reached a leaf
+        while active.size:
+            current = node[active]
+            go_left = Xt[rows[active], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[~self.is_leaf[current]]
+
+        # Accumulate tree by tree like sklearn (n_jobs=1) so results match bit for
+        # bit; a pairwise sum can differ in the last ulp and flip 3-decimal rounding
+        leaf_values = self.value[node].reshape(n_rows, n_trees)
+        total = np.zeros(n_rows)
+        for t in range(n_trees):
+            total += leaf_values[:, t]
+        return total / n_trees
+
+    def contributions(self, X):
+        """Per-feature path attributions: (baseline, (n_rows, n_features) contributions).
+
+        Every split on a row's path credits the change in node value to the
+        split feature; averaged over trees, baseline + contributions.sum(axis=1)
+        equals `predict` up to float rounding. Scaling is monotonic per
+        feature, so columns line up with the raw FEATURE_COLS.
+        """
+        Xt = self.transform(X)
+        n_rows, n_trees, n_features = len(Xt), self.n_trees, len(self.medians)
+
+        node = np.tile(self.roots, n_rows)
+        rows = np.repeat(np.arange(n_rows, dtype=np.int32), n_trees)
+        active = np.flatnonzero(~self.is_leaf[node])
+        totals = np.zeros(n_rows * n_features)
+
+        while active.size:
+            current = node[active]
+            feature = self.feature[current]
+            go_left = Xt[rows[active], feature] <= self.threshold[current]
+            child = np.where(go_left, self.left[current], self.right[current])
+            totals += np.bincount(
+                rows[active].astype(np.int64) * n_features + feature,
+                weights=self.value[child] - self.value[current],
+                minlength=n_rows * n_features,
+            )
+            node[active] = child
+            active = active[~self.is_leaf[child]]
+
+        baseline = float(self.value[self.roots].sum() / n_trees)
+        return baseline, totals.reshape(n_rows, n_features) / n_trees
+
+    def save(self, path=COMPILED_PATH, model_version=None):
+        """Write the arrays as a directory of .npy files, replacing any previous copy.
+
+        Files are written to a sibling directory first; workers that still
+        map the old files keep reading them until they reload.
+        """
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name in ARRAYS:
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "version": COMPILED_VERSION,
+                "model_version": model_version,
+                "feature_cols": FEATURE_COLS,
+                "n_trees": self.n_trees,
+                "n_nodes": int(len(self.left)),
+            }, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        tmp.rename(path)
+
+
+def load_compiled(path=COMPILED_PATH, mmap_mode="r", model_version=None):
+    """Map the compiled forest read-only, or None if it is missing, from another
+    layout or (when `model_version` is given) exported from a different model.
+    """
+    path = Path(path)
+    meta_path = path / "meta.json"
+    if not meta_path.exists():
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["version"] != COMPILED_VERSION or meta["feature_cols"] != FEATURE_COLS:
+        print(f"Warning: ignoring incompatible compiled model at {path}")
+        return None
+    if model_version is not None and meta.get("model_version") != model_version:
+        print(f"Warning: ignoring compiled model at {path} from model version {meta.get('model_version')}")
+        return None
+    return CompiledForest(**{name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAYS})
+
+
+class LazySklearnModel:
+    """The joblib forest, loaded on first `predict`.
+
+    With a compiled model present, sklearn is only needed for matrices above
+    parent_scoring.COMPILED_MAX_ROWS, so most workers never load it.
+    """
+
+    def __init__(self, path=MODEL_PATH):
+        self.path = Path(path)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    model = joblib.load(self.path)
+                    model.n_jobs = 1
+                    self._model = model
+        return self._model
+
+    def predict(self, X):
+        return self.load().predict(X)
+
+
+def export(model_path=MODEL_PATH, preproc_path=PREPROCESSOR_PATH, out_path=COMPILED_PATH):
+    meta_path = Path(model_path).with_name(MODEL_META_NAME)
+    model_version = read_model_version(meta_path.parent) if meta_path.exists() else None
+    compiled = CompiledForest.from_sklearn(joblib.load(model_path), joblib.load(preproc_path))
+    compiled.save(out_path, model_version)
+    return compiled
+
+
+def verify(compiled, model, preprocessor, n_rows=2000, seed=0, tolerance=0.0):
+    """Max abs difference between compiled and sklearn predictions on random rows."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    imputer, scaler = _numeric_steps(preprocessor)
+    low, high = scaler.data_min_, scaler.data_max_
+    X = low + rng.random((n_rows, len(FEATURE_COLS))) * (high - low)
+    X[rng.random(X.shape) < 0.01] = np.nan   # exercise the imputer
+
+    expected = model.predict(preprocessor.transform(pd.DataFrame(X, columns=FEATURE_COLS)))
+    diff = float(np.max(np.abs(compiled.predict(X) - expected)))
+    return diff, diff <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--export", action="store_true", help="Write the compiled model next to the joblib model")
+    parser.add_argument("--verify", action="store_true", help="Compare with sklearn and time both")
+    parser.add_argument("--model", type=str, default=str(MODEL_PATH))
+    parser.add_argument("--preproc-file", dest="preproc_file", type=str, default=str(PREPROCESSOR_PATH))
+    parser.add_argument("--out", type=str, default=str(COMPILED_PATH))
+    args = parser.parse_args()
+
+    if args.export:
+        compiled = export(args.model, args.preproc_file, args.out)
+        print(f"Saved compiled forest ({compiled.n_trees} trees, {len(compiled.left)} nodes) to: {args.out}")
+
+    if args.verify:
+        import pandas as pd
+
+        model, preprocessor = joblib.load(args.model), joblib.load(args.preproc_file)
+        compiled = load_compiled(args.out)
+        if compiled is None:
+            raise SystemExit(f"No compiled model at {args.out}; run with --export first")
+        diff, ok = verify(compiled, model, preprocessor)
+        print(f"max |compiled - sklearn| = {diff:.3g}")
+
+        rng = np.random.default_rng(1)
+        for n in (1, 5, 100, 1000):
+            X = rng.random((n, len(FEATURE_COLS)))
+            frame = pd.DataFrame(X, columns=FEATURE_COLS)
+            timings = {}
+            for name, fn in (
+                ("sklearn", lambda: model.predict(preprocessor.transform(frame))),
+                ("compiled", lambda: compiled.predict(X)),
+            ):
+                fn()
+                samples = []
+                for _ in range(20):
+                    t0 = time.perf_counter()
+                    fn()
+                    samples.append(time.perf_counter() - t0)
+                timings[name] = sorted(samples)[len(samples) // 2] * 1000
+            print(f"{n:>5} rows  sklearn p50 {timings['sklearn']:8.3f} ms  compiled p50 {timings['compiled']:8.3f} ms")
+
+        if not ok:
+            raise SystemExit("Compiled predictions differ from sklearn beyond tolerance")
+
+    if not (args.export or args.verify):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+model_registry.py
+
+Versioned parent model artifacts and hot reload for the API.
+
+Registry layout (models/registry/):
+  <model_version>/
+    parent_model_rf.joblib
+    parent_preprocessor_coltransformer.joblib
+    parent_model_compiled/
+    career_catalog.npz
+    parent_model_meta.json
+  CURRENT              name of the version the API should serve
+
+A version directory is copied under a temporary name and renamed into
+place, and CURRENT is replaced with os.replace, so the API never sees a
+half-written version. Without a registry the API serves the training
+layout (models/parent_layer + models/preprocessors) as before.
+
+The API holds one immutable ModelBundle. A reload (CURRENT changed, or
+POST /admin/reload) loads the new bundle in a background thread, checks it
+on a smoke batch of parents, which also faults in the mapped trees, and
+then replaces the reference. Each request takes the bundle once when it
+starts, so requests already running finish on the old version and the old
+arrays are released when the last of them returns. A version that fails
+to load or validate is never swapped in.
+
+Usage:
+  python model_registry.py --publish                  # training output -> registry, make it current
+  python model_registry.py --publish --no-activate
+  python model_registry.py --activate 20260101120000-1a2b3c4d
+  python model_registry.py --list
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+
+from compiled_forest import LazySklearnModel, load_compiled
+from parent_scoring import TOP_K, LOCATION_CODES, attribute_careers, load_catalog, rank_careers, rank_careers_batch
+from train_and_predict_rf import CATALOG_NAME, MODEL_META_NAME, read_model_version
+
+BASE_DIR = Path(__file__).parent
+REGISTRY_DIR = Path(os.getenv("PARENT_MODEL_REGISTRY", BASE_DIR / "models" / "registry"))
+# Legacy training layout, served when the registry has no CURRENT version
+MODEL_DIR = BASE_DIR / "models" / "parent_layer"
+PREPROCESSOR_PATH = BASE_DIR / "models" / "preprocessors" / "parent_preprocessor_coltransformer.joblib"
+
+CURRENT_NAME = "CURRENT"
+MODEL_NAME = "parent_model_rf.joblib"
+PREPROCESSOR_NAME = "parent_preprocessor_coltransformer.joblib"
+COMPILED_NAME = "parent_model_compiled"
+# How often the API checks CURRENT; 0 disables the watcher
+POLL_SECONDS = float(os.getenv("PARENT_REGISTRY_POLL_SECONDS", "5"))
+
+
+class ModelBundle:
+    """Everything a request scores with, loaded and validated together."""
+
+    def __init__(self, model_version, model, preprocessor, compiled, careers, source):
+        self.model_version = model_version
+        self.model = model
+        self.preprocessor = preprocessor
+        self.compiled = compiled
+        self.careers = careers
+        self.source = str(source)
+        self.loaded_at = time.time()
+
+
+def load_bundle(model_dir, preproc_path) -> ModelBundle:
+    """Load one version's artifacts; raises if they do not belong to the same model."""
+    model_dir = Path(model_dir)
+    preprocessor = joblib.load(preproc_path)
+    model_version = read_model_version(model_dir)
+
+    # Array form of the forest, mapped read-only so all workers share one copy
+    # of the trees through the page cache (see compiled_forest.py)
+    compiled = load_compiled(model_dir / COMPILED_NAME, model_version=model_version)
+    if compiled is None:
+        model = joblib.load(model_dir / MODEL_NAME)
+        # One request = one thread; a per-call pool oversubscribes cores under gunicorn
+        model.n_jobs = 1
+    else:
+        # Only needed for matrices above COMPILED_MAX_ROWS
+        model = LazySklearnModel(model_dir / MODEL_NAME)
+
+    # Career-static columns as arrays, exported with the model (see parent_scoring.py)
+    careers, catalog_meta = load_catalog(model_dir / CATALOG_NAME)
+    if catalog_meta["model_version"] != model_version:
+        raise RuntimeError(
+            f"{CATALOG_NAME} was built for model {catalog_meta['model_version']}, "
+            f"loaded model is {model_version}; rerun train_and_predict_rf.py --train or --catalog"
+        )
+    return ModelBundle(model_version, model, preprocessor, compiled, careers, model_dir)
+
+
+def smoke_parents() -> list:
+    """Fixed, veto-free parents covering every location preference, budget and Likert extremes."""
+    return [
+        SimpleNamespace(
+            budget_max_tuition=budget, importance_finances=likert, importance_job_security=6 - likert,
+            importance_prestige=likert, parent_risk_tolerance=3, influence_from_people=6 - likert,
+            location_preference=location, migration_allowed=likert == 5, unacceptable_careers=[],
+        )
+        for location, likert, budget in itertools.product(LOCATION_CODES, (1, 5), (10_000.0, 1e9))
+    ]
+
+
+def smoke_check(bundle: ModelBundle) -> dict:
+    """Score the smoke parents through the request code paths; raises if anything is off.
+
+    Single-parent and batch rankings must agree and every score must be
+    finite. Running them also reads every tree once, so the first requests
+    on a new version do not pay for page faults.
+    """
+    t0 = time.perf_counter()
+    parents = smoke_parents()
+    k = min(TOP_K, len(bundle.careers))
+    single = [rank_careers(bundle.careers, p, bundle.model, bundle.preprocessor, compiled=bundle.compiled)
+              for p in parents]
+    batch = rank_careers_batch(bundle.careers, parents, bundle.model, bundle.preprocessor,
+                               compiled=bundle.compiled, chunk_rows=len(bundle.careers))
+    for top, batch_top in zip(single, batch):
+        if len(top) != k:
+            raise RuntimeError(f"Smoke check: expected {k} careers per parent, got {len(top)}")
+        if not all(np.isfinite(r["parent_score"]) for r in top):
+            raise RuntimeError("Smoke check: non-finite parent score")
+        if top != batch_top:
+            raise RuntimeError("Smoke check: batch and single-parent rankings differ")
+    if bundle.compiled is not None:
+        for p, top in zip(parents, single):
+            for a in attribute_careers(bundle.careers, p, top, bundle.compiled):
+                if not all(np.isfinite(v) for v in a["contributions"].values()):
+                    raise RuntimeError("Smoke check: non-finite attribution")
+    return {"parents": len(parents), "smoke_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Version named by CURRENT, or None without a registry."""
+    pointer = Path(registry_dir) / CURRENT_NAME
+    if not pointer.exists():
+        return None
+    return pointer.read_text(encoding="utf-8").strip() or None
+
+
+def resolve(registry_dir=REGISTRY_DIR):
+    """(model_dir, preproc_path) the API should serve."""
+    version = current_version(registry_dir)
+    if version is None:
+        return MODEL_DIR, PREPROCESSOR_PATH
+    version_dir = Path(registry_dir) / version
+    return version_dir, version_dir / PREPROCESSOR_NAME
+
+
+class ModelRegistry:
+    """The active ModelBundle and the background reloads that replace it."""
+
+    def __init__(self, registry_dir=REGISTRY_DIR):
+        self.registry_dir = Path(registry_dir)
+        self.bundle = None
+        self.last_reload = None
+        self._reload_lock = threading.Lock()   # one reload at a time
+        self._failed_version = None
+        self._watcher = None
+
+    def load(self):
+        """Initial load at startup; failures are fatal here."""
+        bundle = load_bundle(*resolve(self.registry_dir))
+        smoke = smoke_check(bundle)
+        self.bundle = bundle
+        self.last_reload = {"status": "loaded", "model_version": bundle.model_version, **smoke}
+        return bundle
+
+    def reload(self, force=False) -> dict:
+        """Load, check and swap in the version CURRENT points to.
+
+        Returns the outcome; the active bundle is only replaced on success.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "in_progress"}
+        try:
+            t0 = time.perf_counter()
+            model_dir, preproc_path = resolve(self.registry_dir)
+            target = current_version(self.registry_dir)
+            previous = self.bundle
+            active = previous.model_version if previous is not None else None
+            if not force and target is not None and target == active:
+                return {"status": "unchanged", "model_version": active}
+            try:
+                bundle = load_bundle(model_dir, preproc_path)
+                # If this worker has needed sklearn (large batches), load the new one now
+                # rather than on the first large request after the swap
+                if previous is not None and getattr(previous.model, "loaded", False) \
+                        and isinstance(bundle.model, LazySklearnModel):
+                    bundle.model.load()
+                smoke = smoke_check(bundle)
+            except Exception as e:
+                self._failed_version = target
+                outcome = {"status": "failed", "model_version": target, "active_version": active,
+                           "error": f"{type(e).__name__}: {e}"}
+                print(f"Model reload failed, still serving {active}: {outcome['error']}")
+            else:
+                # Requests hold their own reference; this only affects new ones
+                self.bundle = bundle
+                self._failed_version = None
+                outcome = {"status": "reloaded", "model_version": bundle.model_version,
+                           "previous_version": active, **smoke}
+                print(f"Model reloaded: {active} -> {bundle.model_version}")
+            outcome["reload_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            outcome["finished_at"] = time.time()
+            self.last_reload = outcome
+            return outcome
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, force=False) -> dict:
+        if self._reload_lock.locked():
+            return {"status": "in_progress"}
+        threading.Thread(target=self.reload, kwargs={"force": force}, name="model-reload", daemon=True).start()
+        return {"status": "started"}
+
+    def watch(self, interval=POLL_SECONDS):
+        """Reload whenever CURRENT names a different version (a failed one is not retried)."""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    target = current_version(self.registry_dir)
+                    if target is not None and target not in (self.bundle.model_version, self._failed_version):
+                        self.reload()
+                except Exception as e:
+                    print(f"Registry watcher error: {e}")
+
+        self._watcher = threading.Thread(target=poll, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self) -> dict:
+        bundle = self.bundle
+        return {
+            "model_version": bundle.model_version if bundle is not None else None,
+            "source": bundle.source if bundle is not None else None,
+            "loaded_at": bundle.loaded_at if bundle is not None else None,
+            "registry_version": current_version(self.registry_dir),
+            "reloading": self._reload_lock.locked(),
+            "last_reload": self.last_reload,
+        }
+
+
+# ---------- Publishing ----------
+
+def list_versions(registry_dir=REGISTRY_DIR) -> list:
+    registry_dir = Path(registry_dir)
+    if not registry_dir.exists():
+        return []
+    return sorted(p.name for p in registry_dir.iterdir() if p.is_dir() and not p.name.endswith(".tmp"))
+
+
+def activate(version: str, registry_dir=REGISTRY_DIR):
+    """Point CURRENT at an existing version (rollback works the same way)."""
+    registry_dir = Path(registry_dir)
+    if not (registry_dir / version / MODEL_META_NAME).exists():
+        raise ValueError(f"No model version {version} in {registry_dir}")
+    tmp = registry_dir / (CURRENT_NAME + ".tmp")
+    tmp.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp, registry_dir / CURRENT_NAME)
+
+
+def publish(model_dir=MODEL_DIR, preproc_path=PREPROCESSOR_PATH, registry_dir=REGISTRY_DIR, make_current=True) -> Path:
+    """Copy one training run's artifacts into the registry under its model version."""
+    model_dir, registry_dir = Path(model_dir), Path(registry_dir)
+    version = read_model_version(model_dir)
+    version_dir = registry_dir / version
+    if not version_dir.exists():
+        tmp = registry_dir / (version + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name in (MODEL_NAME, MODEL_META_NAME, CATALOG_NAME):
+            shutil.copy2(model_dir / name, tmp / name)
+        shutil.copytree(model_dir / COMPILED_NAME, tmp / COMPILED_NAME)
+        shutil.copy2(preproc_path, tmp / PREPROCESSOR_NAME)
+        # Refuse to publish a version the API would reject
+        smoke_check(load_bundle(tmp, tmp / PREPROCESSOR_NAME))
+        tmp.rename(version_dir)
+
+    if make_current:
+        activate(version, registry_dir)
+    return version_dir
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--publish", action="store_true", help="Copy the training output into the registry")
+    parser.add_argument("--no-activate", action="store_true", help="With --publish: do not make it CURRENT")
+    parser.add_argument("--activate", type=str, metavar="VERSION", help="Make an existing version CURRENT")
+    parser.add_argument("--list", action="store_true", help="List registry versions")
+    parser.add_argument("--model-dir", type=str, default=str(MODEL_DIR))
+    parser.add_argument("--preproc-file", type=str, default=str(PREPROCESSOR_PATH))
+    parser.add_argument("--registry", type=str, default=str(REGISTRY_DIR))
+    args = parser.parse_args()
+
+    if args.publish:
+        path = publish(args.model_dir, args.preproc_file, args.registry, make_current=not args.no_activate)
+        print(f"Published {path.name} to {args.registry}" + ("" if args.no_activate else " (current)"))
+    if args.activate:
+        activate(args.activate, args.registry)
+        print("Current version:", args.activate)
+    if args.list or not (args.publish or args.activate):
+        current = current_version(args.registry)
+        for version in list_versions(args.registry):
+            with open(Path(args.registry) / version / MODEL_META_NAME, encoding="utf-8") as f:
+                meta = json.load(f)
+            print(f"{'*' if version == current else ' '} {version}  trees {meta.get('n_trees')}  metrics {meta.get('metrics')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+model_search.py
+
+Hyperparameter search for the parent forest with latency-aware selection
+(train_and_predict_rf.py --search).
+
+Candidates (n_estimators, max_depth, min_samples_leaf, max_features) from a
+grid or a random draw of the space are cross-validated in a process pool.
+Workers read the training rows from the columnar dataset cache (see
+parent_dataset.py), so they share the mapped columns instead of each
+receiving a copy.
+
+For every candidate the report records CV RMSE / MAE / R², model size
+(joblib and compiled forest on disk) and the predict latency the API would
+see: the compiled forest on 1 row, on 100 rows and on --budget-rows rows
+(default: the number of careers, i.e. one /rescore-parent request),
+measured in the parent process after the pool finishes so runs do not
+compete for CPU.
+
+Selection: among candidates on the Pareto front of (CV RMSE, latency at
+--budget-rows rows), the most accurate one within --latency-budget-ms is
+retrained on all sampled rows and saved like a normal training run, with
+search_report.json next to the model.
+"""
+
+import itertools
+import json
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_SPACE = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 5],
+    "max_features": [1.0, 0.5],
+}
+LATENCY_REPEATS = 30
+# Predict sizes always in the report; --budget-rows is added to these
+REPORT_ROWS = (1, 100)
+
+_dataset = None
+_folds = None
+
+
+def candidates(space: dict, n_random: int = None, seed: int = 42) -> list:
+    """Every combination of the grid, or `n_random` distinct ones drawn from it."""
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if n_random is not None and n_random < len(grid):
+        grid = random.Random(seed).sample(grid, n_random)
+    return grid
+
+
+def _init_worker(cache_path, folds):
+    global _dataset, _folds
+    from parent_dataset import CachedDataset
+    _dataset = CachedDataset(cache_path)
+    _folds = folds
+
+
+def _fit(params, rows, random_state):
+    from sklearn.ensemble import RandomForestRegressor
+
+    from train_and_predict_rf import FEATURE_COLS, build_preprocessor
+    import pandas as pd
+
+    preproc = build_preprocessor(FEATURE_COLS)
+    X = preproc.fit_transform(pd.DataFrame(_dataset.features(rows), columns=FEATURE_COLS, copy=False))
+    rf = RandomForestRegressor(random_state=random_state, n_jobs=1, **params)
+    rf.fit(X, _dataset.target(rows))
+    return rf, preproc
+
+
+def evaluate_candidate(index, params, random_state, scratch_dir):
+    """Cross-validate one candidate; keep its first-fold model for latency/size."""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    from compiled_forest import CompiledForest
+    from train_and_predict_rf import FEATURE_COLS
+    import joblib
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    scores = []
+    for k, test_rows in enumerate(_folds):
+        train_rows = np.concatenate([f for j, f in enumerate(_folds) if j != k])
+        rf, preproc = _fit(params, train_rows, random_state)
+        y_true = _dataset.target(test_rows).astype(float)
+        y_pred = rf.predict(preproc.transform(pd.DataFrame(_dataset.features(test_rows), columns=FEATURE_COLS, copy=False)))
+        scores.append((
+            float(np.sqrt(mean_squared_error(y_true, y_pred))),
+            float(mean_absolute_error(y_true, y_pred)),
+            float(r2_score(y_true, y_pred)),
+        ))
+        if k == 0:
+            model_dir = Path(scratch_dir) / f"candidate_{index}"
+            model_dir.mkdir(parents=True)
+            joblib.dump(rf, model_dir / "model.joblib")
+            compiled = CompiledForest.from_sklearn(rf, preproc)
+            compiled.save(model_dir / "compiled")
+            joblib_mb = (model_dir / "model.joblib").stat().st_size / 1e6
+            compiled_mb = sum(f.stat().st_size for f in (model_dir / "compiled").iterdir()) / 1e6
+            n_nodes = int(len(compiled.left))
+            (model_dir / "model.joblib").unlink()
+        del rf
+
+    rmse, mae, r2 = np.mean(scores, axis=0)
+    return {
+        "index": index,
+        "params": params,
+        "cv_rmse": round(float(rmse), 5),
+        "cv_mae": round(float(mae), 5),
+        "cv_r2": round(float(r2), 5),
+        "cv_rmse_std": round(float(np.std([s[0] for s in scores])), 5),
+        "joblib_mb": round(joblib_mb, 2),
+        "compiled_mb": round(compiled_mb, 2),
+        "n_nodes": n_nodes,
+        "cv_seconds": round(time.perf_counter() - t0, 1),
+        "compiled_path": str(model_dir / "compiled"),
+    }
+
+
+def measure_latency(compiled, n_rows, seed=0) -> float:
+    """p50 ms of compiled predict on `n_rows` in-range random rows."""
+    rng = np.random.default_rng(seed)
+    # Invert the MinMax scaling so rows cover the training range
+    scale = np.where(compiled.scale > 0, compiled.scale, 1)
+    X = (rng.random((n_rows, len(scale))) - compiled.offset) / scale
+    compiled.predict(X)
+    samples = []
+    for _ in range(LATENCY_REPEATS):
+        t0 = time.perf_counter()
+        compiled.predict(X)
+        samples.append(time.perf_counter() - t0)
+    return round(sorted(samples)[len(samples) // 2] * 1000, 3)
+
+
+def latency_name(n_rows) -> str:
+    return "latency_1_row_ms" if n_rows == 1 else f"latency_{n_rows}_rows_ms"
+
+
+def pareto_front(results, latency_key) -> list:
+    """Indices of results not dominated in (cv_rmse, latency)."""
+    front = []
+    for r in results:
+        dominated = any(
+            o["cv_rmse"] <= r["cv_rmse"] and o[latency_key] <= r[latency_key]
+            and (o["cv_rmse"] < r["cv_rmse"] or o[latency_key] < r[latency_key])
+            for o in results
+        )
+        if not dominated:
+            front.append(r["index"])
+    return front
+
+
+def select(results, latency_key, budget_ms):
+    """Most accurate Pareto-optimal candidate within budget, else the fastest one."""
+    front = [r for r in results if r["pareto"]]
+    within = [r for r in front if r[latency_key] <= budget_ms]
+    if within:
+        return min(within, key=lambda r: (r["cv_rmse"], r[latency_key])), True
+    return min(front, key=lambda r: r[latency_key]), False
+
+
+def search(data_path, out_model_dir: Path, preproc_dir: Path, space=None, n_random=None, cv=3,
+           workers=None, latency_budget_ms=20.0, budget_rows=None, sample_frac=1.0,
+           random_state=42, cache_dir=None):
+    from compiled_forest import load_compiled
+    from parent_dataset import CACHE_DIR, open_dataset
+    from train_and_predict_rf import fit_on_rows, save_artifacts
+
+    dataset = open_dataset(data_path, cache_dir or CACHE_DIR)
+    rng = np.random.default_rng(random_state)
+    rows = np.arange(len(dataset))
+    if sample_frac < 1.0:
+        rows = np.flatnonzero(rng.random(len(dataset)) < sample_frac)
+    folds = np.array_split(rng.permutation(rows), cv)
+    careers = dataset.careers()
+    if budget_rows is None:
+        # /rescore-parent scores the whole catalog in one predict call
+        budget_rows = len(careers)
+
+    grid = candidates(space or DEFAULT_SPACE, n_random, random_state)
+    latency_rows = sorted({*REPORT_ROWS, budget_rows})
+    latency_key = latency_name(budget_rows)
+    print(f"Searching {len(grid)} candidates x {cv} folds on {len(rows)} rows")
+
+    t0 = time.perf_counter()
+    scratch = Path(tempfile.mkdtemp(prefix="parent_search_"))
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(str(dataset.path), folds)) as pool:
+            futures = [pool.submit(evaluate_candidate, i, p, random_state, str(scratch)) for i, p in enumerate(grid)]
+            results = []
+            for future in futures:
+                r = future.result()
+                results.append(r)
+                print(f"  [{r['index'] + 1}/{len(grid)}] {r['params']}  cv_rmse {r['cv_rmse']:.4f}  {r['compiled_mb']:.1f} MB")
+
+        # Latency in this process only, one model at a time
+        for r in results:
+            compiled = load_compiled(r.pop("compiled_path"))
+            for n in latency_rows:
+                r[latency_name(n)] = measure_latency(compiled, n)
+            del compiled
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    front = set(pareto_front(results, latency_key))
+    for r in results:
+        r["pareto"] = r["index"] in front
+    chosen, within_budget = select(results, latency_key, latency_budget_ms)
+    if not within_budget:
+        print(f"Warning: no Pareto-optimal candidate within {latency_budget_ms} ms; using the fastest")
+    print(f"Selected {chosen['params']} (cv_rmse {chosen['cv_rmse']:.4f}, {chosen[latency_key]:.2f} ms at {budget_rows} rows)")
+
+    rf, preproc, metrics = fit_on_rows(dataset, rows, chosen["params"], random_state)
+    saved = save_artifacts(rf, preproc, out_model_dir, preproc_dir, rf.n_estimators, metrics, careers)
+
+    report = {
+        "model_version": saved["model_version"],
+        "dataset": {"source": str(data_path), "rows": int(len(rows)), "cv_folds": cv},
+        "latency_budget_ms": latency_budget_ms,
+        "budget_rows": budget_rows,
+        "within_budget": within_budget,
+        "selected": chosen,
+        "holdout_metrics": metrics,
+        "search_seconds": round(time.perf_counter() - t0, 1),
+        "candidates": sorted(results, key=lambda r: r["cv_rmse"]),
+    }
+    report_path = Path(out_model_dir) / "search_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("Saved search report to:", report_path)
+    return {**saved, "report_path": str(report_path)}
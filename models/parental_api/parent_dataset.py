@@ -0,0 +1,158 @@
+"""
+parent_dataset.py
+
+Bounded-memory access to large parent training sets.
+
+The CSV is read once, in chunks, with downcast dtypes (float32 features and
+target) and written to a columnar binary cache: one raw float32 file per
+column plus the unique careers and a meta.json. Later runs map the columns
+read-only and never parse the CSV again. The cache is rebuilt when the CSV's
+size or modification time changes.
+
+Cache layout (<cache_dir>/<csv stem>/):
+  meta.json            source signature, n_rows, columns
+  <column>.f32         one float32 value per row, for FEATURE_COLS + target
+  careers.npz          catalog columns of the unique careers (float64)
+
+Usage:
+  python parent_dataset.py --data parent_only_synthetic_dataset.csv    # build / refresh the cache
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from parent_scoring import CATALOG_COLUMNS
+from train_and_predict_rf import FEATURE_COLS, TARGET_COL
+
+CACHE_VERSION = 1
+BASE_DIR = Path(__file__).parent
+CACHE_DIR = BASE_DIR / "data_cache"
+CHUNK_ROWS = int(os.getenv("PARENT_TRAIN_CHUNK_ROWS", "500000"))
+
+COLUMNS = FEATURE_COLS + [TARGET_COL]
+# Kept at full precision: the API computes features from these values
+CATALOG_NUMERIC = ["c_avg_salary", "c_job_security", "c_prestige", "c_tuition"]
+
+
+def _signature(path: Path) -> dict:
+    stat = path.stat()
+    return {"source": str(path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def csv_dtypes() -> dict:
+    dtypes = {c: np.float32 for c in COLUMNS}
+    dtypes.update({c: np.float64 for c in CATALOG_NUMERIC})
+    dtypes.update({"career_id": str, "c_location": "category"})
+    return dtypes
+
+
+def build_cache(data_path, cache_dir=CACHE_DIR, chunk_rows=CHUNK_ROWS) -> Path:
+    """Convert the CSV to the columnar cache, one chunk in memory at a time."""
+    data_path = Path(data_path)
+    path = Path(cache_dir) / data_path.stem
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    header = pd.read_csv(data_path, nrows=0).columns
+    missing = [c for c in COLUMNS + CATALOG_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"Missing required columns in dataset: {missing}")
+    usecols = list(dict.fromkeys(COLUMNS + CATALOG_COLUMNS))
+
+    files = {c: open(tmp / f"{c}.f32", "wb") for c in COLUMNS}
+    careers = []
+    n_rows = 0
+    try:
+        for chunk in pd.read_csv(data_path, usecols=usecols, dtype=csv_dtypes(), chunksize=chunk_rows):
+            for c in COLUMNS:
+                chunk[c].to_numpy(dtype=np.float32).tofile(files[c])
+            careers.append(chunk[CATALOG_COLUMNS].drop_duplicates("career_id"))
+            n_rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    catalog = pd.concat(careers).drop_duplicates("career_id")
+    np.savez(
+        tmp / "careers.npz",
+        career_id=catalog["career_id"].to_numpy(dtype=str),
+        c_location=catalog["c_location"].to_numpy(dtype=str),
+        **{c: catalog[c].to_numpy(dtype=np.float64) for c in CATALOG_NUMERIC},
+    )
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, **_signature(data_path), "n_rows": n_rows, "columns": COLUMNS}, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    return path
+
+
+class CachedDataset:
+    """Read-only memory maps of the cached columns."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta["n_rows"]
+        self.columns = {
+            c: np.memmap(self.path / f"{c}.f32", dtype=np.float32, mode="r", shape=(self.n_rows,))
+            for c in self.meta["columns"]
+        }
+
+    def __len__(self):
+        return self.n_rows
+
+    def careers(self) -> pd.DataFrame:
+        with np.load(self.path / "careers.npz") as data:
+            return pd.DataFrame({c: data[c] for c in CATALOG_COLUMNS})
+
+    def features(self, rows) -> np.ndarray:
+        """float32 (len(rows), len(FEATURE_COLS)) matrix of the selected rows."""
+        X = np.empty((len(rows), len(FEATURE_COLS)), dtype=np.float32, order="F")
+        for j, c in enumerate(FEATURE_COLS):
+            X[:, j] = self.columns[c][rows]
+        return X
+
+    def target(self, rows) -> np.ndarray:
+        return np.asarray(self.columns[TARGET_COL][rows])
+
+
+def open_dataset(data_path, cache_dir=CACHE_DIR, chunk_rows=CHUNK_ROWS, rebuild=False) -> CachedDataset:
+    """Cached dataset for the CSV, building or refreshing the cache when needed."""
+    data_path = Path(data_path)
+    path = Path(cache_dir) / data_path.stem
+    meta_path = path / "meta.json"
+    if not rebuild and meta_path.exists():
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        current = {"version": CACHE_VERSION, **_signature(data_path), "columns": COLUMNS}
+        if all(meta.get(k) == v for k, v in current.items()):
+            return CachedDataset(path)
+        print(f"Dataset cache {path} is stale; rebuilding")
+    return CachedDataset(build_cache(data_path, cache_dir, chunk_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", type=str, default="parent_only_synthetic_dataset.csv", help="CSV dataset path")
+    parser.add_argument("--cache-dir", type=str, default=str(CACHE_DIR))
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the cache is current")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    dataset = open_dataset(args.data, args.cache_dir, args.chunk_rows, rebuild=args.rebuild)
+    print(f"{len(dataset)} rows cached at {dataset.path} ({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+parent_explanations.py
+
+Explanations for the recommended career, kept off the request path.
+
+Gemini is called from a bounded thread pool, never on the event loop. A
+request waits at most GEMINI_DEADLINE_SECONDS; if Gemini has not answered
+by then the response carries a local explanation built from the parent's
+labelled preferences and the career's attributes, plus an explanation id.
+The Gemini text can be fetched later with GET /explanations/{id}.
+
+Identical prompts share one job (the id is a hash of the prompt), so a
+parent resubmitting the same form does not trigger a second Gemini call.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from parent_scoring import LOCATION_CODES
+
+# ---------- NEW GOOGLE GENAI SDK ----------
+try:
+    # This is the correct import for the 'google-genai' package
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+    print("Error: 'google-genai' not found. Run 'pip install google-genai'")
+
+GEMINI_MODEL = "gemini-2.5-flash"
+# How long a request waits for Gemini before answering with the local text
+GEMINI_DEADLINE_SECONDS = float(os.getenv("PARENT_GEMINI_DEADLINE", "3.0"))
+# Hard limit on the background HTTP call itself
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("PARENT_GEMINI_TIMEOUT", "30"))
+EXPLANATION_WORKERS = int(os.getenv("PARENT_EXPLANATION_WORKERS", "4"))
+# How long finished / failed jobs stay in memory
+JOB_TTL_SECONDS = float(os.getenv("PARENT_EXPLANATION_TTL", "3600"))
+
+# Initialize Client
+API_KEY = os.getenv("GOOGLE_API_KEY")
+client = None
+if API_KEY and genai is not None:
+    client = genai.Client(
+        api_key=API_KEY,
+        http_options=types.HttpOptions(timeout=int(GEMINI_TIMEOUT_SECONDS * 1000))
+    )
+
+
+def to_percentage(score: int) -> str:
+    # Convert 1-5 scale to 0-100%
+    percentage = (score - 1) / 4 * 100
+    return f"{int(percentage)}%"
+
+
+def level_label(fraction: float) -> str:
+    """High / Medium / Low for a value on a 0-1 scale."""
+    if fraction >= 0.67:
+        return "High"
+    if fraction >= 0.34:
+        return "Medium"
+    return "Low"
+
+
+def likert_label(score: int) -> str:
+    return level_label((score - 1) / 4)
+
+
+def gemini_prompt(career_id: str, score: float, input) -> str:
+    return f"""
+    You are a professional career advisor for parents.
+    Explain why the career '{career_id}' (Recommendation Score: {round(score, 2)}) is a great fit.
+
+    Consider the following parent preferences in your explanation:
+    - Max Tuition Budget: {input.budget_max_tuition}
+    - Importance of Finances: {to_percentage(input.importance_finances)}
+    - Importance of Job Security: {to_percentage(input.importance_job_security)}
+    - Importance of Prestige: {to_percentage(input.importance_prestige)}
+    - Risk Tolerance: {to_percentage(input.parent_risk_tolerance)}
+    - Influence from others: {to_percentage(input.influence_from_people)}
+    - Location Preference: {input.location_preference}
+    - Migration Allowed: {"Yes" if input.migration_allowed else "No"}
+
+    Instructions:
+1. Provide the response in exactly 6 bullet points.
+2. Mention specific labels (High, Medium, or Low) based on the percentages provided.
+3. Strictly avoid using any bold text (no asterisks **).
+4. Use professional and encouraging language suitable for a customer-facing report.
+    """
+
+
+def generate_gemini_explanation(prompt: str) -> str:
+    """Blocking Gemini call; raises on any failure so callers can fall back."""
+    if client is None:
+        raise RuntimeError("GOOGLE_API_KEY not set")
+    response = client.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    return response.text.strip()
+
+
+def local_explanation(career: dict, score: float, input) -> str:
+    """Six bullet points from the parent's labelled preferences and the career's attributes."""
+    affordable = career["c_tuition"] <= input.budget_max_tuition
+    reach = career["c_location"]
+    if LOCATION_CODES[reach] <= LOCATION_CODES[input.location_preference]:
+        location_line = f"It is a {reach} career, which fits your {input.location_preference} location preference."
+    elif reach == "international" and input.migration_allowed:
+        location_line = "It is an international career; you have indicated that relocating is acceptable."
+    else:
+        location_line = f"It is a {reach} career, broader than your {input.location_preference} location preference."
+
+    return "\n".join([
+        f"- Finances are a {likert_label(input.importance_finances)} priority for you "
+        f"({to_percentage(input.importance_finances)}); {career['career_id']} offers an average salary "
+        f"of {career['c_avg_salary']:,.0f}.",
+        f"- Job security matters at a {likert_label(input.importance_job_security)} level "
+        f"({to_percentage(input.importance_job_security)}); this career's job security is "
+        f"{level_label(career['c_job_security'])}.",
+        f"- Prestige is a {likert_label(input.importance_prestige)} priority "
+        f"({to_percentage(input.importance_prestige)}); this career's prestige is "
+        f"{level_label(career['c_prestige'])}.",
+        f"- Tuition of {career['c_tuition']:,.0f} is "
+        + ("within" if affordable else "above")
+        + f" your maximum budget of {input.budget_max_tuition:,.0f}.",
+        f"- {location_line}",
+        f"- With {likert_label(input.parent_risk_tolerance)} risk tolerance "
+        f"({to_percentage(input.parent_risk_tolerance)}) and {likert_label(input.influence_from_people)} "
+        f"influence from others ({to_percentage(input.influence_from_people)}), its overall fit score "
+        f"is {round(score, 2)}.",
+    ])
+
+
+class ExplanationJobs:
+    """Gemini explanations running in a bounded pool, keyed on the prompt."""
+
+    def __init__(self, generate=generate_gemini_explanation, max_workers=EXPLANATION_WORKERS,
+                 ttl_seconds=JOB_TTL_SECONDS):
+        self.generate = generate
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="explanation")
+        self._jobs = {}   # id → {"future", "created_at"}
+        self._lock = threading.Lock()
+
+    def submit(self, prompt: str):
+        """(explanation_id, future) for the prompt, reusing a running or finished job."""
+        explanation_id = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(explanation_id)
+            if job is None or (job["future"].done() and job["future"].exception() is not None):
+                job = {"future": self._executor.submit(self.generate, prompt), "created_at": time.time()}
+                self._jobs[explanation_id] = job
+        return explanation_id, job["future"]
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        for explanation_id in [
+            k for k, job in self._jobs.items()
+            if job["created_at"] < cutoff and job["future"].done()
+        ]:
+            del self._jobs[explanation_id]
+
+    def status(self, explanation_id):
+        """Current state of an explanation, or None if the id is unknown."""
+        with self._lock:
+            job = self._jobs.get(explanation_id)
+        if job is None:
+            return None
+        return self._describe(explanation_id, job["future"])
+
+    @staticmethod
+    def _describe(explanation_id, future):
+        if not future.done():
+            return {"explanation_id": explanation_id, "status": "pending"}
+        if future.exception() is not None:
+            return {"explanation_id": explanation_id, "status": "failed", "error": str(future.exception())}
+        return {"explanation_id": explanation_id, "status": "ready", "parent_explanation": future.result()}
+
+    def _result(self, explanation_id, future, fallback):
+        """Response fields: Gemini text if ready, the local text otherwise."""
+        status = self._describe(explanation_id, future)
+        if status["status"] == "failed":
+            print(f"Gemini error: {status['error']}")
+        return {
+            "parent_explanation": status.get("parent_explanation", fallback),
+            "explanation_source": "gemini" if status["status"] == "ready" else "local",
+            "explanation_id": explanation_id,
+            "explanation_status": status["status"],
+        }
+
+    async def explain(self, prompt: str, fallback: str, deadline: float = GEMINI_DEADLINE_SECONDS):
+        """Wait up to `deadline` seconds without blocking the event loop."""
+        if client is None and self.generate is generate_gemini_explanation:
+            return {"parent_explanation": fallback, "explanation_source": "local",
+                    "explanation_id": None, "explanation_status": "unavailable"}
+        explanation_id, future = self.submit(prompt)
+        if not future.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), deadline)
+            except Exception:
+                pass   # timeout or Gemini error; reported through the status
+        return self._result(explanation_id, future, fallback)
+
+    def explain_many(self, prompts, fallbacks, deadline: float = GEMINI_DEADLINE_SECONDS):
+        """Blocking variant for sync endpoints: one shared deadline for all prompts."""
+        if client is None and self.generate is generate_gemini_explanation:
+            return [{"parent_explanation": fallback, "explanation_source": "local",
+                     "explanation_id": None, "explanation_status": "unavailable"} for fallback in fallbacks]
+        jobs = [self.submit(prompt) for prompt in prompts]
+        concurrent.futures.wait([future for _, future in jobs], timeout=deadline)
+        return [self._result(explanation_id, future, fallback)
+                for (explanation_id, future), fallback in zip(jobs, fallbacks)]
@@ -0,0 +1,302 @@
+"""
+parent_scoring.py
+
+Vectorized feature construction and ranking for /rescore-parent.
+
+The career-static columns are converted to NumPy arrays once (CareerCatalog).
+Per request, the parent's preferences are broadcast over them, unacceptable
+careers are masked out before prediction, and the top k is picked with a
+partial selection instead of sorting every score. rank_careers_batch does
+the same for many parents with one prediction pass per chunk, and
+ranking_changes summarizes a what-if sweep over one preference.
+attribute_careers gives the per-feature "why" of the ranked careers.
+
+The catalog is shipped as its own artifact (career_catalog.npz, written by
+train_and_predict_rf.py --train) so the API never reads the training CSV.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from train_and_predict_rf import FEATURE_COLS
+
+CATALOG_COLUMNS = ["career_id", "c_avg_salary", "c_job_security", "c_prestige", "c_tuition", "c_location"]
+LOCATION_CODES = {"local": 0, "national": 1, "international": 2}
+LOCATION_NAMES = sorted(LOCATION_CODES, key=LOCATION_CODES.get)
+CATALOG_VERSION = 1
+TOP_K = 5
+# Above this many rows sklearn's C tree traversal beats the compiled evaluator
+COMPILED_MAX_ROWS = int(os.getenv("PARENT_COMPILED_MAX_ROWS", "500"))
+# Feature-matrix rows (parents x careers) scored per pass by rank_careers_batch
+BATCH_CHUNK_ROWS = int(os.getenv("PARENT_BATCH_CHUNK_ROWS", "100000"))
+
+COLUMN_INDEX = {name: i for i, name in enumerate(FEATURE_COLS)}
+
+
+def normalize_likert(x: int) -> float:
+    return (x - 1) / 4.0
+
+
+class CareerCatalog:
+    """Career-static columns as contiguous arrays, one row per career."""
+
+    def __init__(self, career_ids, avg_salary, job_security, prestige, tuition, location_codes):
+        self.career_ids = list(career_ids)
+        self.avg_salary = np.asarray(avg_salary, dtype=np.float64)
+        self.job_security = np.asarray(job_security, dtype=np.float64)
+        self.prestige = np.asarray(prestige, dtype=np.float64)
+        self.tuition = np.asarray(tuition, dtype=np.float64)
+        self.location = np.asarray(location_codes, dtype=np.int8)
+
+        # For the exact-match f_is_unacceptable feature and the case-insensitive veto
+        self.id_strings = np.array([str(c) for c in self.career_ids])
+        self.id_keys = np.char.lower(self.id_strings)
+        self._row = {c: i for i, c in enumerate(self.career_ids)}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CareerCatalog":
+        df = df[CATALOG_COLUMNS].drop_duplicates("career_id")
+        unknown = set(df["c_location"]) - set(LOCATION_CODES)
+        if unknown:
+            raise ValueError(f"Unknown career locations: {sorted(unknown)}")
+        return cls(
+            df["career_id"].tolist(),
+            df["c_avg_salary"].to_numpy(),
+            df["c_job_security"].to_numpy(),
+            df["c_prestige"].to_numpy(),
+            df["c_tuition"].to_numpy(),
+            df["c_location"].map(LOCATION_CODES).to_numpy(),
+        )
+
+    def __len__(self):
+        return len(self.career_ids)
+
+    def save(self, path, model_version):
+        """Write the catalog as a typed columnar .npz tagged with the model version.
+
+        Location is stored as int8 codes plus the code -> name table.
+        """
+        path = Path(path)
+        meta = {"version": CATALOG_VERSION, "model_version": model_version, "n_careers": len(self)}
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            career_id=self.id_strings,
+            c_avg_salary=self.avg_salary,
+            c_job_security=self.job_security,
+            c_prestige=self.prestige,
+            c_tuition=self.tuition,
+            c_location=self.location,
+            location_names=np.array(LOCATION_NAMES),
+            meta=np.array(json.dumps(meta)),
+        )
+        os.replace(tmp, path)
+
+    def career(self, career_id) -> dict:
+        """Catalog columns of one career, with the location name."""
+        i = self._row[career_id]
+        return {
+            "career_id": career_id,
+            "c_avg_salary": float(self.avg_salary[i]),
+            "c_job_security": float(self.job_security[i]),
+            "c_prestige": float(self.prestige[i]),
+            "c_tuition": float(self.tuition[i]),
+            "c_location": LOCATION_NAMES[self.location[i]],
+        }
+
+    def row_indices(self, career_ids) -> np.ndarray:
+        return np.array([self._row[c] for c in career_ids], dtype=np.int64)
+
+    def acceptable_rows(self, unacceptable_careers) -> np.ndarray:
+        """Row indices of careers not vetoed by the parent (case-insensitive)."""
+        blocked = [str(c).lower().strip() for c in unacceptable_careers]
+        if not blocked:
+            return np.arange(len(self))
+        return np.flatnonzero(~np.isin(self.id_keys, blocked))
+
+
+def load_catalog(path):
+    """(CareerCatalog, meta) from an artifact written by CareerCatalog.save."""
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta["version"] != CATALOG_VERSION:
+            raise ValueError(f"Career catalog {path} has version {meta['version']}, expected {CATALOG_VERSION}")
+        if data["location_names"].tolist() != LOCATION_NAMES:
+            raise ValueError(f"Career catalog {path} uses different location codes")
+        catalog = CareerCatalog(
+            data["career_id"].tolist(),
+            data["c_avg_salary"],
+            data["c_job_security"],
+            data["c_prestige"],
+            data["c_tuition"],
+            data["c_location"],
+        )
+    return catalog, meta
+
+
+def parent_features(input) -> dict:
+    return {
+        "p_financial_weight": normalize_likert(input.importance_finances),
+        "p_job_security_weight": normalize_likert(input.importance_job_security),
+        "p_prestige_weight": normalize_likert(input.importance_prestige),
+        "p_parent_risk_tolerance": normalize_likert(input.parent_risk_tolerance),
+        "p_weight_on_parent_layer": normalize_likert(input.influence_from_people),
+        "p_budget_max_tuition": input.budget_max_tuition,
+    }
+
+
+def build_feature_matrix(catalog: CareerCatalog, input, rows=None) -> np.ndarray:
+    """(len(rows), len(FEATURE_COLS)) float matrix in FEATURE_COLS order."""
+    rows = np.arange(len(catalog)) if rows is None else rows
+    salary = catalog.avg_salary[rows]
+    tuition = catalog.tuition[rows]
+    location = catalog.location[rows]
+    budget = input.budget_max_tuition
+
+    X = np.empty((len(rows), len(FEATURE_COLS)), dtype=np.float64)
+    for name, value in parent_features(input).items():
+        X[:, COLUMN_INDEX[name]] = value
+
+    X[:, COLUMN_INDEX["c_avg_salary"]] = salary
+    X[:, COLUMN_INDEX["c_job_security"]] = catalog.job_security[rows]
+    X[:, COLUMN_INDEX["c_prestige"]] = catalog.prestige[rows]
+    X[:, COLUMN_INDEX["c_tuition"]] = tuition
+    X[:, COLUMN_INDEX["f_fin_ratio"]] = salary / max(1, budget * 3)
+    X[:, COLUMN_INDEX["f_tuition_affordable"]] = tuition <= budget
+    X[:, COLUMN_INDEX["f_location_match"]] = location <= LOCATION_CODES[input.location_preference]
+    X[:, COLUMN_INDEX["f_migration_ok"]] = input.migration_allowed | (location != LOCATION_CODES["international"])
+    X[:, COLUMN_INDEX["f_is_unacceptable"]] = np.isin(
+        catalog.id_strings[rows], [str(c) for c in input.unacceptable_careers]
+    )
+    X[:, COLUMN_INDEX["f_risk_penalty"]] = 1.0
+    return X
+
+
+def build_batch_feature_matrix(catalog: CareerCatalog, inputs) -> np.ndarray:
+    """(len(inputs) * len(catalog), len(FEATURE_COLS)) matrix, parent-major.
+
+    Row p * len(catalog) + c equals build_feature_matrix(catalog, inputs[p])[c].
+    """
+    n_parents, n_careers = len(inputs), len(catalog)
+    X = np.empty((n_parents, n_careers, len(FEATURE_COLS)), dtype=np.float64)
+
+    per_parent = [parent_features(input) for input in inputs]
+    for name in per_parent[0]:
+        X[:, :, COLUMN_INDEX[name]] = np.array([f[name] for f in per_parent])[:, None]
+
+    budget = np.array([input.budget_max_tuition for input in inputs], dtype=np.float64)[:, None]
+    preference = np.array([LOCATION_CODES[input.location_preference] for input in inputs])[:, None]
+    migration = np.array([input.migration_allowed for input in inputs], dtype=bool)[:, None]
+
+    X[:, :, COLUMN_INDEX["c_avg_salary"]] = catalog.avg_salary
+    X[:, :, COLUMN_INDEX["c_job_security"]] = catalog.job_security
+    X[:, :, COLUMN_INDEX["c_prestige"]] = catalog.prestige
+    X[:, :, COLUMN_INDEX["c_tuition"]] = catalog.tuition
+    X[:, :, COLUMN_INDEX["f_fin_ratio"]] = catalog.avg_salary / np.maximum(1, budget * 3)
+    X[:, :, COLUMN_INDEX["f_tuition_affordable"]] = catalog.tuition <= budget
+    X[:, :, COLUMN_INDEX["f_location_match"]] = catalog.location <= preference
+    X[:, :, COLUMN_INDEX["f_migration_ok"]] = migration | (catalog.location != LOCATION_CODES["international"])
+    X[:, :, COLUMN_INDEX["f_is_unacceptable"]] = 0.0
+    for p, input in enumerate(inputs):
+        if input.unacceptable_careers:
+            X[p, :, COLUMN_INDEX["f_is_unacceptable"]] = np.isin(
+                catalog.id_strings, [str(c) for c in input.unacceptable_careers]
+            )
+    X[:, :, COLUMN_INDEX["f_risk_penalty"]] = 1.0
+    return X.reshape(n_parents * n_careers, len(FEATURE_COLS))
+
+
+def predict_scores(model, preprocessor, X: np.ndarray, compiled=None) -> np.ndarray:
+    """Forest prediction for raw FEATURE_COLS rows.
+
+    Uses the compiled forest (see compiled_forest.py) for small matrices
+    when one is given, sklearn otherwise.
+    """
+    if compiled is not None and len(X) <= COMPILED_MAX_ROWS:
+        return compiled.predict(X)
+    # The ColumnTransformer selects columns by name, so it needs a DataFrame
+    return model.predict(preprocessor.transform(pd.DataFrame(X, columns=FEATURE_COLS)))
+
+
+def top_k(scores: np.ndarray, k: int = TOP_K) -> list:
+    """Positions of the k best scores, ranked like a stable descending sort
+    on the 3-decimal rounded scores (ties keep catalog order).
+    """
+    n = len(scores)
+    if n > k:
+        kth = np.partition(scores, n - k)[n - k]
+        # Rounding can tie a slightly lower score with the k-th one
+        candidates = np.flatnonzero(scores > kth - 1e-3)
+    else:
+        candidates = np.arange(n)
+    rounded = [round(float(s), 3) for s in scores[candidates]]
+    order = sorted(range(len(candidates)), key=lambda i: -rounded[i])
+    return [int(candidates[i]) for i in order[:k]]
+
+
+def rank_careers(catalog: CareerCatalog, input, model, preprocessor, k: int = TOP_K, compiled=None) -> list:
+    """Top-k acceptable careers as [{"career_id", "parent_score"}]; empty if all are vetoed."""
+    rows = catalog.acceptable_rows(input.unacceptable_careers)
+    if rows.size == 0:
+        return []
+    scores = predict_scores(model, preprocessor, build_feature_matrix(catalog, input, rows), compiled)
+    return [
+        {"career_id": catalog.career_ids[rows[i]], "parent_score": round(float(scores[i]), 3)}
+        for i in top_k(scores, k)
+    ]
+
+
+def rank_careers_batch(catalog: CareerCatalog, inputs, model, preprocessor, k: int = TOP_K,
+                       compiled=None, chunk_rows: int = BATCH_CHUNK_ROWS) -> list:
+    """rank_careers for many parents, one prediction pass per chunk.
+
+    Every parent is scored against the full catalog so a chunk is a single
+    (parents x careers) matrix; vetoed careers are dropped before the top k.
+    A chunk holds at most `chunk_rows` matrix rows (at least one parent).
+    """
+    n_careers = len(catalog)
+    parents_per_chunk = max(1, chunk_rows // max(1, n_careers))
+    results = []
+    for start in range(0, len(inputs), parents_per_chunk):
+        chunk = inputs[start:start + parents_per_chunk]
+        X = build_batch_feature_matrix(catalog, chunk)
+        scores = predict_scores(model, preprocessor, X, compiled).reshape(len(chunk), n_careers)
+        for input, parent_scores in zip(chunk, scores):
+            rows = catalog.acceptable_rows(input.unacceptable_careers)
+            results.append([
+                {"career_id": catalog.career_ids[rows[i]], "parent_score": round(float(parent_scores[rows[i]]), 3)}
+                for i in top_k(parent_scores[rows], k)
+            ])
+    return results
+
+
+def ranking_changes(ranked: list) -> list:
+    """Positions i > 0 where the ranked career ids differ from position i - 1."""
+    ids = [[r["career_id"] for r in top] for top in ranked]
+    return [i for i in range(1, len(ids)) if ids[i] != ids[i - 1]]
+
+
+def attribute_careers(catalog: CareerCatalog, input, ranked: list, compiled, top_features: int = None) -> list:
+    """Path attributions (see CompiledForest.contributions) for ranked careers.
+
+    One entry per career: the forest's baseline score and the contribution
+    of every feature, largest magnitude first (optionally only the first
+    `top_features`).
+    """
+    if not ranked:
+        return []
+    rows = catalog.row_indices([r["career_id"] for r in ranked])
+    baseline, contributions = compiled.contributions(build_feature_matrix(catalog, input, rows))
+    result = []
+    for r, row in zip(ranked, contributions):
+        order = np.argsort(-np.abs(row), kind="stable")[:top_features]
+        result.append({
+            "career_id": r["career_id"],
+            "baseline": round(baseline, 4),
+            "contributions": {FEATURE_COLS[j]: round(float(row[j]), 4) for j in order},
+        })
+    return result
@@ -6,6 +6,15 @@ Usage:
   # Train:
   python train_and_predict_rf.py --train --data parent_only_synthetic_dataset.csv --out models/parent_layer --preproc models/preprocessors
 
+  # Train on a large CSV with bounded memory (float32 columnar cache, optional subsampling):
+  python train_and_predict_rf.py --train --chunked --data big.csv --sample-frac 0.5 --max-samples 0.1
+
+  # Hyperparameter search; keeps the most accurate Pareto-optimal model within the latency budget:
+  python train_and_predict_rf.py --search --search-random 12 --latency-budget-ms 10
+
+  # Rebuild only the career catalog for an already trained model:
+  python train_and_predict_rf.py --catalog --data parent_only_synthetic_dataset.csv --out models/parent_layer
+
   # Predict (JSON inline):
   python train_and_predict_rf.py --predict --model models/parent_layer/parent_model_rf.joblib --preproc models/preprocessors/parent_preprocessor_coltransformer.joblib \
     --input '{"f_fin_ratio":1.2,"f_risk_penalty":1.0,"p_financial_weight":0.75,"p_job_security_weight":1.0,"p_prestige_weight":0.5,"p_parent_risk_tolerance":0.25,"p_weight_on_parent_layer":0.2,"p_budget_max_tuition":150000,"c_avg_salary":70000,"c_job_security":0.8,"c_prestige":0.7,"c_tuition":20000,"f_location_match":1,"f_tuition_affordable":1,"f_migration_ok":1,"f_is_unacceptable":0}'
@@ -15,7 +24,9 @@ Usage:
 """
 
 import argparse
+import hashlib
 import json
+import time
 from pathlib import Path
 import joblib
 import numpy as np
@@ -36,6 +47,8 @@ FEATURE_COLS = [
     "f_location_match","f_tuition_affordable","f_migration_ok","f_is_unacceptable"
 ]
 TARGET_COL = "parent_score"
+MODEL_META_NAME = "parent_model_meta.json"
+CATALOG_NAME = "career_catalog.npz"
 
 def build_preprocessor(feature_cols):
     """Return a ColumnTransformer that imputes numeric features and scales to [0,1]."""
@@ -48,6 +61,17 @@ def build_preprocessor(feature_cols):
     ], remainder="drop")
     return preproc
 
+def read_model_version(model_dir: Path) -> str:
+    with open(Path(model_dir) / MODEL_META_NAME, encoding="utf-8") as f:
+        return json.load(f)["model_version"]
+
+def save_catalog(df: pd.DataFrame, model_dir: Path, model_version: str) -> Path:
+    """Career-static columns of the training data as the API's catalog artifact."""
+    from parent_scoring import CareerCatalog
+    catalog_path = Path(model_dir) / CATALOG_NAME
+    CareerCatalog.from_frame(df).save(catalog_path, model_version)
+    return catalog_path
+
 def train(data_path: Path, out_model_dir: Path, preproc_dir: Path, n_trees=200, random_state=42):
     df = pd.read_csv(data_path)
     missing = [c for c in FEATURE_COLS + [TARGET_COL] if c not in df.columns]
@@ -78,7 +102,10 @@ def train(data_path: Path, out_model_dir: Path, preproc_dir: Path, n_trees=200,
     metrics = {"rmse": rmse, "mae": mae, "r2": r2}
     print("Training complete. Metrics:", metrics)
 
-    # Persist artifacts
+    return save_artifacts(rf, preproc, out_model_dir, preproc_dir, n_trees, metrics, df)
+
+def save_artifacts(rf, preproc, out_model_dir: Path, preproc_dir: Path, n_trees, metrics, careers_df):
+    """Persist model, preprocessor, compiled forest and career catalog under one model version."""
     out_model_dir.mkdir(parents=True, exist_ok=True)
     preproc_dir.mkdir(parents=True, exist_ok=True)
 
@@ -88,10 +115,141 @@ def train(data_path: Path, out_model_dir: Path, preproc_dir: Path, n_trees=200,
     joblib.dump(rf, model_path)
     joblib.dump(preproc, preproc_path)
 
+    # Every artifact derived from this model is tagged with its version
+    sha = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+    model_version = time.strftime("%Y%m%d%H%M%S", time.gmtime()) + "-" + digest[:8]
+    meta_path = out_model_dir / MODEL_META_NAME
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"model_version": model_version, "n_trees": n_trees, "metrics": metrics}, f, indent=2)
+
+    # Array form of forest + preprocessing used by the API for small requests
+    from compiled_forest import CompiledForest
+    compiled_path = out_model_dir / "parent_model_compiled"
+    CompiledForest.from_sklearn(rf, preproc).save(compiled_path, model_version)
+
+    # The API scores against this instead of reading the training CSV
+    catalog_path = save_catalog(careers_df, out_model_dir, model_version)
+
     print("Saved model to:", model_path)
     print("Saved preprocessor to:", preproc_path)
+    print("Saved compiled model to:", compiled_path)
+    print("Saved career catalog to:", catalog_path)
+
+    return {
+        "model_version": model_version,
+        "model_path": str(model_path),
+        "preproc_path": str(preproc_path),
+        "compiled_path": str(compiled_path),
+        "catalog_path": str(catalog_path),
+        "metrics": metrics
+    }
+
+def peak_rss_mb() -> float:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB on Linux
+
+# With max_samples, trees are fit in groups, each on a fresh uniform pool of
+# BOOTSTRAP_POOL_FACTOR x max_samples training rows (see fit_on_rows)
+BOOTSTRAP_POOL_FACTOR = 4
+TREES_PER_POOL = 10
+
+def _bootstrap_count(max_samples, n_rows: int) -> int:
+    if isinstance(max_samples, float) and max_samples <= 1:
+        return max(1, int(round(max_samples * n_rows)))
+    return min(int(max_samples), n_rows)
+
+def _fit_in_pools(dataset, train_rows, params: dict, random_state, rng):
+    """Forest whose trees are fit in groups on bounded row pools.
+
+    Only one pool (at most BOOTSTRAP_POOL_FACTOR x max_samples rows) is
+    materialized at a time, so memory does not grow with the dataset. Each
+    tree draws its bootstrap sample of max_samples rows from its group's
+    pool; the preprocessor is fit on the first pool.
+    """
+    n_trees = params.get("n_estimators", 100)
+    n_boot = _bootstrap_count(params["max_samples"], len(train_rows))
+    pool_rows = min(len(train_rows), BOOTSTRAP_POOL_FACTOR * n_boot)
+
+    def pool():
+        # Sorted ids read the mapped columns front to back
+        return np.sort(rng.choice(train_rows, pool_rows, replace=False))
+
+    preproc = build_preprocessor(FEATURE_COLS)
+    rows = pool()
+    preproc.fit(pd.DataFrame(dataset.features(rows), columns=FEATURE_COLS, copy=False))
+
+    rf = RandomForestRegressor(random_state=random_state, n_jobs=-1, warm_start=True,
+                               **{**params, "n_estimators": 0, "max_samples": n_boot})
+    while rf.n_estimators < n_trees:
+        if rows is None:
+            rows = pool()
+        X_pool = preproc.transform(pd.DataFrame(dataset.features(rows), columns=FEATURE_COLS, copy=False))
+        rf.set_params(n_estimators=min(n_trees, rf.n_estimators + TREES_PER_POOL))
+        rf.fit(X_pool, dataset.target(rows))
+        rows = X_pool = None
+    rf.set_params(warm_start=False)
+    return rf, preproc
 
-    return {"model_path": str(model_path), "preproc_path": str(preproc_path), "metrics": metrics}
+def fit_on_rows(dataset, rows, params: dict, random_state=42):
+    """Fit preprocessor + forest on 85% of `rows` of a CachedDataset, evaluate on the rest."""
+    rng = np.random.default_rng(random_state)
+    # train/test split on row ids, so the full matrix is never copied
+    is_test = rng.random(len(rows)) < 0.15
+    train_rows, test_rows = rows[~is_test], rows[is_test]
+
+    if params.get("max_samples") is not None:
+        rf, preproc = _fit_in_pools(dataset, train_rows, params, random_state, rng)
+    else:
+        preproc = build_preprocessor(FEATURE_COLS)
+        X_train_p = preproc.fit_transform(pd.DataFrame(dataset.features(train_rows), columns=FEATURE_COLS, copy=False))
+        y_train = dataset.target(train_rows)
+
+        rf = RandomForestRegressor(random_state=random_state, n_jobs=-1, **params)
+        rf.fit(X_train_p, y_train)
+        del X_train_p
+
+    # Evaluate in slices of the test rows
+    y_test = dataset.target(test_rows).astype(float)
+    y_pred = np.concatenate([
+        rf.predict(preproc.transform(pd.DataFrame(dataset.features(part), columns=FEATURE_COLS, copy=False)))
+        for part in np.array_split(test_rows, max(1, len(test_rows) // 200_000))
+    ])
+    metrics = {
+        "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        "mae": float(mean_absolute_error(y_test, y_pred)),
+        "r2": float(r2_score(y_test, y_pred)),
+        "train_rows": int(len(train_rows)),
+    }
+    print("Training complete. Metrics:", metrics)
+
+    return rf, preproc, metrics
+
+def train_chunked(data_path: Path, out_model_dir: Path, preproc_dir: Path, n_trees=200, random_state=42,
+                  sample_frac=1.0, max_samples=None, chunk_rows=None, cache_dir=None):
+    """Train from the columnar cache (see parent_dataset.py) with bounded memory.
+
+    Rows are materialized as float32 and only when needed. `sample_frac`
+    keeps a uniform fraction of the dataset, all of which is materialized
+    for the fit. `max_samples` (fraction or count) is the bootstrap size per
+    tree, and with it memory is bounded by max_samples rather than the
+    dataset: trees are fit in pools (see _fit_in_pools).
+    """
+    from parent_dataset import CACHE_DIR, CHUNK_ROWS, open_dataset
+
+    dataset = open_dataset(data_path, cache_dir or CACHE_DIR, chunk_rows or CHUNK_ROWS)
+    rng = np.random.default_rng(random_state)
+    rows = np.arange(len(dataset))
+    if sample_frac < 1.0:
+        rows = np.flatnonzero(rng.random(len(dataset)) < sample_frac)
+
+    rf, preproc, metrics = fit_on_rows(
+        dataset, rows, {"n_estimators": n_trees, "max_samples": max_samples}, random_state
+    )
+    return save_artifacts(rf, preproc, out_model_dir, preproc_dir, n_trees, metrics, dataset.careers())
 
 def _parse_input_json(json_str: str) -> dict:
     try:
@@ -151,6 +309,8 @@ def predict_single(model_path: Path, preproc_path: Path, input_row: dict):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--train", action="store_true", help="Train a RandomForest model on the CSV.")
+    parser.add_argument("--search", action="store_true", help="Hyperparameter search with latency-aware selection (see model_search.py).")
+    parser.add_argument("--catalog", action="store_true", help="Rebuild the career catalog for the model in --out.")
     parser.add_argument("--predict", action="store_true", help="Load model+preprocessor and predict from input.")
     parser.add_argument("--data", type=str, default="parent_only_synthetic_dataset.csv", help="CSV dataset path")
     parser.add_argument("--out", type=str, default="models/parent_layer", help="Where to save model")
@@ -159,6 +319,18 @@ def main():
     parser.add_argument("--preproc-file", dest="preproc_file", type=str, default="models/preprocessors/parent_preprocessor_coltransformer.joblib", help="Preprocessor path (for predict)")
     parser.add_argument("--input", type=str, help="Input JSON string for prediction (single example). If omitted, interactive prompts will run.")
     parser.add_argument("--trees", type=int, default=200, help="Number of trees for RandomForest")
+    parser.add_argument("--chunked", action="store_true", help="Train from a chunked, cached float32 copy of the CSV")
+    parser.add_argument("--chunk-rows", type=int, help="CSV rows per chunk when building the cache")
+    parser.add_argument("--cache-dir", type=str, help="Where to keep the dataset cache (default data_cache/)")
+    parser.add_argument("--sample-frac", type=float, default=1.0, help="Train on this fraction of rows (--chunked)")
+    parser.add_argument("--max-samples", type=float, help="Bootstrap size per tree: fraction (<=1) or row count")
+    parser.add_argument("--space", type=str, help='Search space as JSON, e.g. {"n_estimators": [50, 100], "max_depth": [null, 12]}')
+    parser.add_argument("--search-random", type=int, help="Evaluate this many random candidates instead of the full grid")
+    parser.add_argument("--cv", type=int, default=3, help="Cross-validation folds for --search")
+    parser.add_argument("--workers", type=int, help="Search processes (default: CPU count)")
+    parser.add_argument("--latency-budget-ms", type=float, default=20.0, help="Compiled predict p50 budget for --search")
+    parser.add_argument("--budget-rows", type=int, help="Rows per predict call the budget applies to (default: catalog size)")
+    parser.add_argument("--publish", action="store_true", help="After --train/--search, publish to the model registry and make it current (see model_registry.py)")
     args = parser.parse_args()
 
     if args.train:
@@ -166,8 +338,46 @@ def main():
         out_dir = Path(args.out)
         preproc_dir = Path(args.preproc)
         print("Training with data:", data_path)
-        res = train(data_path, out_dir, preproc_dir, n_trees=args.trees)
+        t0 = time.perf_counter()
+        if args.chunked:
+            max_samples = args.max_samples
+            if max_samples is not None and max_samples > 1:
+                max_samples = int(max_samples)
+            res = train_chunked(
+                data_path, out_dir, preproc_dir, n_trees=args.trees, sample_frac=args.sample_frac,
+                max_samples=max_samples, chunk_rows=args.chunk_rows, cache_dir=args.cache_dir
+            )
+        else:
+            res = train(data_path, out_dir, preproc_dir, n_trees=args.trees)
         print("Saved:", res)
+        print(f"Wall time: {time.perf_counter() - t0:.1f} s, peak RSS: {peak_rss_mb():.0f} MB")
+        if args.publish:
+            from model_registry import publish
+            print("Published to registry:", publish(Path(args.out), Path(res["preproc_path"])))
+        return
+
+    if args.search:
+        from model_search import search
+        t0 = time.perf_counter()
+        res = search(
+            Path(args.data), Path(args.out), Path(args.preproc),
+            space=json.loads(args.space) if args.space else None, n_random=args.search_random, cv=args.cv,
+            workers=args.workers, latency_budget_ms=args.latency_budget_ms, budget_rows=args.budget_rows,
+            sample_frac=args.sample_frac, cache_dir=args.cache_dir
+        )
+        print("Saved:", res)
+        print(f"Wall time: {time.perf_counter() - t0:.1f} s, peak RSS: {peak_rss_mb():.0f} MB")
+        if args.publish:
+            from model_registry import publish
+            print("Published to registry:", publish(Path(args.out), Path(res["preproc_path"])))
+        return
+
+    if args.catalog:
+        out_dir = Path(args.out)
+        model_version = read_model_version(out_dir)
+        from parent_scoring import CATALOG_COLUMNS
+        df = pd.read_csv(args.data, usecols=CATALOG_COLUMNS)
+        print("Saved career catalog to:", save_catalog(df, out_dir, model_version))
         return
 
     if args.predict:
@@ -0,0 +1,285 @@
+"""
+bench_scoring.py
+
+Offline benchmark and exhaustive property checks for the societal scoring
+core. No Gemini calls, no network; the full run takes a few seconds.
+
+Implementations compared:
+  - reference:  societal.map_array_to_responses + compute_recommendation
+  - lookup:     fuzzy_table.LookupEngine.recommend (precomputed tables)
+  - vectorized: fuzzy_table.LookupEngine.score_batch
+  - compiled:   rule_engine.CompiledRuleEngine.evaluate (no tables)
+
+Properties (over the full input space where it is finite):
+  - bias_adjusted_pair: range, mirror symmetry, reverse-coding symmetry,
+    monotonicity
+  - every 6-answer domain combination: score within the rule output range
+    (or 0.0 when no rule fires), rounded to 2 decimals, identical across
+    implementations
+  - ties: surveys whose domains share the same answers recommend every
+    domain, in domain order, in every implementation
+  - cohort: cohort_analysis rejects malformed export rows (bad UTF-8,
+    wrong column count, out-of-range or non-integer answers) by line number
+
+Usage:
+  python bench_scoring.py
+  python bench_scoring.py --properties-only
+  python bench_scoring.py --out bench_results.json
+  python bench_scoring.py --baseline bench_baseline.json --threshold 0.15
+
+Exits with status 1 when a property fails or, with --baseline, when any
+latency or throughput is worse than the baseline by more than the threshold.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import time
+
+import numpy as np
+
+from societal import (
+    bias_adjusted_pair,
+    compute_recommendation,
+    map_array_to_responses,
+    sugeno_domain_influence,
+)
+from fuzzy_table import build_engine, verify_engine
+import cohort_analysis
+
+LIKERT = range(1, 6)
+
+
+# ============================================================
+# PROPERTIES
+# ============================================================
+
+def check_bias_properties():
+    failures = []
+    for pos, neg in itertools.product(LIKERT, repeat=2):
+        b = bias_adjusted_pair(pos, neg)
+        if not 1 <= b <= 5:
+            failures.append(f"bias({pos}, {neg}) = {b} outside [1, 5]")
+        # Swapping the positive answer with the reverse-coded negative one
+        if b != bias_adjusted_pair(6 - neg, 6 - pos):
+            failures.append(f"bias({pos}, {neg}) != bias({6 - neg}, {6 - pos})")
+        # Mirroring both answers mirrors the score around the midpoint
+        if abs(bias_adjusted_pair(6 - pos, 6 - neg) - (6 - b)) > 1e-9:
+            failures.append(f"bias({6 - pos}, {6 - neg}) != 6 - bias({pos}, {neg})")
+        if pos > 1 and b < bias_adjusted_pair(pos - 1, neg):
+            failures.append(f"bias not non-decreasing in pos at ({pos}, {neg})")
+        if neg > 1 and b > bias_adjusted_pair(pos, neg - 1):
+            failures.append(f"bias not non-increasing in neg at ({pos}, {neg})")
+    return failures
+
+
+def check_domain_properties(engine):
+    """Every six-answer combination of every domain."""
+    failures = []
+    consequents = [
+        z for rules in engine.rules.spec["rule_sets"].values() for z in (r["then"] for r in rules)
+    ]
+    lo, hi = min(consequents), max(consequents)
+
+    for index, answers in enumerate(itertools.product(LIKERT, repeat=6)):
+        score = sugeno_domain_influence(
+            bias_adjusted_pair(answers[0], answers[1]),
+            bias_adjusted_pair(answers[2], answers[3]),
+            bias_adjusted_pair(answers[4], answers[5])
+        )
+        if score != 0.0 and not lo <= score <= hi:
+            failures.append(f"{answers}: score {score} outside [{lo}, {hi}]")
+        if score != round(score, 2):
+            failures.append(f"{answers}: score {score} not rounded to 2 decimals")
+
+    failures += verify_engine(engine, samples=2000)
+    return failures
+
+
+def tie_surveys(engine):
+    """One survey per 6-answer combination with identical answers for every domain."""
+    n = engine.n_questions
+    surveys = np.empty((5 ** 6, n), dtype=np.int64)
+    for index, answers in enumerate(itertools.product(LIKERT, repeat=6)):
+        for pairs in engine.rules.domain_pairs:
+            for s, p in enumerate(pairs):
+                pos_col, neg_col = engine.rules.pair_columns[p]
+                surveys[index, pos_col] = answers[2 * s]
+                surveys[index, neg_col] = answers[2 * s + 1]
+    return surveys
+
+
+def check_tie_properties(engine):
+    failures = []
+    all_domains = list(engine.domains)
+    surveys = tie_surveys(engine)
+
+    batch = engine.score_batch(surveys)
+    if not batch["recommended"].all():
+        failures.append(f"vectorized: {int((~batch['recommended'].all(axis=1)).sum())} tied surveys lost a domain")
+    compiled = engine.rules.evaluate(surveys)
+    if not compiled["recommended"].all():
+        failures.append("compiled: tied surveys lost a domain")
+
+    for row in surveys.tolist():
+        _, _, final_domains, reason = compute_recommendation(map_array_to_responses(row))
+        if final_domains != all_domains:
+            failures.append(f"reference {row}: {final_domains}")
+        if engine.recommend(row)[2:] != (final_domains, reason):
+            failures.append(f"lookup {row}: {engine.recommend(row)[2]}")
+        if len(failures) > 20:
+            break
+    return failures
+
+
+def run_properties(engine):
+    results = {}
+    for name, check in (
+        ("bias", check_bias_properties),
+        ("domains", lambda: check_domain_properties(engine)),
+        ("ties", lambda: check_tie_properties(engine)),
+        ("cohort", cohort_analysis.verify),
+    ):
+        t0 = time.perf_counter()
+        failures = check()
+        results[name] = {"failures": failures, "seconds": round(time.perf_counter() - t0, 2)}
+    return results
+
+
+# ============================================================
+# BENCHMARKS
+# ============================================================
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "mean_us": round(statistics.fmean(samples) * 1e6, 3),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 3),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 3),
+    }
+
+
+def bench_single(engine, surveys):
+    """Per-call latency of one 18-answer survey."""
+    implementations = {
+        "reference": lambda row: compute_recommendation(map_array_to_responses(row)),
+        "lookup": engine.recommend,
+    }
+    results = {}
+    for name, fn in implementations.items():
+        for row in surveys[:100]:   # warm-up
+            fn(row)
+        samples = []
+        for row in surveys:
+            t0 = time.perf_counter()
+            fn(row)
+            samples.append(time.perf_counter() - t0)
+        results[name] = summarize(samples)
+    return results
+
+
+def bench_batch(engine, rows):
+    """Surveys per second over an (N, 18) matrix."""
+    as_lists = rows.tolist()
+    implementations = {
+        "reference": lambda: [compute_recommendation(map_array_to_responses(r)) for r in as_lists],
+        "lookup": lambda: [engine.recommend(r) for r in as_lists],
+        "vectorized": lambda: engine.score_batch(rows),
+        "compiled": lambda: engine.rules.evaluate(rows),
+    }
+    results = {}
+    for name, fn in implementations.items():
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        results[name] = {"rows": len(rows), "rows_per_sec": round(len(rows) / elapsed, 1)}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return human-readable regressions beyond `threshold` (fraction)"""
+    regressions = []
+
+    for name, new in results.get("single", {}).items():
+        base = baseline.get("single", {}).get(name)
+        if not base or base["p50_us"] <= 0:
+            continue
+        change = new["p50_us"] / base["p50_us"] - 1
+        if change > threshold:
+            regressions.append(f"{name} p50 {base['p50_us']:.2f} -> {new['p50_us']:.2f} us (+{change:.0%})")
+
+    for name, new in results.get("batch", {}).items():
+        base = baseline.get("batch", {}).get(name)
+        if not base:
+            continue
+        change = 1 - new["rows_per_sec"] / base["rows_per_sec"]
+        if change > threshold:
+            regressions.append(
+                f"{name} throughput {base['rows_per_sec']:.0f} -> {new['rows_per_sec']:.0f} rows/s (-{change:.0%})"
+            )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=20000, help="Surveys for single-call latency")
+    parser.add_argument("--rows", type=int, default=50000, help="Rows for batch throughput")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--properties-only", action="store_true", help="Skip the benchmarks")
+    parser.add_argument("--out", type=str, help="Where to write JSON results")
+    parser.add_argument("--baseline", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed regression as a fraction")
+    args = parser.parse_args()
+
+    engine = build_engine()   # always enumerate, so a stale artifact cannot mask a regression
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "properties": run_properties(engine),
+    }
+
+    failed = False
+    for name, outcome in results["properties"].items():
+        status = "ok" if not outcome["failures"] else f"{len(outcome['failures'])} FAILURES"
+        print(f"property {name:8s} {status} ({outcome['seconds']} s)")
+        for line in outcome["failures"][:10]:
+            print("   ", line)
+        failed |= bool(outcome["failures"])
+
+    if not args.properties_only:
+        rng = np.random.default_rng(args.seed)
+        surveys = rng.integers(1, 6, size=(args.samples, engine.n_questions)).tolist()
+        rows = rng.integers(1, 6, size=(args.rows, engine.n_questions))
+        results["single"] = bench_single(engine, surveys)
+        results["batch"] = bench_batch(engine, rows)
+
+        for name, s in results["single"].items():
+            print(f"single {name:10s} p50 {s['p50_us']:9.2f} us  p95 {s['p95_us']:9.2f} us")
+        for name, b in results["batch"].items():
+            print(f"batch  {name:10s} {b['rows_per_sec']:14,.0f} rows/s")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Results written to", args.out)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION:", line)
+        failed |= bool(regressions)
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+# ============================================================
+# OUT-OF-CORE COHORT ANALYSIS FOR SURVEY EXPORTS
+# ============================================================
+"""
+Scores survey dumps from partner schools without loading them into memory.
+
+The input is read in chunks of lines, each chunk is parsed, validated and
+scored with the lookup-table engine in a worker process, and the results
+are written in input order:
+
+- <output>            one row per valid student (CSV or JSONL, by extension)
+- <output>.rejects    invalid rows with line number and reason (JSONL)
+- <output>.summary.json  domain shares, mean domain scores and bias
+                      histograms, overall and per group (default: school, grade)
+
+Input formats:
+- CSV with a header: student_id, school, grade, q1 .. q18 (question numbers
+  as in societal.QUESTION_MAP, i.e. frontend order). Quoted fields must not
+  contain line breaks.
+- JSONL: {"student_id": ..., "school": ..., "grade": ..., "answers": [18 ints]}
+
+After every chunk a checkpoint (<output>.checkpoint.json) records the input
+offset, output sizes and running aggregates. Re-running the same command
+with --resume continues from there.
+
+Usage:
+  python cohort_analysis.py exports.csv results.csv
+  python cohort_analysis.py exports.jsonl results.jsonl --workers 8 --group-by school
+  python cohort_analysis.py exports.csv results.csv --resume
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+CHUNK_ROWS = 50000
+BIAS_BINS = np.linspace(1.0, 5.0, 9)   # 0.5-wide bins over the bias range
+ALL_STUDENTS = "__all__"
+
+# Worker-process state, set by _init_worker
+_engine = None
+_options = None
+
+
+def _init_worker(options):
+    global _engine, _options
+    from fuzzy_table import load_engine
+
+    _engine = load_engine()
+    _options = options
+
+
+# ============================================================
+# PARSING AND VALIDATION (worker side)
+# ============================================================
+
+def _parse_chunk(lines, first_line, header):
+    """Yield (line_no, record_or_None, error_or_None) for raw input lines."""
+    n_questions = _engine.n_questions
+    lo, hi = _engine.scale
+
+    for offset, raw in enumerate(lines):
+        line_no = first_line + offset
+        try:
+            # Invalid UTF-8 raises UnicodeDecodeError, a ValueError: the row is rejected
+            text = raw.decode("utf-8").strip()
+            if not text:
+                continue
+            if header is None:
+                row = json.loads(text)
+                answers = row["answers"]
+            else:
+                values = next(csv.reader([text]))
+                if len(values) != len(header):
+                    raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+                row = dict(zip(header, values))
+                answers = [row[f"q{q + 1}"] for q in range(n_questions)]
+                answers = [int(v) if v.strip().lstrip("-").isdigit() else v for v in answers]
+        except (ValueError, KeyError, TypeError) as e:
+            yield line_no, None, f"unreadable row: {e}"
+            continue
+
+        if not isinstance(answers, list) or len(answers) != n_questions:
+            yield line_no, None, f"expected {n_questions} responses from survey"
+            continue
+        if not all(isinstance(v, int) and not isinstance(v, bool) and lo <= v <= hi for v in answers):
+            yield line_no, None, f"all responses must be integers between {lo} and {hi}"
+            continue
+
+        record = {"student_id": str(row.get(_options["id_column"], "")), "answers": answers}
+        for column in _options["group_by"]:
+            record[column] = str(row.get(column, ""))
+        yield line_no, record, None
+
+
+def _empty_group(engine):
+    return {
+        "students": 0,
+        "recommended": {d: 0.0 for d in engine.domains},
+        "domain_score_sum": {d: 0.0 for d in engine.domains},
+        "bias_histograms": {p: [0] * (len(BIAS_BINS) - 1) for p in engine.pairs},
+    }
+
+
+def _aggregate(records, scored, group_by):
+    """Per-group counts for one scored chunk."""
+    engine = _engine
+    # Ties split the student between the tied domains
+    shares = scored["recommended"] / scored["recommended"].sum(axis=1, keepdims=True)
+    bins = np.clip(np.digitize(scored["bias_scores"], BIAS_BINS[1:-1]), 0, len(BIAS_BINS) - 2)
+
+    group_rows = {ALL_STUDENTS: np.arange(len(records))}
+    if group_by:
+        labels = np.array(["|".join(f"{c}={r[c]}" for c in group_by) for r in records], dtype=object)
+        for key in dict.fromkeys(labels.tolist()):
+            group_rows[key] = np.flatnonzero(labels == key)
+
+    aggregates = {}
+    for key, rows in group_rows.items():
+        group = _empty_group(engine)
+        group["students"] = int(len(rows))
+        for d, domain in enumerate(engine.domains):
+            group["recommended"][domain] = float(shares[rows, d].sum())
+            group["domain_score_sum"][domain] = float(scored["domain_scores"][rows, d].sum())
+        for p, pair in enumerate(engine.pairs):
+            group["bias_histograms"][pair] = np.bincount(
+                bins[rows, p], minlength=len(BIAS_BINS) - 1
+            ).tolist()
+        aggregates[key] = group
+    return aggregates
+
+
+def _format_results(records, scored, output_format):
+    engine = _engine
+    out = io.StringIO()
+    columns = ["student_id"] + _options["group_by"]
+    if output_format == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+    for i, record in enumerate(records):
+        recommended = [d for d, hit in zip(engine.domains, scored["recommended"][i]) if hit]
+        if output_format == "csv":
+            writer.writerow(
+                [record[c] for c in columns]
+                + scored["bias_scores"][i].tolist()
+                + scored["domain_scores"][i].tolist()
+                + ["+".join(recommended)]
+            )
+        else:
+            row = {c: record[c] for c in columns}
+            row["bias_scores"] = dict(zip(engine.pairs, scored["bias_scores"][i].tolist()))
+            row["domain_scores"] = dict(zip(engine.domains, scored["domain_scores"][i].tolist()))
+            row["recommended_domains"] = recommended
+            out.write(json.dumps(row) + "\n")
+    return out.getvalue()
+
+
+def score_chunk(lines, first_line, header):
+    """Parse, validate and score one chunk of raw lines.
+
+    Returns (results_text, rejects_text, aggregates, n_valid, n_rejected).
+    """
+    records, rejects = [], []
+    for line_no, record, error in _parse_chunk(lines, first_line, header):
+        if error is None:
+            records.append(record)
+        else:
+            rejects.append(json.dumps({"line": line_no, "error": error}) + "\n")
+
+    if not records:
+        return "", "".join(rejects), {}, 0, len(rejects)
+
+    scored = _engine.score_batch(np.array([r["answers"] for r in records], dtype=np.int64))
+    return (
+        _format_results(records, scored, _options["output_format"]),
+        "".join(rejects),
+        _aggregate(records, scored, _options["group_by"]),
+        len(records),
+        len(rejects),
+    )
+
+
+def _score_chunk_task(args):
+    return score_chunk(*args)
+
+
+def verify():
+    """Score a small CSV chunk holding one malformed row of each kind.
+
+    Returns a list of failures (empty when every bad row is rejected with
+    its line number and the valid rows are scored).
+    """
+    _init_worker({"id_column": "student_id", "group_by": ["school"], "output_format": "jsonl"})
+    n = _engine.n_questions
+    lo, hi = _engine.scale
+    header = ["student_id", "school", "grade"] + [f"q{q + 1}" for q in range(n)]
+
+    def line(student_id, answers):
+        return f"{student_id},A,9,{','.join(map(str, answers))}\n".encode("utf-8")
+
+    lines = [
+        line("ok-low", [lo] * n),
+        b"bad-bytes,A,9,\xff" + f",{','.join([str(lo)] * (n - 1))}\n".encode("utf-8"),
+        line("short", [lo] * (n - 1)),
+        line("out-of-range", [hi + 1] + [lo] * (n - 1)),
+        line("text", ["x"] + [lo] * (n - 1)),
+        b"\n",
+        line("ok-high", [hi] * n),
+    ]
+    results, rejects, _, n_valid, n_rejected = score_chunk(lines, 2, header)
+
+    failures = []
+    rejected_lines = [json.loads(r)["line"] for r in rejects.splitlines()]
+    if rejected_lines != [3, 4, 5, 6]:
+        failures.append(f"rejected lines {rejected_lines}, expected [3, 4, 5, 6]")
+    scored_ids = [json.loads(r)["student_id"] for r in results.splitlines()]
+    if scored_ids != ["ok-low", "ok-high"] or (n_valid, n_rejected) != (2, 4):
+        failures.append(f"scored {scored_ids} ({n_valid} valid, {n_rejected} rejected)")
+    return failures
+
+
+# ============================================================
+# DRIVER (main process)
+# ============================================================
+
+def merge_aggregates(total, partial):
+    for key, group in partial.items():
+        target = total.setdefault(key, {
+            "students": 0,
+            "recommended": {d: 0.0 for d in group["recommended"]},
+            "domain_score_sum": {d: 0.0 for d in group["domain_score_sum"]},
+            "bias_histograms": {p: [0] * len(h) for p, h in group["bias_histograms"].items()},
+        })
+        target["students"] += group["students"]
+        for d, v in group["recommended"].items():
+            target["recommended"][d] += v
+        for d, v in group["domain_score_sum"].items():
+            target["domain_score_sum"][d] += v
+        for p, hist in group["bias_histograms"].items():
+            target["bias_histograms"][p] = [a + b for a, b in zip(target["bias_histograms"][p], hist)]
+    return total
+
+
+def summarize(aggregates):
+    """Turn running sums into shares and means."""
+    summary = {"bias_bins": BIAS_BINS.tolist(), "groups": {}}
+    for key, group in aggregates.items():
+        n = group["students"] or 1
+        summary["groups"][key] = {
+            "students": group["students"],
+            "domain_shares": {d: round(v / n, 4) for d, v in group["recommended"].items()},
+            "mean_domain_scores": {d: round(v / n, 4) for d, v in group["domain_score_sum"].items()},
+            "bias_histograms": group["bias_histograms"],
+        }
+    return summary
+
+
+def iter_chunks(f, chunk_rows):
+    """Yield (lines, end_offset) from a binary file positioned at a line start."""
+    lines = []
+    while True:
+        line = f.readline()
+        if not line:
+            break
+        lines.append(line)
+        if len(lines) >= chunk_rows:
+            yield lines, f.tell()
+            lines = []
+    if lines:
+        yield lines, f.tell()
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _input_identity(path):
+    stat = os.stat(path)
+    return {"path": str(Path(path).resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def run(args):
+    input_path, output_path = Path(args.input), Path(args.output)
+    input_format = "jsonl" if input_path.suffix.lower() in (".jsonl", ".ndjson") else "csv"
+    output_format = "jsonl" if output_path.suffix.lower() in (".jsonl", ".ndjson") else "csv"
+    rejects_path = Path(f"{output_path}.rejects")
+    summary_path = Path(f"{output_path}.summary.json")
+    checkpoint_path = Path(args.checkpoint or f"{output_path}.checkpoint.json")
+
+    options = {
+        "id_column": args.id_column,
+        "group_by": [c for c in args.group_by.split(",") if c],
+        "output_format": output_format,
+    }
+    settings = {"input": _input_identity(input_path), "options": options}
+
+    state = {"offset": 0, "line": 1, "header": None, "output_bytes": 0, "rejects_bytes": 0,
+             "rows": 0, "valid": 0, "rejected": 0, "aggregates": {}}
+    if args.resume and checkpoint_path.exists():
+        with open(checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint["settings"] != settings:
+            raise SystemExit("Checkpoint was written for a different input or options; remove it to start over")
+        state = checkpoint["state"]
+        print(f"Resuming at line {state['line']} ({state['valid']} students already scored)", file=sys.stderr)
+    elif checkpoint_path.exists():
+        raise SystemExit(f"{checkpoint_path} exists; pass --resume to continue or delete it to start over")
+
+    _init_worker(options)   # the main process needs the engine for headers and --workers 1
+
+    with open(input_path, "rb") as f_in, \
+            open(output_path, "ab") as f_out, \
+            open(rejects_path, "ab") as f_rej:
+        # Drop anything written after the last checkpoint
+        f_out.truncate(state["output_bytes"])
+        f_rej.truncate(state["rejects_bytes"])
+
+        if state["offset"] == 0:
+            if input_format == "csv":
+                header_line = f_in.readline()
+                state["header"] = next(csv.reader([header_line.decode("utf-8-sig").strip()]))
+                state["line"] += 1
+            if output_format == "csv" and state["output_bytes"] == 0:
+                header = (["student_id"] + options["group_by"] + _engine.pairs
+                          + _engine.domains + ["recommended_domains"])
+                f_out.write((",".join(header) + "\n").encode("utf-8"))
+            state["offset"] = f_in.tell()
+        f_in.seek(state["offset"])
+
+        executor = None
+        if args.workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=args.workers, initializer=_init_worker, initargs=(options,)
+            )
+
+        started = time.perf_counter()
+        rows_this_run = 0
+        pending = deque()
+        next_line = state["line"]
+
+        def finish(job):
+            nonlocal rows_this_run
+            future_or_result, n_lines, end_offset = job
+            results, rejects, aggregates, n_valid, n_rejected = (
+                future_or_result.result() if executor else future_or_result
+            )
+            f_out.write(results.encode("utf-8"))
+            f_rej.write(rejects.encode("utf-8"))
+            f_out.flush()
+            f_rej.flush()
+
+            state["offset"] = end_offset
+            state["line"] += n_lines
+            state["output_bytes"] = f_out.tell()
+            state["rejects_bytes"] = f_rej.tell()
+            state["rows"] += n_valid + n_rejected
+            state["valid"] += n_valid
+            state["rejected"] += n_rejected
+            merge_aggregates(state["aggregates"], aggregates)
+            _write_json_atomic(checkpoint_path, {"settings": settings, "state": state})
+
+            rows_this_run += n_valid + n_rejected
+            elapsed = time.perf_counter() - started
+            print(
+                f"{state['rows']} rows ({state['rejected']} rejected), "
+                f"{rows_this_run / elapsed:,.0f} rows/s",
+                file=sys.stderr
+            )
+
+        header = state["header"] if input_format == "csv" else None
+        for lines, end_offset in iter_chunks(f_in, args.chunk_rows):
+            task = (lines, next_line, header)
+            next_line += len(lines)
+            if executor:
+                pending.append((executor.submit(_score_chunk_task, task), len(lines), end_offset))
+                # Bounded read-ahead keeps memory flat regardless of file size
+                if len(pending) >= 2 * args.workers:
+                    finish(pending.popleft())
+            else:
+                finish((score_chunk(*task), len(lines), end_offset))
+        while pending:
+            finish(pending.popleft())
+
+        if executor:
+            executor.shutdown()
+
+    _write_json_atomic(summary_path, {
+        "rows": state["rows"],
+        "valid": state["valid"],
+        "rejected": state["rejected"],
+        **summarize(state["aggregates"]),
+    })
+    elapsed = time.perf_counter() - started
+    print(
+        f"Done: {state['valid']} students scored, {state['rejected']} rejected "
+        f"in {elapsed:.1f}s ({rows_this_run / max(elapsed, 1e-9):,.0f} rows/s)",
+        file=sys.stderr
+    )
+    print("Results:", output_path)
+    print("Summary:", summary_path)
+    checkpoint_path.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a survey export in chunks")
+    parser.add_argument("input", help="CSV or JSONL survey export")
+    parser.add_argument("output", help="Per-student results (.csv or .jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument("--group-by", type=str, default="school,grade", help="Comma-separated group columns")
+    parser.add_argument("--id-column", type=str, default="student_id", help="Student id column")
+    parser.add_argument("--checkpoint", type=str, help="Checkpoint file (default: <output>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="Continue from an existing checkpoint")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
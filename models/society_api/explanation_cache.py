@@ -0,0 +1,270 @@
+# ============================================================
+# EXPLANATION CACHE FOR GEMINI OUTPUT
+# ============================================================
+"""
+Gemini explanations depend only on a small, discrete outcome: nine bias
+scores, three domain scores and the winning domain(s). Many students land
+on the same or nearly the same outcome, so explanations are cached on a
+quantized signature of it:
+
+- each bias score → its dominant fuzzy set (Low / Medium / High)
+- each domain score → nearest 0.5
+- the recommended domains, as given
+
+Tiers: in-process LRU with TTL, plus an optional SQLite file shared by
+workers and restarts (only when EXPLANATION_CACHE_DB is set; if the file
+cannot be opened the cache stays in memory).
+
+Usage (pre-warm the persistent tier offline):
+  python explanation_cache.py --prewarm --top 500 --db explanation_cache.sqlite3
+  python explanation_cache.py --prewarm --top 500 --answers exports.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from societal import fuzzify
+
+CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("EXPLANATION_CACHE_TTL", str(7 * 24 * 3600)))
+# Path of the persistent tier; unset or "" keeps the cache in memory only
+CACHE_DB_PATH = os.getenv("EXPLANATION_CACHE_DB") or None
+
+DOMAIN_SCORE_STEP = 0.5
+
+
+def explanation_signature(bias_scores: dict, domain_scores: dict, final_domains: list) -> str:
+    """Quantized, order-independent key for an explanation."""
+    bias_part = ",".join(
+        f"{k}={max(fuzzify(v).items(), key=lambda item: item[1])[0][0]}"
+        for k, v in sorted(bias_scores.items())
+    )
+    domain_part = ",".join(
+        f"{d}={round(s / DOMAIN_SCORE_STEP) * DOMAIN_SCORE_STEP:g}"
+        for d, s in sorted(domain_scores.items())
+    )
+    return f"{bias_part};{domain_part};{'+'.join(final_domains)}"
+
+
+def signature_id(signature: str) -> str:
+    """Short, URL-safe id for a signature (used as the explanation id)."""
+    return hashlib.sha1(signature.encode("utf-8")).hexdigest()[:24]
+
+
+class ExplanationCache:
+    """Thread-safe LRU + TTL cache with an optional SQLite persistent tier."""
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl_seconds=CACHE_TTL_SECONDS, db_path=CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+        self._entries = OrderedDict()   # signature → (text, expires_at)
+        self._ids = {}                  # explanation id → signature, for entries in memory
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS explanations ("
+                        "signature TEXT PRIMARY KEY, id TEXT NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL)"
+                    )
+                    self._migrate(conn)
+                    conn.execute("CREATE INDEX IF NOT EXISTS explanations_id ON explanations (id)")
+            except sqlite3.Error as e:
+                # e.g. a read-only deploy directory: serve from memory instead of failing startup
+                print(f"Warning: explanation cache {self.db_path} unavailable ({e}); using memory only")
+                self.db_path = None
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection: committed (or rolled back) and always closed."""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate(conn):
+        """Add the id column to cache files written before explanations had ids."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(explanations)")}
+        if "id" not in columns:
+            conn.execute("ALTER TABLE explanations ADD COLUMN id TEXT")
+            conn.create_function("signature_id", 1, signature_id, deterministic=True)
+            conn.execute("UPDATE explanations SET id = signature_id(signature)")
+
+    def get(self, signature: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None:
+                text, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(signature)
+                    self.hits += 1
+                    return text
+                del self._entries[signature]
+                self._ids.pop(signature_id(signature), None)
+
+        if self.db_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT text, created_at FROM explanations WHERE signature = ?", (signature,)
+                ).fetchone()
+            if row is not None and row[1] + self.ttl_seconds > now:
+                self._remember(signature, row[0], row[1] + self.ttl_seconds)
+                with self._lock:
+                    self.hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, signature: str, text: str):
+        now = time.time()
+        self._remember(signature, text, now + self.ttl_seconds)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO explanations (signature, id, text, created_at) VALUES (?, ?, ?, ?)",
+                    (signature, signature_id(signature), text, now)
+                )
+
+    def get_by_id(self, explanation_id: str):
+        """Look up an explanation by its id: in-process LRU first, then the persistent tier."""
+        with self._lock:
+            signature = self._ids.get(explanation_id)
+            entry = self._entries.get(signature) if signature is not None else None
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(signature)
+                return entry[0]
+        if not self.db_path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT text, created_at FROM explanations WHERE id = ?", (explanation_id,)
+            ).fetchone()
+        if row is None or row[1] + self.ttl_seconds <= time.time():
+            return None
+        return row[0]
+
+    def _remember(self, signature, text, expires_at):
+        with self._lock:
+            self._entries[signature] = (text, expires_at)
+            self._entries.move_to_end(signature)
+            self._ids[signature_id(signature)] = signature
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._ids.pop(signature_id(evicted), None)
+
+    def get_or_generate(self, bias_scores, domain_scores, final_domains, generate):
+        """Return a cached explanation, calling `generate(...)` only on a miss."""
+        signature = explanation_signature(bias_scores, domain_scores, final_domains)
+        text = self.get(signature)
+        if text is None:
+            text = generate(bias_scores, domain_scores, final_domains)
+            self.put(signature, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# ============================================================
+# OFFLINE PRE-WARM
+# ============================================================
+
+def _read_answers(path):
+    """Yield 18-answer lists from a JSONL file (lists or {"answers": [...]})."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            yield row["answers"] if isinstance(row, dict) else row
+
+
+def common_signatures(answers, top):
+    """Count outcome signatures over survey answers; return the `top` most common.
+
+    Each entry is (signature, count, (bias_scores, domain_scores, final_domains)).
+    """
+    import numpy as np
+    from fuzzy_table import load_engine
+
+    engine = load_engine()
+    scored = engine.score_batch(np.asarray(answers))
+
+    counts = Counter()
+    examples = {}
+    for bias_row, domain_row, mask in zip(
+        scored["bias_scores"].tolist(), scored["domain_scores"].tolist(), scored["recommended"].tolist()
+    ):
+        bias_scores = dict(zip(engine.pairs, bias_row))
+        domain_scores = dict(zip(engine.domains, domain_row))
+        final_domains = [d for d, hit in zip(engine.domains, mask) if hit]
+        signature = explanation_signature(bias_scores, domain_scores, final_domains)
+        counts[signature] += 1
+        examples.setdefault(signature, (bias_scores, domain_scores, final_domains))
+
+    return [(sig, n, examples[sig]) for sig, n in counts.most_common(top)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prewarm", action="store_true", help="Generate explanations for common signatures")
+    parser.add_argument("--top", type=int, default=500, help="How many signatures to pre-warm")
+    parser.add_argument("--answers", type=str, help="JSONL of past survey answers (default: uniform sample)")
+    parser.add_argument("--samples", type=int, default=200000, help="Uniform surveys to sample without --answers")
+    parser.add_argument("--db", type=str, default=CACHE_DB_PATH, help="SQLite cache file")
+    parser.add_argument("--dry-run", action="store_true", help="Only print signature coverage")
+    args = parser.parse_args()
+
+    if not args.prewarm:
+        parser.print_help()
+        return
+    if not args.db:
+        raise SystemExit("Pre-warming needs a persistent cache (--db or EXPLANATION_CACHE_DB)")
+
+    if args.answers:
+        answers = list(_read_answers(args.answers))
+    else:
+        import numpy as np
+        answers = np.random.default_rng(0).integers(1, 6, size=(args.samples, 18))
+
+    top = common_signatures(answers, args.top)
+    covered = sum(n for _, n, _ in top)
+    print(f"Top {len(top)} signatures cover {covered / len(answers):.1%} of {len(answers)} surveys")
+    if args.dry_run:
+        return
+
+    from gemini_explanation import generate_gemini_explanation
+
+    cache = ExplanationCache(db_path=args.db)
+    generated = 0
+    for signature, _, (bias_scores, domain_scores, final_domains) in top:
+        if cache.get(signature) is not None:
+            continue
+        try:
+            cache.put(signature, generate_gemini_explanation(bias_scores, domain_scores, final_domains))
+            generated += 1
+        except Exception as e:
+            print(f"Gemini error for {signature}: {e}")
+    print(f"Generated {generated} new explanations into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# ============================================================
+# BACKGROUND GEMINI EXPLANATIONS
+# ============================================================
+"""
+Runs Gemini explanations off the request path so /recommend can return
+the fuzzy scores immediately together with an explanation id.
+
+- The id is derived from the explanation signature, so identical outcomes
+  share one job and one Gemini call.
+- Finished explanations are written to the ExplanationCache, and ids
+  are resolved through it once the job is pruned (or was a cache hit).
+  Other workers can serve an id only when the persistent tier is enabled
+  (EXPLANATION_CACHE_DB); in memory-only mode an id is local to the
+  worker that issued it.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from explanation_cache import explanation_signature, signature_id
+
+EXPLANATION_WORKERS = int(os.getenv("EXPLANATION_WORKERS", "4"))
+# How long finished / failed jobs stay in memory
+JOB_TTL_SECONDS = float(os.getenv("EXPLANATION_JOB_TTL", "3600"))
+
+
+class ExplanationJobs:
+    """In-process registry of background explanation jobs."""
+
+    def __init__(self, cache, generate, max_workers=EXPLANATION_WORKERS, ttl_seconds=JOB_TTL_SECONDS):
+        self.cache = cache
+        self.generate = generate
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="explanation")
+        self._jobs = {}   # id → {"future", "created_at"}
+        self._lock = threading.Lock()
+
+    def submit(self, bias_scores, domain_scores, final_domains):
+        """Return (explanation_id, text). `text` is None while the job is pending."""
+        signature = explanation_signature(bias_scores, domain_scores, final_domains)
+        explanation_id = signature_id(signature)
+
+        text = self.cache.get(signature)
+        if text is not None:
+            return explanation_id, text
+
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(explanation_id)
+            if job is None or (job["future"].done() and job["future"].exception() is not None):
+                future = self._executor.submit(
+                    self._run, signature, bias_scores, domain_scores, final_domains
+                )
+                self._jobs[explanation_id] = {"future": future, "created_at": time.time()}
+                return explanation_id, None
+
+        future = job["future"]
+        return explanation_id, future.result() if future.done() else None
+
+    def _run(self, signature, bias_scores, domain_scores, final_domains):
+        text = self.generate(bias_scores, domain_scores, final_domains)
+        self.cache.put(signature, text)
+        return text
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        for explanation_id in [
+            k for k, job in self._jobs.items()
+            if job["created_at"] < cutoff and job["future"].done()
+        ]:
+            del self._jobs[explanation_id]
+
+    def status(self, explanation_id):
+        """Current state of an explanation, or None if the id is unknown."""
+        with self._lock:
+            job = self._jobs.get(explanation_id)
+
+        if job is None:
+            text = self.cache.get_by_id(explanation_id)
+            if text is None:
+                return None
+            return {"explanation_id": explanation_id, "status": "ready", "gemini_explanation": text}
+
+        future = job["future"]
+        if not future.done():
+            return {"explanation_id": explanation_id, "status": "pending"}
+        if future.exception() is not None:
+            return {"explanation_id": explanation_id, "status": "failed", "error": str(future.exception())}
+        return {"explanation_id": explanation_id, "status": "ready", "gemini_explanation": future.result()}
+
+    async def wait(self, explanation_id, timeout):
+        """Wait (without blocking the event loop) until the job finishes or `timeout` passes."""
+        with self._lock:
+            job = self._jobs.get(explanation_id)
+        if job is not None and not job["future"].done():
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job["future"])), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                pass   # reported through status()
+        return self.status(explanation_id)
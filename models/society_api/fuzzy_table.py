@@ -0,0 +1,324 @@
+# ============================================================
+# PRECOMPUTED LOOKUP-TABLE ENGINE FOR THE SUGENO INFERENCE
+# ============================================================
+"""
+Every domain score depends only on the six 1–5 Likert answers of its
+bias pairs (peer/family/role × pos/neg), i.e. 5**6 = 15,625 combinations.
+This module enumerates all of them once with the compiled rule engine
+(rule_engine.py + fuzzy_rules.json) and stores the outcomes as NumPy
+arrays, so scoring becomes a handful of array lookups.
+
+The functions in `societal.py` remain the reference implementation;
+--verify checks the tables against them exhaustively.
+
+Usage:
+  python fuzzy_table.py --build     # write fuzzy_table.npz next to this file
+  python fuzzy_table.py --verify    # exhaustive equivalence check vs reference
+"""
+import argparse
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+from rule_engine import load_rule_engine, validate_answers
+from societal import (
+    bias_adjusted_pair,
+    sugeno_domain_influence,
+    compute_recommendation as reference_compute_recommendation,
+    recommendation_reason,
+    QUESTION_INDEX_TO_SEMANTIC_KEY,
+)
+
+# Bump whenever the table layout changes; rule changes are detected through
+# the spec fingerprint stored in the artifact
+TABLE_VERSION = 2
+ARTIFACT_PATH = Path(__file__).parent / "fuzzy_table.npz"
+
+# Rule set in fuzzy_rules.json that mirrors societal.sugeno_domain_influence
+REFERENCE_RULE_SET = "influence"
+REFERENCE_DOMAINS = ["Technology", "Medical", "Government"]
+
+
+# ============================================================
+# TABLE CONSTRUCTION
+# ============================================================
+
+def build_tables(rules):
+    """Enumerate every answer combination with the compiled rule engine.
+
+    Returns:
+    - bias_table: (L, L) array, bias_table[pos-1, neg-1] = bias for that pair
+    - domain_table: (n_domains, L**6) array of rounded Sugeno scores, indexed
+      by the base-L encoding of (peer_pos, peer_neg, family_pos, ..., role_neg)
+    """
+    lo, hi = rules.scale
+    levels = np.arange(lo, hi + 1, dtype=np.float64)
+    bias_table = rules.bias(levels[:, None], levels[None, :])
+
+    combos = np.array(
+        list(itertools.product(range(len(levels)), repeat=2 * len(rules.sources))),
+        dtype=np.intp
+    )
+    inputs = bias_table[combos[:, 0::2], combos[:, 1::2]]   # (n_combos, n_sources)
+
+    domain_table = np.empty((len(rules.domains), len(combos)), dtype=np.float64)
+    for rule_set, domains in rules.rule_set_domains.items():
+        domain_table[domains] = rules.infer(rule_set, inputs)
+
+    return bias_table, domain_table
+
+
+class LookupEngine:
+    """Scores survey responses from the precomputed tables."""
+
+    def __init__(self, rules, bias_table, domain_table):
+        self.rules = rules
+        self.bias_table = bias_table
+        self.domain_table = domain_table
+        self.domains = rules.domains
+        self.pairs = rules.pairs
+        self.n_questions = rules.n_questions
+        self.scale = rules.scale
+        self.levels = rules.scale[1] - rules.scale[0] + 1
+
+        # Plain lists are faster than NumPy scalars for one-at-a-time lookups
+        self._bias = bias_table.tolist()
+        self._domain = domain_table.tolist()
+        self._pair_columns = [tuple(cols) for cols in rules.pair_columns.tolist()]
+        self._domain_columns = [
+            [self._pair_columns[p] for p in pairs] for pairs in rules.domain_pairs.tolist()
+        ]
+
+        # question index → (pair, polarity); "<pair>_<polarity>" → question index
+        self.question_pairs = {}
+        for pair, (pos_col, neg_col) in zip(self.pairs, self._pair_columns):
+            self.question_pairs[pos_col] = (pair, "pos")
+            self.question_pairs[neg_col] = (pair, "neg")
+        self.semantic_keys = {
+            f"{pair}_{polarity}": col for col, (pair, polarity) in self.question_pairs.items()
+        }
+
+    def bias_score(self, pos: int, neg: int) -> float:
+        """Bias score of one pair from its positive and negative answers."""
+        lo = self.scale[0]
+        return self._bias[pos - lo][neg - lo]
+
+    def domain_score(self, d: int, pair_answers) -> float:
+        """Score of domain `d` from the (pos, neg) answers of its pairs, in rules order."""
+        lo = self.scale[0]
+        index = 0
+        for pos, neg in pair_answers:
+            index = (index * self.levels + pos - lo) * self.levels + neg - lo
+        return self._domain[d][index]
+
+    def recommend(self, answers: list):
+        """Score one survey given as answers in frontend question order.
+
+        Returns (bias_scores, domain_scores, final_domains, reason), like
+        societal.compute_recommendation.
+        """
+        lo, hi = self.scale
+        if len(answers) != self.n_questions:
+            raise ValueError(f"Expected {self.n_questions} responses from survey")
+        for value in answers:
+            if not isinstance(value, int) or not (lo <= value <= hi):
+                raise ValueError(f"All responses must be integers between {lo} and {hi}")
+
+        bias_scores = {
+            pair: self._bias[answers[pos] - lo][answers[neg] - lo]
+            for pair, (pos, neg) in zip(self.pairs, self._pair_columns)
+        }
+
+        domain_scores = {}
+        for d, domain in enumerate(self.domains):
+            index = 0
+            for pos, neg in self._domain_columns[d]:
+                index = (index * self.levels + answers[pos] - lo) * self.levels + answers[neg] - lo
+            domain_scores[domain] = self._domain[d][index]
+
+        max_score = max(domain_scores.values())
+        final_domains = [d for d, s in domain_scores.items() if s == max_score]
+
+        return bias_scores, domain_scores, final_domains, recommendation_reason(final_domains)
+
+    def compute_recommendation(self, responses: dict):
+        """Drop-in replacement for societal.compute_recommendation (semantic keys)."""
+        lo, hi = self.scale
+        answers = [None] * self.n_questions
+        for semantic_key, value in responses.items():
+            if semantic_key not in self.semantic_keys:
+                raise ValueError(f"Invalid response key: {semantic_key}")
+            if not isinstance(value, int):
+                raise TypeError(f"Likert value for '{semantic_key}' must be an integer.")
+            if not (lo <= value <= hi):
+                raise ValueError(f"Likert value for '{semantic_key}' must be between {lo} and {hi}.")
+            answers[self.semantic_keys[semantic_key]] = value
+
+        for col, value in enumerate(answers):
+            if value is None:
+                raise KeyError(f"Missing positive or negative response for '{self.question_pairs[col][0]}'")
+
+        return self.recommend(answers)
+
+    def score_batch(self, answers):
+        """Score many surveys at once.
+
+        Parameters:
+        - answers: (N, n_questions) integer array-like in frontend question order.
+
+        Returns a dict of arrays:
+        - bias_scores:  (N, n_pairs) in self.pairs order
+        - domain_scores: (N, n_domains) in self.domains order
+        - recommended: (N, n_domains) bool mask of the top-scoring (tied) domains
+
+        Raises ValueError listing the offending rows if any value is not
+        an integer on the Likert scale.
+        """
+        answers = validate_answers(answers, self.n_questions, self.scale)
+        zero_based = answers.astype(np.intp) - self.scale[0]
+
+        pos = zero_based[:, self.rules.pair_columns[:, 0]]   # (N, n_pairs)
+        neg = zero_based[:, self.rules.pair_columns[:, 1]]
+        bias_scores = self.bias_table[pos, neg]
+
+        # (N, n_domains, n_sources) → one base-L table index per domain
+        dom_pos = pos[:, self.rules.domain_pairs]
+        dom_neg = neg[:, self.rules.domain_pairs]
+        index = np.zeros(dom_pos.shape[:2], dtype=np.intp)
+        for s in range(dom_pos.shape[2]):
+            index = (index * self.levels + dom_pos[:, :, s]) * self.levels + dom_neg[:, :, s]
+        domain_scores = self.domain_table[np.arange(len(self.domains)), index]
+
+        recommended = domain_scores == domain_scores.max(axis=1, keepdims=True)
+
+        return {
+            "bias_scores": bias_scores,
+            "domain_scores": domain_scores,
+            "recommended": recommended,
+        }
+
+    def save(self, path=ARTIFACT_PATH):
+        np.savez(
+            path,
+            version=np.array(TABLE_VERSION),
+            fingerprint=np.array(self.rules.fingerprint),
+            bias_table=self.bias_table,
+            domain_table=self.domain_table,
+        )
+
+
+def build_engine(rules=None) -> LookupEngine:
+    rules = rules or load_rule_engine()
+    return LookupEngine(rules, *build_tables(rules))
+
+
+def load_engine(path=ARTIFACT_PATH, rules=None) -> LookupEngine:
+    """Load the built artifact, or enumerate the tables if it is missing or stale."""
+    rules = rules or load_rule_engine()
+    path = Path(path)
+    if path.exists():
+        with np.load(path) as data:
+            if (
+                "fingerprint" in data
+                and int(data["version"]) == TABLE_VERSION
+                and str(data["fingerprint"]) == rules.fingerprint
+            ):
+                return LookupEngine(rules, data["bias_table"], data["domain_table"])
+        print(f"Warning: ignoring stale fuzzy table artifact at {path}")
+    return build_engine(rules)
+
+
+# ============================================================
+# EXHAUSTIVE EQUIVALENCE CHECK
+# ============================================================
+
+def verify_engine(engine: LookupEngine, samples: int = 20000, seed: int = 0) -> list:
+    """Compare the engine with the reference implementation.
+
+    - every (pos, neg) bias pair
+    - every six-answer combination of every domain using the reference rule set
+    - `samples` random surveys: tables vs the compiled evaluator, and (for the
+      shipped domains) vs societal.compute_recommendation
+
+    Returns a list of mismatch descriptions (empty when equivalent).
+    """
+    mismatches = []
+    lo, hi = engine.scale
+
+    for pos, neg in itertools.product(range(lo, hi + 1), repeat=2):
+        expected = bias_adjusted_pair(pos, neg)
+        if engine.bias_table[pos - lo, neg - lo] != expected:
+            mismatches.append(f"bias({pos}, {neg}): {engine.bias_table[pos - lo, neg - lo]} != {expected}")
+
+    reference_domains = [
+        d for d, rule_set in enumerate(engine.rules.domain_rule_set) if rule_set == REFERENCE_RULE_SET
+    ]
+    for index, answers in enumerate(itertools.product(range(lo, hi + 1), repeat=6)):
+        expected = round(sugeno_domain_influence(
+            bias_adjusted_pair(answers[0], answers[1]),
+            bias_adjusted_pair(answers[2], answers[3]),
+            bias_adjusted_pair(answers[4], answers[5])
+        ), 2)
+        for d in reference_domains:
+            if engine.domain_table[d, index] != expected:
+                mismatches.append(f"{engine.domains[d]}{answers}: {engine.domain_table[d, index]} != {expected}")
+
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(lo, hi + 1, size=(samples, engine.n_questions))
+    batch = engine.score_batch(rows)
+    compiled = engine.rules.evaluate(rows)
+    for key in ("bias_scores", "domain_scores", "recommended"):
+        if not np.array_equal(batch[key], compiled[key]):
+            mismatches.append(f"score_batch {key} differs from the compiled evaluator")
+
+    if engine.domains != REFERENCE_DOMAINS or engine.n_questions != len(QUESTION_INDEX_TO_SEMANTIC_KEY):
+        print("Note: rule spec defines other domains; skipping compute_recommendation comparison")
+        return mismatches
+
+    for i, row in enumerate(rows.tolist()):
+        responses = {QUESTION_INDEX_TO_SEMANTIC_KEY[q]: v for q, v in enumerate(row)}
+        expected = reference_compute_recommendation(responses)
+        actual = engine.compute_recommendation(responses)
+        if actual != expected or engine.recommend(row) != expected:
+            mismatches.append(f"compute_recommendation({row}): {actual} != {expected}")
+
+        bias_scores, domain_scores, final_domains, _ = expected
+        batch_row = (
+            dict(zip(engine.pairs, batch["bias_scores"][i].tolist())),
+            dict(zip(engine.domains, batch["domain_scores"][i].tolist())),
+            [d for d, hit in zip(engine.domains, batch["recommended"][i]) if hit],
+        )
+        if batch_row != (bias_scores, domain_scores, final_domains):
+            mismatches.append(f"score_batch({row}): {batch_row} != {expected[:3]}")
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--build", action="store_true", help="Enumerate the tables and write the artifact")
+    parser.add_argument("--verify", action="store_true", help="Exhaustively compare against the reference functions")
+    parser.add_argument("--out", type=str, default=str(ARTIFACT_PATH), help="Artifact path")
+    args = parser.parse_args()
+
+    if args.build:
+        engine = build_engine()
+        engine.save(args.out)
+        print("Saved fuzzy lookup tables to:", args.out)
+
+    if args.verify:
+        engine = load_engine(args.out)
+        mismatches = verify_engine(engine)
+        if mismatches:
+            for line in mismatches[:20]:
+                print(line)
+            raise SystemExit(f"{len(mismatches)} mismatches against the reference implementation")
+        print("Lookup tables match the reference implementation.")
+
+    if not (args.build or args.verify):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
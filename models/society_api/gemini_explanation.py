@@ -0,0 +1,73 @@
+# ============================================================
+# GEMINI EXPLANATIONS (PRESENTATION LAYER)
+# ============================================================
+"""
+User-facing explanation of a recommendation. The Gemini client is created
+on first use, so importing this module (or societal.py) does not require
+GOOGLE_API_KEY or load the google-genai SDK.
+"""
+import os
+import threading
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared Gemini client, creating it on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise RuntimeError("GOOGLE_API_KEY not set")
+
+                from google import genai
+
+                _client = genai.Client(api_key=api_key)
+    return _client
+
+
+GEMINI_USER_INSIGHT_PROMPT = """
+You are an expert career-counselling AI.
+
+Explain the recommendation to a student in simple, friendly language.
+Do NOT mention algorithms, fuzzy logic, or mathematics.
+
+Guidelines:
+- Explain why the recommended domain(s) fit the student
+- Refer naturally to peer, family, and role-model influence
+- Be supportive and neutral
+- If multiple domains are suggested, explain the overlap
+- End with 1–2 reflective suggestions
+
+Format:
+• Short title
+• 3–5 bullet points
+• One short closing paragraph
+"""
+
+
+def generate_gemini_explanation(bias_scores, domain_scores, final_domains):
+    prompt = f"""
+{GEMINI_USER_INSIGHT_PROMPT}
+
+Bias-adjusted scores:
+{bias_scores}
+
+Domain scores:
+{domain_scores}
+
+Final recommendation:
+{final_domains}
+"""
+
+    response = get_client().models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt
+    )
+
+    return response.text.strip()
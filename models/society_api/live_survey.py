@@ -0,0 +1,78 @@
+# ============================================================
+# INCREMENTAL SCORING FOR THE LIVE SURVEY
+# ============================================================
+"""
+Keeps the running state of one student's survey and updates only the
+bias pair and domain touched by each new answer, using the lookup tables
+from fuzzy_table.py. Pairs that are still missing an answer count as
+neutral (pos = neg = middle of the engine's Likert scale, e.g. 3 on 1-5)
+until both halves arrive.
+"""
+from societal import recommendation_reason
+
+
+class LiveSurvey:
+    """One survey in progress. Each `answer` call is O(1)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        # Equal answers give the midpoint bias; the lower middle on even-sized scales
+        self.neutral = (engine.scale[0] + engine.scale[1]) // 2
+        self.answers = {}   # question index → value
+        self.pairs = {pair: {"pos": None, "neg": None} for pair in engine.pairs}
+        self.bias_scores = {pair: engine.bias_score(self.neutral, self.neutral) for pair in engine.pairs}
+        # pair → indices of the domains it feeds
+        self.pair_domains = {pair: [] for pair in engine.pairs}
+        for d, pairs in enumerate(engine.rules.domain_pairs.tolist()):
+            for p in pairs:
+                self.pair_domains[engine.pairs[p]].append(d)
+        self.domain_scores = {}
+        for d in range(len(engine.domains)):
+            self._update_domain(d)
+
+    @property
+    def complete(self):
+        return len(self.answers) == self.engine.n_questions
+
+    def _pair_values(self, pair):
+        values = self.pairs[pair]
+        if values["pos"] is None or values["neg"] is None:
+            return self.neutral, self.neutral
+        return values["pos"], values["neg"]
+
+    def _update_domain(self, d):
+        self.domain_scores[self.engine.domains[d]] = self.engine.domain_score(
+            d, [self._pair_values(self.engine.pairs[p]) for p in self.engine.rules.domain_pairs[d].tolist()]
+        )
+
+    def answer(self, question, value):
+        """Record one answer (0-based question index) and refresh the affected scores."""
+        lo, hi = self.engine.scale
+        if (not isinstance(question, int) or isinstance(question, bool)
+                or question not in self.engine.question_pairs):
+            raise ValueError(f"Invalid question index: {question}")
+        if not isinstance(value, int) or isinstance(value, bool) or not (lo <= value <= hi):
+            raise ValueError(f"All responses must be integers between {lo} and {hi}")
+
+        pair, polarity = self.engine.question_pairs[question]
+        self.answers[question] = value
+        self.pairs[pair][polarity] = value
+
+        self.bias_scores[pair] = self.engine.bias_score(*self._pair_values(pair))
+        for d in self.pair_domains[pair]:
+            self._update_domain(d)
+
+    def snapshot(self):
+        """Current scores; final once every question is answered."""
+        max_score = max(self.domain_scores.values())
+        leading = [d for d, s in self.domain_scores.items() if s == max_score]
+        result = {
+            "type": "final" if self.complete else "provisional",
+            "answered": len(self.answers),
+            "bias_scores": dict(self.bias_scores),
+            "domain_scores": dict(self.domain_scores),
+            "recommended_domains": leading,
+        }
+        if self.complete:
+            result["reason"] = recommendation_reason(leading)
+        return result
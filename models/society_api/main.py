@@ -1,17 +1,39 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, Any, Literal, Optional
+import json
 import os
 
 # ------------------------------------------------------------
 # IMPORT YOUR EXISTING FUNCTIONS (NO LOGIC CHANGES)
 # ------------------------------------------------------------
 # Make sure this file is in the SAME folder or update import path
-from societal import (
-    compute_recommendation,
-    generate_gemini_explanation,
-    map_array_to_responses
-)
+from gemini_explanation import generate_gemini_explanation
+from fuzzy_table import load_engine
+from explanation_cache import ExplanationCache
+from explanation_jobs import ExplanationJobs
+from live_survey import LiveSurvey
+
+# Precomputed Sugeno outcomes of the rules in fuzzy_rules.json (see
+# rule_engine.py / fuzzy_table.py); the functions in societal.py remain
+# the reference implementation.
+fuzzy_engine = load_engine()
+
+# Gemini explanations keyed on the quantized outcome (see explanation_cache.py)
+explanation_cache = ExplanationCache()
+explanation_jobs = ExplanationJobs(explanation_cache, generate_gemini_explanation)
+
+# The Gemini client is created on first use; scoring works without a key
+if not os.getenv("GOOGLE_API_KEY"):
+    print("Warning: GOOGLE_API_KEY not set; Gemini explanations will fail")
+
+# "sync":  /recommend waits for Gemini (what Server/src/controllers/societalController.ts
+#          expects: it stores the response and never polls)
+# "async": /recommend returns scores at once and an explanation id to poll
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE", "sync")
+SSE_TIMEOUT_SECONDS = 60
 
 # ------------------------------------------------------------
 # FASTAPI APP
@@ -28,14 +50,29 @@ app = FastAPI(
 
 class RecommendationRequest(BaseModel):
     answers: list[int]   # array of 18 Likert values
+    explanation_mode: Optional[Literal["sync", "async"]] = None   # defaults to EXPLANATION_MODE
  # semantic_key → Likert value (1–5)
 
+class BatchOptions(BaseModel):
+    format: Literal["columnar", "ndjson"] = "columnar"
+    include_explanations: bool = False
+
+class BatchRecommendationRequest(BatchOptions):
+    # Documents the body only; /recommend/batch checks the matrix with NumPy
+    answers: list[list[int]] = Field(..., min_length=1)   # N × 18 Likert matrix
+
+# Gemini is called once per row when explanations are requested
+MAX_EXPLAINED_BATCH_ROWS = 50
+NDJSON_CHUNK_ROWS = 1000
+
 class RecommendationResponse(BaseModel):
     bias_scores: Dict[str, float]
     domain_scores: Dict[str, float]
     recommended_domains: list[str]
     reason: str
-    gemini_explanation: str
+    gemini_explanation: Optional[str] = None
+    explanation_id: Optional[str] = None
+    explanation_status: Literal["ready", "pending"] = "ready"
 
 
 # ------------------------------------------------------------
@@ -44,7 +81,7 @@ class RecommendationResponse(BaseModel):
 
 @app.get("/")
 def health_check():
-    return {"status": "API is running"}
+    return {"status": "API is running", "explanation_cache": explanation_cache.stats()}
 
 
 # ------------------------------------------------------------
@@ -56,25 +93,209 @@ def recommend(req: RecommendationRequest):
 
     try:
         # 1️⃣ Core computation (your existing logic)
-        responses = map_array_to_responses(req.answers)
-
-        bias_scores, domain_scores, final_domains, reason = compute_recommendation( responses)
+        bias_scores, domain_scores, final_domains, reason = fuzzy_engine.recommend(req.answers)
 
 
-        # 2️⃣ Gemini explanation (presentation layer)
-        gemini_text = generate_gemini_explanation(
-            bias_scores,
-            domain_scores,
-            final_domains
-        )
-
-        return {
+        result = {
             "bias_scores": bias_scores,
             "domain_scores": domain_scores,
             "recommended_domains": final_domains,
-            "reason": reason,
-            "gemini_explanation": gemini_text
+            "reason": reason
         }
 
+        # 2️⃣ Gemini explanation (presentation layer)
+        if (req.explanation_mode or EXPLANATION_MODE) == "sync":
+            result["gemini_explanation"] = explanation_cache.get_or_generate(
+                bias_scores,
+                domain_scores,
+                final_domains,
+                generate_gemini_explanation
+            )
+            return result
+
+        explanation_id, gemini_text = explanation_jobs.submit(bias_scores, domain_scores, final_domains)
+        result["explanation_id"] = explanation_id
+        result["gemini_explanation"] = gemini_text
+        result["explanation_status"] = "ready" if gemini_text is not None else "pending"
+        return result
+
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------------------------------------
+# ASYNC EXPLANATIONS
+# ------------------------------------------------------------
+
+@app.get("/explanations/{explanation_id}")
+def get_explanation(explanation_id: str):
+    status = explanation_jobs.status(explanation_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation id")
+    return status
+
+
+@app.get("/explanations/{explanation_id}/stream")
+async def stream_explanation(explanation_id: str):
+    """Server-Sent Events: one 'explanation' event once the text is ready."""
+    if explanation_jobs.status(explanation_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation id")
+
+    async def events():
+        status = await explanation_jobs.wait(explanation_id, SSE_TIMEOUT_SECONDS)
+        if status is None or status["status"] == "pending":
+            status = {"explanation_id": explanation_id, "status": "timeout"}
+        yield f"event: explanation\ndata: {json.dumps(status)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+# ------------------------------------------------------------
+# LIVE SURVEY (WebSocket)
+# ------------------------------------------------------------
+
+@app.websocket("/ws/recommend")
+async def live_recommend(websocket: WebSocket):
+    """
+    Client sends {"question": 0-17, "value": 1-5} per answer.
+    Server replies with provisional scores after every answer and a
+    final recommendation (plus explanation id) once all 18 are in.
+    """
+    await websocket.accept()
+    survey = LiveSurvey(fuzzy_engine)
+
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (json.JSONDecodeError, KeyError):   # KeyError: binary frame
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON text"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": 'Expected {"question": ..., "value": ...}'})
+                continue
+            try:
+                survey.answer(message.get("question"), message.get("value"))
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+
+            result = survey.snapshot()
+            if survey.complete:
+                # submit() may read the SQLite tier; keep it off the event loop
+                explanation_id, gemini_text = await run_in_threadpool(
+                    explanation_jobs.submit,
+                    result["bias_scores"], result["domain_scores"], result["recommended_domains"]
+                )
+                result["explanation_id"] = explanation_id
+                result["gemini_explanation"] = gemini_text
+                result["explanation_status"] = "ready" if gemini_text is not None else "pending"
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+
+
+# ------------------------------------------------------------
+# BATCH RECOMMENDATION ENDPOINT (cohort analytics)
+# ------------------------------------------------------------
+
+@app.post(
+    "/recommend/batch",
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": BatchRecommendationRequest.model_json_schema()}
+    }}}
+)
+async def recommend_batch(request: Request):
+    """
+    The body is parsed once and the answer matrix is validated in one
+    vectorized pass (rule_engine.validate_answers) instead of pydantic
+    checking every element.
+    """
+    body = await request.body()
+    return await run_in_threadpool(score_batch_body, body)
+
+
+def score_batch_body(body: bytes):
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Request body must be valid JSON")
+    if not isinstance(payload, dict) or not isinstance(payload.get("answers"), list) or not payload["answers"]:
+        raise HTTPException(status_code=422, detail='Expected {"answers": [[...], ...]} with at least one survey')
+    try:
+        req = BatchOptions.model_validate({k: v for k, v in payload.items() if k != "answers"})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors()[0]["msg"])
+    answers = payload["answers"]
+
+    if req.include_explanations and len(answers) > MAX_EXPLAINED_BATCH_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Explanations are limited to {MAX_EXPLAINED_BATCH_ROWS} rows per batch"
+        )
+
+    try:
+        scored = fuzzy_engine.score_batch(answers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    domains = fuzzy_engine.domains
+    recommended = [
+        [d for d, hit in zip(domains, row) if hit]
+        for row in scored["recommended"].tolist()
+    ]
+
+    explanations = None
+    if req.include_explanations:
+        explanations = [
+            explanation_cache.get_or_generate(
+                dict(zip(fuzzy_engine.pairs, bias_row)),
+                dict(zip(domains, domain_row)),
+                final_domains,
+                generate_gemini_explanation
+            )
+            for bias_row, domain_row, final_domains in zip(
+                scored["bias_scores"].tolist(),
+                scored["domain_scores"].tolist(),
+                recommended
+            )
+        ]
+
+    if req.format == "columnar":
+        result = {
+            "count": len(recommended),
+            "bias_scores": dict(zip(fuzzy_engine.pairs, scored["bias_scores"].T.tolist())),
+            "domain_scores": dict(zip(domains, scored["domain_scores"].T.tolist())),
+            "recommended_domains": recommended
+        }
+        if explanations is not None:
+            result["gemini_explanation"] = explanations
+        # Plain lists of floats; skip FastAPI's per-value jsonable_encoder pass
+        return Response(content=json.dumps(result), media_type="application/json")
+
+    def stream():
+        bias_rows = scored["bias_scores"].tolist()
+        domain_rows = scored["domain_scores"].tolist()
+        lines = []
+        for i, final_domains in enumerate(recommended):
+            row = {
+                "row": i,
+                "bias_scores": dict(zip(fuzzy_engine.pairs, bias_rows[i])),
+                "domain_scores": dict(zip(domains, domain_rows[i])),
+                "recommended_domains": final_domains
+            }
+            if explanations is not None:
+                row["gemini_explanation"] = explanations[i]
+            lines.append(json.dumps(row) + "\n")
+            # One write per NDJSON_CHUNK_ROWS rows rather than per row
+            if len(lines) == NDJSON_CHUNK_ROWS:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
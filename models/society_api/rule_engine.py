@@ -0,0 +1,226 @@
+# ============================================================
+# COMPILED, CONFIGURABLE FUZZY RULE ENGINE
+# ============================================================
+"""
+Declarative replacement for the hard-coded Sugeno rules and domains.
+
+fuzzy_rules.json describes:
+- membership_functions: named fuzzy sets (ramp_down / triangle / ramp_up)
+- rule_sets: lists of rules, each an AND (min) or OR (max) over
+  (source, fuzzy set) terms with a constant Sugeno consequent
+- domains: rule set, pair suffix and the question index of the pos / neg
+  answer for every source (peer, family, role)
+
+The spec is compiled once into index arrays, and `evaluate` scores a whole
+(N, n_questions) answer matrix for all domains with NumPy operations. The
+number of Python-level steps depends only on the spec (rules × terms),
+never on N. For the shipped spec the output is identical to
+societal.sugeno_domain_influence / compute_recommendation.
+
+Adding a domain (e.g. Law, Design, Business) means adding its questions to
+the survey and an entry under "domains"; no code changes.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+SPEC_PATH = Path(os.getenv("FUZZY_RULES_PATH", Path(__file__).parent / "fuzzy_rules.json"))
+
+
+# ============================================================
+# MEMBERSHIP FUNCTIONS (vectorized)
+# ============================================================
+
+def _ramp_down(x, a, b):
+    """1 at/below a, linear down to 0 at b."""
+    return np.clip((b - x) / (b - a), 0.0, 1.0)
+
+
+def _ramp_up(x, a, b):
+    """0 at/below a, linear up to 1 at b."""
+    return np.clip((x - a) / (b - a), 0.0, 1.0)
+
+
+def _triangle(x, a, b, c):
+    """0 outside (a, c), peaking at 1 when x == b."""
+    return np.maximum(0.0, np.minimum((x - a) / (b - a), (c - x) / (c - b)))
+
+
+MEMBERSHIP_TYPES = {
+    "ramp_down": (_ramp_down, 2),
+    "ramp_up": (_ramp_up, 2),
+    "triangle": (_triangle, 3),
+}
+
+
+def load_spec(path=SPEC_PATH) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def spec_fingerprint(spec: dict) -> str:
+    """Stable hash of a spec, used to detect stale lookup-table artifacts."""
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def validate_answers(answers, n_questions, scale=(1, 5)):
+    """Return `answers` as an (N, n_questions) integer array or raise ValueError."""
+    try:
+        answers = np.asarray(answers)
+    except ValueError:
+        answers = None   # ragged rows
+    if answers is None or answers.ndim != 2 or answers.shape[1] != n_questions:
+        raise ValueError(f"Expected an (N, {n_questions}) matrix of survey responses")
+    if answers.size and not np.issubdtype(answers.dtype, np.integer):
+        raise ValueError(f"All responses must be integers between {scale[0]} and {scale[1]}")
+
+    invalid = np.flatnonzero(((answers < scale[0]) | (answers > scale[1])).any(axis=1))
+    if invalid.size:
+        raise ValueError(
+            f"All responses must be integers between {scale[0]} and {scale[1]} "
+            f"(invalid rows: {invalid[:10].tolist()}" + (", ..." if invalid.size > 10 else "") + ")"
+        )
+    return answers
+
+
+class CompiledRuleEngine:
+    """A fuzzy rule spec compiled into NumPy index arrays."""
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.fingerprint = spec_fingerprint(spec)
+        self.scale = tuple(spec.get("scale", [1, 5]))
+        self.sources = list(spec["sources"])
+        source_index = {s: i for i, s in enumerate(self.sources)}
+
+        # ---- membership functions ----
+        self.membership = {}
+        for name, mf in spec["membership_functions"].items():
+            if mf["type"] not in MEMBERSHIP_TYPES:
+                raise ValueError(f"Unknown membership function type '{mf['type']}' for '{name}'")
+            fn, n_points = MEMBERSHIP_TYPES[mf["type"]]
+            if len(mf["points"]) != n_points:
+                raise ValueError(f"Membership function '{name}' needs {n_points} points")
+            self.membership[name] = (fn, tuple(float(p) for p in mf["points"]))
+
+        # ---- rule sets: [(reduce, [(source_idx, set_name), ...], z), ...] ----
+        self.rule_sets = {}
+        for rs_name, rules in spec["rule_sets"].items():
+            compiled = []
+            for rule in rules:
+                (op, terms), = rule["if"].items()
+                if op not in ("and", "or"):
+                    raise ValueError(f"Unknown operator '{op}' in rule set '{rs_name}'")
+                compiled_terms = []
+                for source, set_name in terms:
+                    if source not in source_index:
+                        raise ValueError(f"Unknown source '{source}' in rule set '{rs_name}'")
+                    if set_name not in self.membership:
+                        raise ValueError(f"Unknown fuzzy set '{set_name}' in rule set '{rs_name}'")
+                    compiled_terms.append((source_index[source], set_name))
+                reduce = np.minimum if op == "and" else np.maximum
+                compiled.append((reduce, compiled_terms, float(rule["then"])))
+            self.rule_sets[rs_name] = compiled
+
+        # ---- domains, bias pairs and question columns ----
+        self.domains = list(spec["domains"])
+        pair_columns = {}
+        domain_pairs = []
+        self.domain_rule_set = []
+        for domain, cfg in spec["domains"].items():
+            if cfg["rule_set"] not in self.rule_sets:
+                raise ValueError(f"Domain '{domain}' uses unknown rule set '{cfg['rule_set']}'")
+            self.domain_rule_set.append(cfg["rule_set"])
+            pairs = []
+            for source in self.sources:
+                cols = cfg["questions"][source]
+                pair = f"{source}_{cfg['pair_suffix']}"
+                pair_columns[pair] = (int(cols["pos"]), int(cols["neg"]))
+                pairs.append(pair)
+            domain_pairs.append(pairs)
+
+        used = sorted(c for cols in pair_columns.values() for c in cols)
+        if used != list(range(len(used))):
+            raise ValueError("Question indices must cover 0..n-1 exactly once")
+        self.n_questions = len(used)
+
+        # Pairs in the order the answer array first mentions them
+        self.pairs = sorted(pair_columns, key=lambda p: min(pair_columns[p]))
+        pair_index = {p: i for i, p in enumerate(self.pairs)}
+        self.pair_columns = np.array([pair_columns[p] for p in self.pairs], dtype=np.intp)
+        self.domain_pairs = np.array(
+            [[pair_index[p] for p in pairs] for pairs in domain_pairs], dtype=np.intp
+        )
+        self.rule_set_domains = {
+            rs: np.array([d for d, name in enumerate(self.domain_rule_set) if name == rs], dtype=np.intp)
+            for rs in dict.fromkeys(self.domain_rule_set)
+        }
+
+    # ---------------------------------------------------------
+    # Inference
+    # ---------------------------------------------------------
+
+    def bias(self, pos, neg):
+        """Vectorized societal.bias_adjusted_pair."""
+        lo, hi = self.scale
+        midpoint = (lo + hi) / 2
+        neg_rc = (lo + hi) - neg
+        avg = (pos + neg_rc) / 2
+        avg = np.where(np.abs(pos - neg_rc) > 1, (avg + midpoint) / 2, avg)
+        return np.round(avg, 2)
+
+    def infer(self, rule_set, inputs):
+        """Sugeno weighted average for `inputs` of shape (..., n_sources), rounded to 2 decimals."""
+        inputs = np.asarray(inputs, dtype=np.float64)
+        memberships = {}
+        num = np.zeros(inputs.shape[:-1])
+        den = np.zeros(inputs.shape[:-1])
+
+        for reduce, terms, z in self.rule_sets[rule_set]:
+            degrees = []
+            for source, set_name in terms:
+                key = (source, set_name)
+                if key not in memberships:
+                    fn, points = self.membership[set_name]
+                    memberships[key] = fn(inputs[..., source], *points)
+                degrees.append(memberships[key])
+            w = degrees[0] if len(degrees) == 1 else reduce.reduce(degrees)
+            num = num + w * z
+            den = den + w
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            score = np.where(den != 0, num / den, 0.0)
+        return np.round(score, 2)
+
+    def evaluate(self, answers):
+        """Score an (N, n_questions) answer matrix.
+
+        Returns a dict of arrays:
+        - bias_scores:   (N, n_pairs) in self.pairs order
+        - domain_scores: (N, n_domains) in self.domains order
+        - recommended:   (N, n_domains) bool mask of the top-scoring (tied) domains
+        """
+        answers = validate_answers(answers, self.n_questions, self.scale)
+        values = answers.astype(np.float64)
+
+        bias_scores = self.bias(values[:, self.pair_columns[:, 0]], values[:, self.pair_columns[:, 1]])
+        domain_inputs = bias_scores[:, self.domain_pairs]   # (N, n_domains, n_sources)
+
+        domain_scores = np.empty((len(answers), len(self.domains)))
+        for rule_set, domains in self.rule_set_domains.items():
+            domain_scores[:, domains] = self.infer(rule_set, domain_inputs[:, domains, :])
+
+        recommended = domain_scores == domain_scores.max(axis=1, keepdims=True)
+        return {
+            "bias_scores": bias_scores,
+            "domain_scores": domain_scores,
+            "recommended": recommended,
+        }
+
+
+def load_rule_engine(path=SPEC_PATH) -> CompiledRuleEngine:
+    return CompiledRuleEngine(load_spec(path))
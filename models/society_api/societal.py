@@ -2,15 +2,8 @@
 # ============================================================
 # STATEMENT → SEMANTIC MAPPING
 # ============================================================
-import os
-from google import genai
-
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise RuntimeError("GOOGLE_API_KEY not set")
-
-client = genai.Client(api_key=API_KEY)
-GEMINI_MODEL = "gemini-2.5-flash"
+# Pure scoring core: no third-party imports, so batch jobs, benchmarks and
+# workers can import it without the Gemini client (see gemini_explanation.py).
 # ============================================================
 # FRONTEND ARRAY → SEMANTIC KEY MAPPING (ADDED)
 # ============================================================
@@ -85,45 +78,6 @@ def low(x):
         """
         return max(0.0, min(1.0, (3 - x) / 2))
 
-GEMINI_USER_INSIGHT_PROMPT = """
-You are an expert career-counselling AI.
-
-Explain the recommendation to a student in simple, friendly language.
-Do NOT mention algorithms, fuzzy logic, or mathematics.
-
-Guidelines:
-- Explain why the recommended domain(s) fit the student
-- Refer naturally to peer, family, and role-model influence
-- Be supportive and neutral
-- If multiple domains are suggested, explain the overlap
-- End with 1–2 reflective suggestions
-
-Format:
-• Short title
-• 3–5 bullet points
-• One short closing paragraph
-"""
-def generate_gemini_explanation(bias_scores, domain_scores, final_domains):
-    prompt = f"""
-{GEMINI_USER_INSIGHT_PROMPT}
-
-Bias-adjusted scores:
-{bias_scores}
-
-Domain scores:
-{domain_scores}
-
-Final recommendation:
-{final_domains}
-"""
-
-    response = client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=prompt
-    )
-
-    return response.text.strip()
-
 def medium(x):
         """Membership degree for the 'Medium' fuzzy set.
 
@@ -251,12 +205,10 @@ def bias_adjusted_pair(pos, neg):
 # CORE COMPUTATION (TESTABLE)
 # ============================================================
 
-def compute_recommendation(responses: dict):
+def structure_responses(responses: dict) -> dict:
+    """Validate semantic-key responses and group them as {pair: {"pos", "neg"}}."""
     structured = {}
 
-    # -------------------------------
-    # Input validation & structuring
-    # -------------------------------
     for semantic_key, value in responses.items():
 
         if semantic_key not in SEMANTIC_KEYS:
@@ -277,15 +229,38 @@ def compute_recommendation(responses: dict):
 
         structured.setdefault(domain_key, {})[polarity] = value
 
-    # -------------------------------
-    # Bias correction
-    # -------------------------------
-    bias_scores = {}
     for k, v in structured.items():
         if "pos" not in v or "neg" not in v:
             raise KeyError(
                 f"Missing positive or negative response for '{k}'"
             )
+
+    return structured
+
+
+def recommendation_reason(final_domains: list) -> str:
+    if len(final_domains) == 1:
+        return (
+            f"The {final_domains[0].lower()} domain is recommended due to the highest "
+            "aggregated influence score from peer, family, and role model factors."
+        )
+    return (
+        f"The {', '.join(d.lower() for d in final_domains)} domains are jointly "
+        "recommended as they share the highest aggregated influence score."
+    )
+
+
+def compute_recommendation(responses: dict):
+    # -------------------------------
+    # Input validation & structuring
+    # -------------------------------
+    structured = structure_responses(responses)
+
+    # -------------------------------
+    # Bias correction
+    # -------------------------------
+    bias_scores = {}
+    for k, v in structured.items():
         bias_scores[k] = bias_adjusted_pair(v["pos"], v["neg"])
 
     # -------------------------------
@@ -322,17 +297,7 @@ def compute_recommendation(responses: dict):
     # -------------------------------
     max_score = max(domain_scores.values())
     final_domains = [d for d, s in domain_scores.items() if s == max_score]
-
-    if len(final_domains) == 1:
-        reason = (
-            f"The {final_domains[0].lower()} domain is recommended due to the highest "
-            "aggregated influence score from peer, family, and role model factors."
-        )
-    else:
-        reason = (
-            f"The {', '.join(d.lower() for d in final_domains)} domains are jointly "
-            "recommended as they share the highest aggregated influence score."
-        )
+    reason = recommendation_reason(final_domains)
 
     return bias_scores, domain_scores, final_domains, reason
 
@@ -377,6 +342,8 @@ if __name__ == "__main__":
 
         print("\n REASON ")
         print(reason)
+        from gemini_explanation import generate_gemini_explanation
+
         explanation = generate_gemini_explanation(bias, scores, rec)
         print("\n USER-FRIENDLY GEMINI EXPLANATION ")
         print(explanation)